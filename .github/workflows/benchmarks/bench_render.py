@@ -0,0 +1,120 @@
+#!/usr/local/bin/python3
+
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Benchmark -d against the original script, which built pages with string +=.
+#
+# For each (subgroups, members) case this generates a synthetic groups/ tree
+# (see bench_sync.py) and runs the original sync-yaml-to-groupsio.py, taken
+# from git and pointed at fake_groupsio.py, and then this one, with -d. It
+# reports both wall times and checks that they wrote the same pages.
+#
+#     python .github/workflows/benchmarks/bench_render.py
+#     python .github/workflows/benchmarks/bench_render.py --cases=100x10000 --repeat=5
+#     python .github/workflows/benchmarks/bench_render.py --baseline=<commit>
+
+import os
+import sys
+import getopt
+import shutil
+import tempfile
+import subprocess
+
+from fake_groupsio import FakeGroupsio, serve, api_url
+from bench_sync import group_name, make_directory, seed_server, run_script
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+script_path = '.github/workflows/sync-yaml-to-groupsio.py'
+
+quick_cases = [(10, 1000), (100, 10000)]
+
+def baseline_source(revision):
+    '''Return the script as it was at ``revision``, by default the first commit.'''
+
+    if not revision:
+        revision = subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'],
+                cwd=benchmarks_dir, check=True, stdout=subprocess.PIPE,
+                text=True).stdout.split()[-1]
+
+    return subprocess.run(['git', 'show', '%s:%s' % (revision, script_path)],
+            cwd=benchmarks_dir, check=True, stdout=subprocess.PIPE, text=True).stdout
+
+def read_pages(pages_dir):
+    '''Return {name: contents} of the pages in ``pages_dir``, less the date.'''
+
+    pages = dict()
+
+    for name in os.listdir(pages_dir):
+        if name.endswith('.md'):
+            with open(os.path.join(pages_dir, name), 'rb') as page_file:
+                pages[name] = [line for line in page_file if b'Last generated' not in line]
+
+    return pages
+
+def run_case(subgroups, members, source, repeat):
+    '''Return (best baseline seconds, best current seconds, same pages).'''
+
+    work_dir = tempfile.mkdtemp(prefix='bench-render-')
+    state = FakeGroupsio(group_name=group_name)
+    server = serve(state)
+
+    try:
+        definitions = make_directory(work_dir, subgroups, members)
+        seed_server(state, definitions)
+
+        baseline = os.path.join(work_dir, 'baseline.py')
+
+        with open(baseline, 'w') as baseline_file:
+            baseline_file.write(source.replace('https://groups.io/api/v1', api_url(server)))
+
+        times = {'baseline': list(), 'current': list()}
+        pages = dict()
+
+        for _ in range(repeat):
+            for name, flags, kwargs in (('baseline', ['-d'], {'script': baseline}),
+                    ('current', ['-d', '--page-size=0'], {})):
+                elapsed, _, status = run_script(work_dir, server, flags, **kwargs)
+
+                if status != 0:
+                    with open(os.path.join(work_dir, 'output.log')) as log_file:
+                        print('WARN: %s run failed (%d):\n%s' % (name, status,
+                            log_file.read()[-2000:]))
+
+                times[name].append(elapsed)
+                pages[name] = read_pages(work_dir)
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return min(times['baseline']), min(times['current']), pages['baseline'] == pages['current']
+
+def main(argv):
+    cases = quick_cases
+    revision = None
+    repeat = 3
+
+    opts, args = getopt.getopt(argv, '', ['cases=', 'baseline=', 'repeat='])
+
+    for opt, value in opts:
+        if opt == '--cases':
+            cases = [tuple(int(n) for n in case.split('x')) for case in value.split(',')]
+        elif opt == '--baseline':
+            revision = value
+        elif opt == '--repeat':
+            repeat = int(value)
+
+    source = baseline_source(revision)
+
+    print('%10s %10s %14s %14s %8s %6s' % ('subgroups', 'members', 'baseline (s)',
+        'current (s)', 'speedup', 'same'))
+
+    for subgroups, members in cases:
+        baseline, current, same = run_case(subgroups, members, source, repeat)
+        print('%10d %10d %14.2f %14.2f %7.1fx %6s' % (subgroups, members, baseline, current,
+            baseline / current, same))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
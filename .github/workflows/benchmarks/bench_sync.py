@@ -0,0 +1,265 @@
+#!/usr/local/bin/python3
+
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Benchmark sync-yaml-to-groupsio.py against the local Groups.io stand-in.
+#
+# For each (subgroups, members) case this generates a synthetic groups/ tree,
+# seeds fake_groupsio.py with a slightly out-of-date copy of it, and runs the
+# script with -g and with -d.  Each run reports wall time, the requests the
+# server saw, and the script's peak memory.
+#
+#     python .github/workflows/benchmarks/bench_sync.py
+#     python .github/workflows/benchmarks/bench_sync.py --full --json=bench.json
+#     python .github/workflows/benchmarks/bench_sync.py --cases=100x10000 --latency=0.05
+
+import os
+import sys
+import json
+import getopt
+import random
+import shutil
+import tempfile
+import time
+import subprocess
+
+import yaml
+
+from fake_groupsio import FakeGroupsio, serve, api_url
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+script = os.path.join(os.path.dirname(benchmarks_dir), 'sync-yaml-to-groupsio.py')
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(benchmarks_dir)))
+
+group_name = 'bench'
+unified_list = 'everyone'
+
+# (subgroups, total members) pairs
+
+quick_cases = [(10, 10), (10, 1000), (100, 10000)]
+full_cases = [(10, 10), (10, 1000), (100, 1000), (100, 10000), (1000, 10000),
+        (1000, 100000)]
+
+def make_member(index, rng):
+    '''Return a synthetic member entry with a realistic mix of optional fields.'''
+
+    member = {'email': 'person%d@example.org' % index, 'name': 'Person %d' % index}
+
+    if rng.random() < 0.5:
+        member['photo'] = 'groups/assets/default-image.svg'
+
+    if rng.random() < 0.3:
+        member['roles'] = [{'title': 'Maintainer', 'is-voting': rng.random() < 0.5,
+            'term-begins': '2020-01-01', 'term-ends': '2021-12-31'}]
+
+    if rng.random() < 0.2:
+        member['bio'] = 'Works on project %d.' % index
+
+    if rng.random() < 0.3:
+        member['sponsor'] = 'Company %d' % (index % 50)
+
+    member['github-username'] = 'person%d' % index
+
+    if rng.random() < 0.5:
+        member['twitter-username'] = 'person%d' % index
+
+    if rng.random() < 0.05:
+        member['include-on-meta-list'] = False
+
+    return member
+
+def make_directory(work_dir, subgroups, members, seed=0):
+    '''Write a synthetic groups/ tree; return {subgroup: [emails]}.
+
+    ``members`` memberships are spread over ``subgroups`` subgroups, drawn from
+    a pool of people so that some belong to several subgroups.
+    '''
+
+    rng = random.Random(seed)
+
+    assets_dir = os.path.join(work_dir, 'groups', 'assets')
+    os.makedirs(assets_dir)
+
+    with open(os.path.join(assets_dir, 'config.yml'), 'w') as config_file:
+        yaml.safe_dump({
+            'group-name': group_name,
+            'group-domain': 'lists.example.org',
+            'main-list': 'main',
+            'unified-list': unified_list,
+            'index-template-file': 'INDEX_TEMPLATE.txt'
+            }, config_file)
+
+    shutil.copy(os.path.join(repo_root, 'groups', 'assets', 'INDEX_TEMPLATE.txt.default'),
+            os.path.join(assets_dir, 'INDEX_TEMPLATE.txt'))
+
+    people = max(1, members * 2 // 3)
+    per_subgroup = max(1, members // subgroups)
+    definitions = dict()
+
+    for index in range(subgroups):
+        subgroup = 'wg-%04d' % index
+        picked = sorted(set(rng.randrange(people) for _ in range(per_subgroup)))
+
+        groupdata = {
+            'name': 'Working Group %d' % index,
+            'description': 'Synthetic working group number %d.' % index,
+            'logo': 'groups/assets/default-image.svg',
+            'about-url': 'https://example.org/wg/%d' % index,
+            'code-of-conduct': 'https://example.org/coc',
+            'git': [{'repo': 'https://github.com/example/wg-%d' % index}],
+            'list-members': [make_member(person, rng) for person in picked]
+            }
+
+        with open(os.path.join(work_dir, 'groups', '%s.yml' % subgroup), 'w') as group_file:
+            yaml.safe_dump({subgroup: groupdata}, group_file, sort_keys=False)
+
+        definitions[subgroup] = [member['email'] for member in groupdata['list-members']]
+
+    return definitions
+
+def seed_server(state, definitions, seed=0):
+    '''Load ``state`` with a drifted copy of ``definitions``.
+
+    About 10% of each subgroup's members are missing and a few stale addresses
+    are present, so a -g run has real adds and removals to make.
+    '''
+
+    rng = random.Random(seed + 1)
+    everyone = set()
+
+    for subgroup, emails in definitions.items():
+        present = [email for email in emails if rng.random() >= 0.1]
+        stale = ['stale%d.%s@example.org' % (n, subgroup) for n in range(max(1, len(emails) // 50))]
+        state.add_subgroup(subgroup, members=present + stale, mods=['moderator@example.org'])
+        everyone.update(present)
+
+    state.add_subgroup(unified_list, members=sorted(everyone), mods=['moderator@example.org'])
+    state.add_subgroup('main', mods=['moderator@example.org'])
+
+def run_script(work_dir, server, flags, script=script):
+    '''Run the sync script; return (wall seconds, peak RSS in KiB, exit status).'''
+
+    env = dict(os.environ,
+            GROUPSIO_USERNAME='moderator@example.org',
+            GROUPSIO_PASSWORD='benchmark',
+            GROUPSIO_API_URL=api_url(server))
+
+    with open(os.path.join(work_dir, 'output.log'), 'w') as log_file:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, script] + flags, cwd=work_dir,
+                env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+        # wait4 reports the resource usage of this child alone
+
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+    return elapsed, usage.ru_maxrss, process.returncode
+
+def run_case(subgroups, members, latency, page_size, error_rate, error_status, extra_flags,
+        keep):
+    results = list()
+    work_dir = tempfile.mkdtemp(prefix='bench-sync-')
+
+    try:
+        definitions = make_directory(work_dir, subgroups, members)
+
+        for flag in ('-g', '-d'):
+            state = FakeGroupsio(group_name=group_name, latency=latency,
+                    page_size=page_size, error_rate=error_rate,
+                    error_status=error_status, seed=0)
+            seed_server(state, definitions)
+            server = serve(state)
+
+            try:
+                elapsed, peak_kib, status = run_script(work_dir, server, [flag] + extra_flags)
+            finally:
+                server.shutdown()
+                server.server_close()
+
+            results.append({
+                'mode': flag,
+                'subgroups': subgroups,
+                'members': members,
+                'wall_seconds': round(elapsed, 3),
+                'requests': state.request_count(),
+                'requests_by_endpoint': dict(sorted(state.requests.items())),
+                'bytes_sent': state.bytes_in,
+                'bytes_received': state.bytes_out,
+                'peak_rss_kib': peak_kib,
+                'exit_status': status
+                })
+
+            if status != 0:
+                with open(os.path.join(work_dir, 'output.log')) as log_file:
+                    print('WARN: %s run failed (%d):\n%s' % (flag, status, log_file.read()[-2000:]))
+    finally:
+        if keep:
+            print('INFO: Kept %s' % work_dir)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return results
+
+def main(argv):
+    cases = quick_cases
+    latency = 0.0
+    page_size = 100
+    error_rate = 0.0
+    error_status = 500
+    json_path = None
+    keep = False
+    extra_flags = list()
+
+    opts, args = getopt.getopt(argv, '', ['full', 'cases=', 'latency=', 'page-size=',
+            'error-rate=', 'error-status=', 'json=', 'keep', 'script-args='])
+
+    for opt, value in opts:
+        if opt == '--full':
+            cases = full_cases
+        elif opt == '--cases':
+            cases = [tuple(int(n) for n in case.split('x')) for case in value.split(',')]
+        elif opt == '--latency':
+            latency = float(value)
+        elif opt == '--page-size':
+            page_size = int(value)
+        elif opt == '--error-rate':
+            error_rate = float(value)
+        elif opt == '--error-status':
+            error_status = int(value)
+        elif opt == '--json':
+            json_path = value
+        elif opt == '--keep':
+            keep = True
+        elif opt == '--script-args':
+            extra_flags = value.split()
+
+    print('%-4s %10s %10s %10s %10s %12s %6s' % ('mode', 'subgroups', 'members',
+        'wall (s)', 'requests', 'peak (MiB)', 'exit'))
+
+    all_results = list()
+
+    for subgroups, members in cases:
+        for result in run_case(subgroups, members, latency, page_size, error_rate,
+                error_status, extra_flags, keep):
+            all_results.append(result)
+            print('%-4s %10d %10d %10.2f %10d %12.1f %6d' % (result['mode'],
+                result['subgroups'], result['members'], result['wall_seconds'],
+                result['requests'], result['peak_rss_kib'] / 1024.0, result['exit_status']))
+
+    if json_path:
+        with open(json_path, 'w') as json_file:
+            json.dump({
+                'latency': latency,
+                'page_size': page_size,
+                'error_rate': error_rate,
+                'error_status': error_status,
+                'script_args': extra_flags,
+                'results': all_results
+                }, json_file, indent=1)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
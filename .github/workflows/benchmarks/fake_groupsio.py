@@ -0,0 +1,346 @@
+#!/usr/local/bin/python3
+
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# A local stand-in for the parts of the Groups.io API used by
+# sync-yaml-to-groupsio.py.  It keeps all state in memory and is meant for
+# benchmarking and offline testing only.
+
+import sys
+import json
+import getopt
+import random
+import threading
+import time
+import uuid
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeGroupsio(object):
+    '''In-memory Groups.io state plus the knobs used to make it misbehave.
+
+    ``latency`` is added to every request (in seconds), ``page_size`` caps the
+    ``limit`` a client may ask for, and ``error_rate`` is the probability that
+    a request is answered with ``error_status`` instead of being handled.
+    Requests whose URL is longer than ``max_url_bytes`` are refused with 414,
+    as web servers and proxies do. Subgroups of other groups than
+    ``group_name`` can be added too, to stand in for several tenants.
+    '''
+
+    def __init__(self, group_name='graphql', org_domain='lists.example.org',
+            latency=0.0, page_size=100, error_rate=0.0, error_status=500,
+            retry_after=1, seed=None, max_url_bytes=8192):
+
+        self.group_name = group_name
+        self.groups = set([group_name])
+        self.org_domain = org_domain
+        self.latency = latency
+        self.page_size = page_size
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.max_url_bytes = max_url_bytes
+        self.random = random.Random(seed)
+
+        # subgroup name -> {email: (name, mod_status)}
+        self.subgroups = dict()
+        self.listings = dict()
+        self.sessions = dict()
+        self.requests = dict()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.lock = threading.Lock()
+
+    def add_subgroup(self, name, members=(), mods=(), group_name=None):
+        '''Create ``<group_name>+<name>`` with the given members and moderators.'''
+
+        group_name = group_name or self.group_name
+        self.groups.add(group_name)
+
+        subgroup = self.subgroups.setdefault('%s+%s' % (group_name, name), dict())
+        self.listings.pop('%s+%s' % (group_name, name), None)
+
+        for email in members:
+            subgroup[email.lower()] = ('', 'sub_modstatus_none')
+
+        for email in mods:
+            subgroup[email.lower()] = ('', 'sub_modstatus_moderator')
+
+        return subgroup
+
+    def members(self, name, group_name=None):
+        '''Return the non-moderator emails of ``<group_name>+<name>``.'''
+
+        return set(email for email, (_, mod_status) in
+                self.subgroups.get('%s+%s' % (group_name or self.group_name, name),
+                    dict()).items()
+                if mod_status == 'sub_modstatus_none')
+
+    def request_count(self):
+        return sum(self.requests.values())
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests.clear()
+            self.bytes_in = 0
+            self.bytes_out = 0
+
+    ## Endpoints.  Each returns (status, payload).
+
+    def login(self, params):
+        if not params.get('email') or not params.get('password'):
+            return 400, {'object': 'error', 'type': 'bad_request'}
+
+        csrf = uuid.uuid4().hex
+        self.sessions[csrf] = params['email']
+
+        return 200, {'object': 'login', 'user': {'email': params['email'], 'csrf_token': csrf}}
+
+    def getuser(self, params):
+        if params.get('session') not in self.sessions:
+            return 400, {'object': 'error', 'type': 'not_logged_in'}
+
+        return 200, {'object': 'user', 'email': self.sessions[params['session']]}
+
+    def _page(self, items, params):
+        limit = min(int(params.get('limit') or self.page_size), self.page_size)
+        start = int(params.get('page_token') or 0)
+        page = items[start:start + limit]
+        next_page_token = start + limit if start + limit < len(items) else 0
+
+        return {
+            'object': 'list',
+            'total_count': len(items),
+            'start_item': start,
+            'end_item': start + len(page),
+            'has_more': bool(next_page_token),
+            'next_page_token': next_page_token,
+            'data': page
+            }
+
+    def getsubgroups(self, params):
+        if params.get('group_name') not in self.groups:
+            return 400, {'object': 'error', 'type': 'inadequate_permissions'}
+
+        prefix = '%s+' % params['group_name']
+        items = [{'object': 'group', 'name': name, 'org_domain': self.org_domain}
+                for name in sorted(self.subgroups) if name.startswith(prefix)]
+
+        return 200, self._page(items, params)
+
+    def getmembers(self, params):
+        subgroup = self.subgroups.get(params.get('group_name'))
+
+        if subgroup is None:
+            return 400, {'object': 'error', 'type': 'inadequate_permissions'}
+
+        # Sorting a large subgroup for every page would make the server, not
+        # the client, the bottleneck; keep the listing until it changes
+
+        if params['group_name'] not in self.listings:
+            self.listings[params['group_name']] = [{'object': 'member_info', 'email': email,
+                'full_name': full_name, 'mod_status': mod_status}
+                for email, (full_name, mod_status) in sorted(subgroup.items())]
+
+        return 200, self._page(self.listings[params['group_name']], params)
+
+    def directadd(self, params):
+        if params.get('csrf') not in self.sessions:
+            return 400, {'object': 'error', 'type': 'bad_csrf'}
+
+        added = list()
+        errors = list()
+
+        for name in (params.get('subgroupnames') or '').split(','):
+            name = name.strip()
+
+            if not name:
+                continue
+
+            if name not in self.subgroups:
+                errors.append({'subgroup': name, 'status': 'no_such_subgroup'})
+                continue
+
+            for entry in (params.get('emails') or '').splitlines():
+                entry = entry.strip()
+
+                if not entry:
+                    continue
+
+                if '<' in entry:
+                    full_name, email = entry.rstrip('>').split('<', 1)
+                else:
+                    full_name, email = '', entry
+
+                email = email.strip().lower()
+
+                if email not in self.subgroups[name]:
+                    self.subgroups[name][email] = (full_name.strip(), 'sub_modstatus_none')
+                    self.listings.pop(name, None)
+                    added.append({'subgroup': name, 'email': email})
+
+        return 200, {'object': 'direct_add_results', 'total_emails': len(added),
+                'added_members': added, 'errors': errors}
+
+    def bulkremovemembers(self, params):
+        if params.get('csrf') not in self.sessions:
+            return 400, {'object': 'error', 'type': 'bad_csrf'}
+
+        subgroup = self.subgroups.get(params.get('group_name'))
+
+        if subgroup is None:
+            return 400, {'object': 'error', 'type': 'inadequate_permissions'}
+
+        removed = 0
+
+        for email in (params.get('emails') or '').splitlines():
+            email = email.strip().lower()
+
+            if email in subgroup and subgroup[email][1] == 'sub_modstatus_none':
+                del subgroup[email]
+                self.listings.pop(params['group_name'], None)
+                removed += 1
+
+        return 200, {'object': 'group', 'name': params.get('group_name'), 'removed': removed}
+
+
+class FakeGroupsioHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    endpoints = ('login', 'getuser', 'getsubgroups', 'getmembers', 'directadd',
+            'bulkremovemembers')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=()):
+        body = json.dumps(payload).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+
+        for header in headers:
+            self.send_header(*header)
+
+        self.end_headers()
+        self.wfile.write(body)
+
+        self.server.state.bytes_out += len(body)
+
+    def do_POST(self):
+        state = self.server.state
+        url = urlsplit(self.path)
+        endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8') if length else ''
+
+        params = dict((key, value[-1]) for key, value in
+                parse_qs(url.query, keep_blank_values=True).items())
+        params.update((key, value[-1]) for key, value in
+                parse_qs(body, keep_blank_values=True).items())
+
+        # The session cookie login set, standing in for Groups.io's own
+
+        cookie = SimpleCookie(self.headers.get('Cookie') or '').get('groupsio_session')
+        params['session'] = cookie.value if cookie is not None else None
+
+        if state.latency:
+            time.sleep(state.latency)
+
+        with state.lock:
+            state.requests[endpoint] = state.requests.get(endpoint, 0) + 1
+            state.bytes_in += len(self.path) + length
+
+            if endpoint not in self.endpoints:
+                status, payload = 404, {'object': 'error', 'type': 'not_found'}
+
+            elif state.max_url_bytes and len(self.path) > state.max_url_bytes:
+                status, payload = 414, {'object': 'error', 'type': 'uri_too_long'}
+
+            elif endpoint != 'login' and state.error_rate and state.random.random() < state.error_rate:
+                status, payload = state.error_status, {'object': 'error', 'type': 'injected_error'}
+
+            else:
+                status, payload = getattr(state, endpoint)(params)
+
+        headers = list()
+
+        if status == 429:
+            headers.append(('Retry-After', str(state.retry_after)))
+
+        if endpoint == 'login' and status == 200:
+            headers.append(('Set-Cookie', 'groupsio_session=%s; Path=/' % payload['user']['csrf_token']))
+
+        self._send(status, payload, headers)
+
+    do_GET = do_POST
+
+
+def serve(state, host='127.0.0.1', port=0):
+    '''Start serving ``state`` in a background thread; return the server.
+
+    The API base URL is ``http://<host>:<port>/api/v1``.
+    '''
+
+    server = ThreadingHTTPServer((host, port), FakeGroupsioHandler)
+    server.daemon_threads = True
+    server.state = state
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    return server
+
+
+def api_url(server):
+    return 'http://%s:%s/api/v1' % server.server_address[:2]
+
+
+if __name__ == '__main__':
+    host = '127.0.0.1'
+    port = 8080
+    subgroups = list()
+    state = FakeGroupsio()
+
+    opts, args = getopt.getopt(sys.argv[1:], '', ['host=', 'port=', 'group-name=',
+            'subgroup=', 'latency=', 'page-size=', 'error-rate=', 'error-status=',
+            'max-url-bytes='])
+
+    for opt, value in opts:
+        if opt == '--host':
+            host = value
+        elif opt == '--port':
+            port = int(value)
+        elif opt == '--group-name':
+            state.group_name = value
+            state.groups = set([value])
+        elif opt == '--subgroup':
+            subgroups.append(value)
+        elif opt == '--latency':
+            state.latency = float(value)
+        elif opt == '--page-size':
+            state.page_size = int(value)
+        elif opt == '--error-rate':
+            state.error_rate = float(value)
+        elif opt == '--error-status':
+            state.error_status = int(value)
+        elif opt == '--max-url-bytes':
+            state.max_url_bytes = int(value)
+
+    for subgroup in subgroups:
+        state.add_subgroup(subgroup, mods=['moderator@example.org'])
+
+    server = serve(state, host, port)
+    print('Serving fake Groups.io at %s' % api_url(server))
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,32 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Keep Groups.io subgroups and the member directory in line with groups/*.yml.
+#
+#   config       groups/assets/config.yml and the index template
+#   definitions  finding, loading and validating subgroup definitions
+#   profiles     shared member profiles and their rendered cards
+#   model        compact records of the config, subgroups, members and roles
+#   validate     checking every definition before any network I/O
+#   render       directory pages and member cards
+#   assets       minified, resized and content-hashed images, for --assets
+#   export       the directory as NDJSON and a JSON search index, for --export
+#   manifest     content hashes for incremental directory builds
+#   snapshot     Groups.io membership kept between runs
+#   client       the Groups.io API client and its request scheduler
+#   session      pooled connections and the cached login for --session-cache
+#   planner      coalescing of directadd calls, chunking of removals
+#   sync         reconciling subgroups and the unified list
+#   journal      the plan of mutations, for --plan-only and --resume
+#   store        the SQLite store for --store, and query-directory.py
+#   metrics      phase timings, request metrics and profiles
+#   watch        change notification for --watch
+#   shard        splitting a run with --shard and merging the results
+#   changes      scoping -g to what changed since a git revision
+#   tenants      several groups synced in one process, for --tenant
+#   cli          the sync-yaml-to-groupsio.py command line
+#
+# Importing the package, or any of these modules, has no side effects. Only
+# client (and session, when it opens connections) imports requests, and only
+# the code paths that talk to Groups.io import them.
@@ -0,0 +1,282 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Optimized, content-hashed copies of the logos and photos on directory pages.
+
+import io
+import os
+import re
+import json
+import posixpath
+import importlib.util
+from xml.etree import ElementTree
+
+from .manifest import content_hash
+
+### SVG minification ###
+
+# Only what is certain not to change how the image looks is dropped: the XML
+# declaration and a plain SVG doctype, comments, metadata, editor state, and
+# whitespace between tags and attributes. Anything inside CDATA is left alone.
+
+_cdata = re.compile(r'(<!\[CDATA\[.*?\]\]>)', re.S)
+_declaration = re.compile(r'^\s*<\?xml[^>]*\?>', re.I)
+_doctype = re.compile(r'<!DOCTYPE\s+svg\s+PUBLIC\s+"[^"]*"\s+"[^"]*"\s*>')
+_comment = re.compile(r'<!--.*?-->', re.S)
+_metadata = re.compile(r'<metadata\b.*?</metadata>|<metadata\b[^>]*/>', re.S)
+_editor = re.compile(r'<(sodipodi|inkscape):[\w-]+\b(?:[^>]*/>|.*?</\1:[\w-]+>)', re.S)
+_editor_attribute = re.compile(r'\s(?:xmlns:)?(?:sodipodi|inkscape)(?::[\w-]+)?\s*=\s*"[^"]*"')
+_tag = re.compile(r'<[^!?][^>]*>')
+_between_tags = re.compile(r'>\s+<')
+
+def _minify_tag(match):
+    tag = re.sub(r'\s+', ' ', match.group(0))
+
+    return tag.replace(' />', '/>').replace(' >', '>')
+
+def minify_svg(content):
+    '''Return the SVG ``content`` (bytes) minified, or as it was if it isn't
+    UTF-8 or wouldn't parse afterwards.'''
+
+    try:
+        text = content.decode('utf-8')
+    except UnicodeDecodeError:
+        return content
+
+    declaration = _declaration.match(text)
+
+    if declaration and re.search(r'encoding=["\'](?!utf-8)', declaration.group(0), re.I):
+        return content
+
+    # Whitespace between tags only matters around text
+
+    between = '> <' if re.search(r'<(text|tspan|textPath)\b', text) else '><'
+    pieces = _cdata.split(text)
+
+    for index in range(0, len(pieces), 2):
+        piece = pieces[index]
+
+        if index == 0:
+            piece = _doctype.sub('', _declaration.sub('', piece), 1)
+
+        piece = _comment.sub('', piece)
+        piece = _metadata.sub('', piece)
+        piece = _editor.sub('', piece)
+        piece = _editor_attribute.sub('', piece)
+        piece = _tag.sub(_minify_tag, piece)
+        pieces[index] = _between_tags.sub(between, piece)
+
+    minified = ''.join(pieces).strip().encode('utf-8')
+
+    try:
+        ElementTree.fromstring(minified)
+    except ElementTree.ParseError:
+        return content
+
+    return minified if len(minified) < len(content) else content
+
+### Raster images ###
+
+raster_formats = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+def resize_raster(content, box):
+    '''Return the image ``content`` (bytes) scaled down to fit ``box``, a
+    (width, height) where either may be None. Images that are already small
+    enough, and animations, are returned as they are. Needs Pillow.'''
+
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(content)) as image:
+        if getattr(image, 'is_animated', False):
+            return content
+
+        image_format = image.format
+        image = ImageOps.exif_transpose(image)
+        width, height = box
+
+        if width and image.width > width:
+            size = (width, max(1, round(image.height * width / image.width)))
+        elif height and image.height > height:
+            size = (max(1, round(image.width * height / image.height)), height)
+        else:
+            return content
+
+        resized = image.resize(size, Image.LANCZOS)
+
+    output = io.BytesIO()
+
+    if image_format == 'JPEG':
+        resized.save(output, format=image_format, optimize=True, quality=85)
+    else:
+        resized.save(output, format=image_format, optimize=True)
+
+    return output.getvalue()
+
+### The asset stage ###
+
+class AssetPipeline(object):
+    '''The images on the directory pages, as optimized copies in ``assets_dir``.
+
+    url() takes a 'logo' or 'photo' value and where it's displayed, and gives
+    back the path to use instead. Local images (paths under ``output_dir``,
+    where the pages are) are minified if they're SVG and scaled down to the
+    displayed size if they're raster images, then written to ``assets_dir``
+    (relative to ``output_dir``) named after a hash of the result, so they
+    can be cached for as long as browsers like. Anything else, like a URL, is
+    returned as it is.
+
+    Files that come out the same are written once. What each image and size
+    came out as is kept in ``.asset-cache.json`` in ``assets_dir``, keyed on
+    the image's content hash, so images are only processed again when they
+    change. save() writes the cache and deletes the files this build didn't
+    use; ``digest`` then sums up every url() given out.
+    '''
+
+    version = 1
+
+    # Files this writes, and so may delete: a hash and an extension
+
+    output_name = re.compile(r'^[0-9a-f]{16}\.\w+$')
+
+    def __init__(self, output_dir, assets_dir):
+        self.output_dir = output_dir
+        self.assets_dir = assets_dir
+        self.directory = os.path.join(output_dir, assets_dir)
+        self.cache_path = os.path.join(self.directory, '.asset-cache.json')
+        self.cache = dict()
+        self.urls = dict()
+        self.used = set()
+        self.processed = 0
+        self.digest = ''
+        self.resizes = importlib.util.find_spec('PIL') is not None
+        self.warned = False
+
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, 'r') as cache_file:
+                    data = json.load(cache_file)
+
+                if data.get('version') == self.version:
+                    self.cache = data['assets']
+            except ValueError:
+                print('WARN: Ignoring unreadable asset cache: %s' % self.cache_path)
+
+    def url(self, value, box):
+        '''Return what to link to for the image ``value`` shown in ``box``.'''
+
+        key = (value, box)
+        url = self.urls.get(key)
+
+        if url is None:
+            url = self.urls[key] = self._process(value, box)
+
+        return url
+
+    def add_subgroup(self, subgroup):
+        '''Process every image a Subgroup's pages show, ahead of rendering them.'''
+
+        from .render import logo_box, photo_box
+
+        if subgroup.logo:
+            self.url(subgroup.logo, logo_box)
+
+        for member in subgroup.members:
+            if member.photo:
+                self.url(member.photo, photo_box)
+
+    def _local_path(self, value):
+        '''Return the file ``value`` names under ``output_dir``, or None.'''
+
+        if re.match(r'^([a-z][a-z0-9+.-]*:|/|\\)', value, re.I) or '\\' in value:
+            return None
+
+        path = os.path.normpath(os.path.join(self.output_dir, value))
+        relative = os.path.relpath(path, self.output_dir or os.curdir)
+
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            return None
+
+        return path if os.path.isfile(path) else None
+
+    def _process(self, value, box):
+        path = self._local_path(value)
+
+        if path is None:
+            return value
+
+        with open(path, 'rb') as image_file:
+            content = image_file.read()
+
+        extension = os.path.splitext(path)[1].lower()
+
+        if extension == '.svg':
+            processor = 'svg'
+        elif extension in raster_formats and self.resizes:
+            processor = 'raster'
+        else:
+            processor = 'copy'
+
+            if extension in raster_formats and not self.warned:
+                print('WARN: Pillow isn\'t installed, so raster images aren\'t resized.')
+                self.warned = True
+
+        key = '%s %s %s %s' % (content_hash(content), box[0], box[1], processor)
+        name = self.cache.get(key)
+
+        if name is None or not os.path.exists(os.path.join(self.directory, name)):
+            if processor == 'svg':
+                content = minify_svg(content)
+            elif processor == 'raster':
+                try:
+                    content = resize_raster(content, box)
+                except (OSError, ValueError) as error:
+                    print('WARN: Could not resize %s (%s), using it as it is.' % (value, error))
+
+            name = '%s%s' % (content_hash(content)[:16], extension)
+            output_path = os.path.join(self.directory, name)
+
+            # Identical results share one file
+
+            if not os.path.exists(output_path):
+                os.makedirs(self.directory, exist_ok=True)
+
+                with open('%s.tmp' % output_path, 'wb') as output_file:
+                    output_file.write(content)
+
+                os.replace('%s.tmp' % output_path, output_path)
+
+            self.cache[key] = name
+            self.processed += 1
+
+        self.used.add(name)
+
+        return posixpath.join(self.assets_dir.replace(os.sep, '/'), name)
+
+    def save(self):
+        '''Write the cache and delete the files this build didn't use.'''
+
+        self.cache = dict((key, name) for key, name in self.cache.items() if name in self.used)
+        self.digest = content_hash('\n'.join(sorted('%s %s %s %s' % (value, box[0], box[1], url)
+            for (value, box), url in self.urls.items())))
+
+        removed = 0
+
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if self.output_name.match(name) and name not in self.used:
+                    os.remove(os.path.join(self.directory, name))
+                    removed += 1
+
+        if self.used or os.path.exists(self.cache_path):
+            os.makedirs(self.directory, exist_ok=True)
+
+            with open('%s.tmp' % self.cache_path, 'w') as cache_file:
+                json.dump({'version': self.version, 'assets': self.cache}, cache_file, indent=1,
+                        sort_keys=True)
+                cache_file.write('\n')
+
+            os.replace('%s.tmp' % self.cache_path, self.cache_path)
+
+        print('INFO: %d image(s) in %s, %d processed, %d removed.' % (len(self.used),
+            self.directory, self.processed, removed))
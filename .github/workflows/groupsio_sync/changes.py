@@ -0,0 +1,129 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Working out what a git revision range changed, for --changed-since.
+
+import os
+import subprocess
+
+from .definitions import parse_yaml
+from .model import build_subgroup
+
+def changed_files(revision, group_configs_dir):
+    '''Return the definition files changed between ``revision`` and now.
+
+    Paths are returned as group_files() yields them. Returns None when the
+    changes can't be scoped and everything has to be synced instead: the
+    revision is unknown (or all zeros, as on a new branch), git fails, or
+    something under assets/ changed.
+    '''
+
+    if not revision or not revision.strip('0'):
+        print('INFO: No revision to compare against, syncing everything.')
+        return None
+
+    try:
+        output = subprocess.run(['git', 'diff', '--name-only', '--no-renames', '--relative', '-z',
+                revision, '--', group_configs_dir], check=True, capture_output=True).stdout
+    except (OSError, subprocess.CalledProcessError) as error:
+        print('WARN: Could not compare against %s (%s), syncing everything.' % (revision, error))
+        return None
+
+    assets_dir = os.path.normpath(os.path.join(group_configs_dir, 'assets'))
+    changed = set()
+
+    for path in output.decode('utf-8').split('\0'):
+        if not path:
+            continue
+
+        path = os.path.normpath(path)
+
+        if path.startswith(assets_dir + os.sep):
+            print('INFO: %s changed, syncing everything.' % path)
+            return None
+
+        if path.endswith('.yml'):
+            changed.add(path)
+
+    return changed
+
+def load_revision(revision, path):
+    '''Return the parsed contents of ``path`` at ``revision``, or None if it
+    didn't exist then.'''
+
+    try:
+        content = subprocess.run(['git', 'show', '%s:./%s' % (revision, path.replace(os.sep, '/'))],
+                check=True, capture_output=True).stdout
+    except subprocess.CalledProcessError:
+        return None
+
+    return parse_yaml(content, '%s:%s' % (revision, path))
+
+def revision_subgroups(document, reserved=(), profiles=None):
+    '''Return the (subgroup, Subgroup) entries of a file's contents at an older
+    revision, which may not pass today's checks. Unusable members are skipped,
+    as the sync of the time did, and subgroups which aren't mappings or are
+    in ``reserved`` are listed with None.'''
+
+    entries = list()
+
+    if not isinstance(document, dict):
+        return entries
+
+    for local_subgroup, groupdata in document.items():
+        if not groupdata or not isinstance(groupdata, dict) or local_subgroup in reserved:
+            entries.append((local_subgroup, None))
+        else:
+            entries.append((local_subgroup, build_subgroup(local_subgroup, groupdata, profiles)))
+
+    return entries
+
+def contributions(entries, group_name, groupsio_subgroups):
+    '''Return what one definition file adds to the unified list.
+
+    That is ({email: name} of the members of its subgroups which exist at
+    Groups.io, emails it opts out of the unified list), worked out the same
+    way as a full sync does from the file's (subgroup, Subgroup) ``entries``.
+    '''
+
+    members = dict()
+    opt_outs = set()
+
+    for local_subgroup, subgroup in entries:
+        if subgroup is None:
+            continue
+
+        opt_outs.update(member.email for member in subgroup.members if not member.meta_list)
+
+        if '%s+%s' % (group_name, local_subgroup) in groupsio_subgroups:
+            members.update((member.email, member.name) for member in subgroup.members)
+
+    return members, opt_outs
+
+def unified_delta(current, previous):
+    '''Return (to_add {email: name}, to_remove) for the unified list.
+
+    ``current`` maps every definition file to its contributions now, and
+    ``previous`` maps each changed file to its contributions at the old
+    revision (files which didn't exist map to empty contributions).
+    '''
+
+    def unified(contributions_by_file):
+        members = dict()
+        opt_outs = set()
+
+        for local_file in sorted(contributions_by_file):
+            file_members, file_opt_outs = contributions_by_file[local_file]
+            members.update(file_members)
+            opt_outs.update(file_opt_outs)
+
+        return dict((email, name) for email, name in members.items() if email not in opt_outs)
+
+    now = unified(current)
+    before = unified(dict(current, **previous))
+
+    to_add = dict((email, name) for email, name in now.items() if email not in before)
+    to_remove = set(before) - set(now)
+
+    return to_add, to_remove
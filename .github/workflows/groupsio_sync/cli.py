@@ -0,0 +1,1003 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Command-line entry point: sync-yaml-to-groupsio.py [-d] [-g] [options]
+
+import os
+import sys
+import getopt
+from datetime import datetime
+
+from .config import ConfigError, load_config, load_index_template
+from .definitions import DocumentCache, default_stream_above, group_files
+from .profiles import ProfileRegistry
+from .manifest import (DirectoryManifest, content_hash, relative_path, source_hash,
+        write_if_changed)
+from .metrics import Metrics
+from .planner import bulkremove_max_emails
+from .shard import PartialResult, merge_partials, parse_shard, shard_of
+from .snapshot import MembershipSnapshot
+from .validate import ValidationError, validate_definitions
+
+long_options = ['concurrency=','rate=','burst=','retries=','snapshot=','snapshot-ttl=',
+        'refresh','manifest=','metrics=','prometheus=','profile=','watch','debounce=',
+        'shard=','partial=','merge','changed-since=','journal=','plan-only','resume',
+        'store=','parse-cache=','jobs=','remove-chunk=','session-cache=','tenant=',
+        'tenant-jobs=','export=','stream-above=','page-size=','assets=']
+
+# Where --plan-only and --resume keep the journal unless --journal says otherwise
+
+default_journal_path = '.groupsio-journal.jsonl'
+
+# Subgroups with more members than this get their cards split over several
+# pages, unless --page-size says otherwise
+
+default_page_size = 500
+
+def usage(error):
+    '''Report a bad command line, as getopt would, and exit.'''
+
+    print('ERROR: %s' % error)
+    print('Usage: sync-yaml-to-groupsio.py [-d] [-g] [options] (see ABOUT.md for the options)')
+    sys.exit(2)
+
+def parse_options(argv):
+    '''Return the settings for a run from its command-line arguments.'''
+
+    options = {
+        'create_directory': False,
+        'update_groupsio': False,
+        'group_configs_dir': 'groups',
+        'output_dir': '',
+        'root': '',
+        'concurrency': 8,
+        'rate': 10.0,
+        'burst': 10,
+        'retries': 4,
+        'snapshot_path': None,
+        'snapshot_ttl': 3600,
+        'snapshot_refresh': False,
+        'manifest_path': None,
+        'metrics_path': None,
+        'prometheus_path': None,
+        'profile_dir': None,
+        'watch': False,
+        'debounce': 2.0,
+        'shard': None,
+        'partial_path': None,
+        'merge': False,
+        'partials': list(),
+        'changed_since': None,
+        'journal_path': None,
+        'plan_only': False,
+        'resume': False,
+        'store_path': None,
+        'parse_cache_path': None,
+        'jobs': os.cpu_count() or 1,
+        'remove_chunk': bulkremove_max_emails,
+        'session_cache_path': None,
+        'tenants': list(),
+        'tenant_jobs': 4,
+        'export_path': None,
+        'stream_above': default_stream_above,
+        'page_size': default_page_size,
+        'assets_dir': None
+        }
+
+    try:
+        opts,args = getopt.getopt(argv,'dg',long_options)
+    except getopt.GetoptError as error:
+        usage(error)
+
+    for opt in opts:
+        try:
+            if opt[0] == '-d':
+                options['create_directory'] = True
+            elif opt[0] == '-g':
+                options['update_groupsio'] = True
+            elif opt[0] == '--concurrency':
+                options['concurrency'] = max(1, int(opt[1]))
+            elif opt[0] == '--rate':
+                options['rate'] = float(opt[1])
+            elif opt[0] == '--burst':
+                options['burst'] = max(1, int(opt[1]))
+            elif opt[0] == '--retries':
+                options['retries'] = max(0, int(opt[1]))
+            elif opt[0] == '--snapshot':
+                options['snapshot_path'] = opt[1]
+            elif opt[0] == '--snapshot-ttl':
+                options['snapshot_ttl'] = int(opt[1])
+            elif opt[0] == '--refresh':
+                options['snapshot_refresh'] = True
+            elif opt[0] == '--manifest':
+                options['manifest_path'] = opt[1]
+            elif opt[0] == '--metrics':
+                options['metrics_path'] = opt[1]
+            elif opt[0] == '--prometheus':
+                options['prometheus_path'] = opt[1]
+            elif opt[0] == '--profile':
+                options['profile_dir'] = opt[1]
+            elif opt[0] == '--watch':
+                options['watch'] = True
+            elif opt[0] == '--debounce':
+                options['debounce'] = max(0.0, float(opt[1]))
+            elif opt[0] == '--shard':
+                options['shard'] = parse_shard(opt[1])
+            elif opt[0] == '--partial':
+                options['partial_path'] = opt[1]
+            elif opt[0] == '--merge':
+                options['merge'] = True
+            elif opt[0] == '--changed-since':
+                options['changed_since'] = opt[1]
+            elif opt[0] == '--journal':
+                options['journal_path'] = opt[1]
+            elif opt[0] == '--plan-only':
+                options['plan_only'] = True
+            elif opt[0] == '--resume':
+                options['resume'] = True
+            elif opt[0] == '--store':
+                options['store_path'] = opt[1]
+            elif opt[0] == '--parse-cache':
+                options['parse_cache_path'] = opt[1]
+            elif opt[0] == '--jobs':
+                options['jobs'] = max(1, int(opt[1]))
+            elif opt[0] == '--remove-chunk':
+                options['remove_chunk'] = max(1, int(opt[1]))
+            elif opt[0] == '--session-cache':
+                options['session_cache_path'] = opt[1]
+            elif opt[0] == '--tenant':
+                options['tenants'].append(opt[1])
+            elif opt[0] == '--tenant-jobs':
+                options['tenant_jobs'] = max(1, int(opt[1]))
+            elif opt[0] == '--export':
+                options['export_path'] = opt[1]
+            elif opt[0] == '--stream-above':
+                options['stream_above'] = max(0, int(opt[1]))
+            elif opt[0] == '--page-size':
+                options['page_size'] = max(0, int(opt[1]))
+            elif opt[0] == '--assets':
+                options['assets_dir'] = opt[1]
+        except ValueError as error:
+            usage('%s: %s' % (opt[0], error))
+
+    if options['shard'] and not options['partial_path']:
+        options['partial_path'] = 'shard-%d-of-%d.json' % options['shard']
+
+    if (options['plan_only'] or options['resume']) and not options['journal_path']:
+        options['journal_path'] = default_journal_path
+
+    options['partials'] = args
+
+    return options
+
+def connect(options, metrics):
+    '''Log into Groups.io; return a GroupsioClient, or None if that fails.
+
+    With --session-cache, a cached session is checked with one cheap call
+    and reused if Groups.io still accepts it; the script only logs in when
+    there's none or it has expired. Network libraries are only imported here,
+    so runs that never talk to Groups.io don't load them.
+    '''
+
+    import asyncio
+    from .client import GroupsioClient, groupsio_api_url
+    from .session import SessionCache, pooled_session
+
+    user = os.environ['GROUPSIO_USERNAME'] # An account with permissions defined in README.md
+    password = os.environ['GROUPSIO_PASSWORD']
+
+    client = GroupsioClient(pooled_session(options['concurrency']), options['concurrency'],
+            options['rate'], options['burst'], options['retries'], metrics)
+
+    cache = None
+
+    if options['session_cache_path']:
+        cache = SessionCache(options['session_cache_path'], user, password)
+        client.csrf = cache.restore(client.session, groupsio_api_url)
+
+    with metrics.phase('login'):
+        if client.csrf is not None:
+            if asyncio.run(client.logged_in()):
+                print('INFO: Reusing the cached Groups.io session.')
+                return client
+
+            print('INFO: Cached Groups.io session expired, logging in again.')
+            client.session.cookies.clear()
+            client.csrf = None
+
+        login = asyncio.run(client.login(user, password))
+
+    if 'user' not in login:
+        if cache is not None:
+            cache.clear()
+
+        return None
+
+    if cache is not None:
+        cache.save(client.session, groupsio_api_url, client.csrf)
+
+    return client
+
+def main(argv=None):
+    options = parse_options(sys.argv[1:] if argv is None else argv)
+    metrics = Metrics(options['profile_dir'])
+
+    if options['tenants'] and (options['watch'] or options['shard'] or options['merge'] or
+            options['resume']):
+        print('ERROR: --tenant can\'t be combined with --watch, --shard, --merge or --resume.')
+        sys.exit(1)
+
+    if options['assets_dir'] and (options['shard'] or options['merge']):
+        print('ERROR: --assets can\'t be combined with --shard or --merge.')
+        sys.exit(1)
+
+    # A shard only knows the unified list's changes, not all of its members,
+    # which is what --merge reconciles it against
+
+    if options['changed_since'] and (options['shard'] or options['merge']):
+        print('ERROR: --changed-since can\'t be combined with --shard or --merge.')
+        sys.exit(1)
+
+    if options['watch']:
+        watch(options, metrics)
+        return
+
+    try:
+        if options['tenants']:
+            if tenants(options, metrics):
+                sys.exit(1)
+        elif options['merge']:
+            merge(options, metrics)
+        elif options['resume']:
+            resume(options, metrics)
+        else:
+            run(options, metrics)
+    except ValidationError as error:
+        error.report()
+        sys.exit(1)
+    finally:
+        print('INFO: Phases: %s.' % metrics.summary())
+        write_metrics(options, metrics)
+
+def write_metrics(options, metrics):
+    if options['metrics_path']:
+        metrics.write_json(options['metrics_path'])
+
+    if options['prometheus_path']:
+        metrics.write_prometheus(options['prometheus_path'])
+
+def write_index(group_configs_dir, index_template, subgroup_index, manifest=None,
+        output_dir=''):
+    '''Write README.md in ``output_dir``, listing the subgroups in ``subgroup_index``.
+
+    With a ``manifest``, the date on the index only moves forward when the
+    list of subgroups changes.
+    '''
+
+    subgroup_list = ''
+
+    # Construct the subgroup list
+
+    for subgroup in sorted(subgroup_index, key = lambda name:name['name']):
+        subgroup_list += '* [%s](%s)\n' % (subgroup['name'], subgroup['path'])
+
+    generated_date = datetime.now().strftime("%Y-%m-%d at %H:%M:%S %Z")
+
+    if manifest is not None:
+        generated_date = manifest.index_date(content_hash(index_template.template),
+                subgroup_list, generated_date)
+
+    write_if_changed(os.path.join(output_dir, 'README.md'), index_template.substitute({
+        'subgroups': subgroup_list,
+        'group_configs_dir': group_configs_dir,
+        'generated_date': generated_date
+        }))
+
+def merge(options, metrics):
+    '''Combine the partial results of --shard runs into one.
+
+    With -d, writes the pages the shards rendered and README.md. With -g,
+    reconciles the unified list once, against every shard's members.
+    '''
+
+    group_configs_dir = options['group_configs_dir']
+
+    try:
+        with metrics.phase('config'):
+            config = load_config(group_configs_dir)
+            index_template = load_index_template(group_configs_dir, config)
+
+        merged = merge_partials(options['partials'])
+    except (ConfigError, ValueError) as error:
+        print('WARN: %s Exiting.' % error)
+        return
+
+    if options['create_directory']:
+        if not merged.directory:
+            print('WARN: Not every shard was run with -d. Exiting.')
+            return
+
+        with metrics.phase('index'):
+            from .render import remove_stale_parts
+
+            for page_path, content in sorted(merged.pages.items()):
+                write_if_changed(page_path, content)
+                remove_stale_parts(page_path, merged.pages)
+
+            write_index(group_configs_dir, index_template, merged.subgroup_index)
+
+    if options['update_groupsio'] and config.unified_list:
+        import asyncio
+        from .sync import GroupsioSync
+
+        # Without every shard's members, the unified list would lose people
+
+        if not merged.groupsio:
+            print('WARN: Not every shard was run with -g. Exiting.')
+            return
+
+        client = connect(options, metrics)
+
+        if client is None:
+            print('WARN: Could not log into Groups.io. Exiting.')
+            return
+
+        snapshot = MembershipSnapshot(options['snapshot_path'], options['snapshot_ttl'],
+                options['snapshot_refresh'])
+
+        sync = GroupsioSync(client, snapshot, config.group_name, config.unified_list,
+                max_removals=options['remove_chunk'])
+        sync.all_local_valid_members.update(merged.members)
+
+        asyncio.run(sync.run((), merged.no_meta_list, journal=journal(options),
+            plan_only=options['plan_only']))
+        snapshot.save()
+        client.scheduler.report()
+
+def journal(options):
+    '''Return the MutationJournal for --journal, or None.'''
+
+    if not options['journal_path']:
+        return None
+
+    from .journal import MutationJournal
+
+    return MutationJournal(options['journal_path'])
+
+def resume(options, metrics):
+    '''Apply whatever is left of the plan in the journal, without fetching
+    any members from Groups.io first.'''
+
+    import asyncio
+    from .sync import GroupsioSync
+
+    try:
+        with metrics.phase('config'):
+            config = load_config(options['group_configs_dir'])
+    except ConfigError as error:
+        print('WARN: %s Exiting.' % error)
+        return
+
+    mutations = journal(options)
+
+    try:
+        if not mutations.load():
+            print('INFO: No journal at %s, nothing to resume.' % options['journal_path'])
+            return
+    except ValueError as error:
+        print('WARN: %s Exiting.' % error)
+        return
+
+    batches = mutations.pending()
+
+    print('INFO: Resuming %s: %d of %d batch(es) left to apply.' %
+            (options['journal_path'], len(batches), len(mutations.batches)))
+
+    client = connect(options, metrics)
+
+    if client is None:
+        print('WARN: Could not log into Groups.io. Exiting.')
+        return
+
+    snapshot = MembershipSnapshot(options['snapshot_path'], options['snapshot_ttl'],
+            options['snapshot_refresh'])
+
+    sync = GroupsioSync(client, snapshot, config.group_name)
+
+    with metrics.phase('apply'):
+        asyncio.run(sync.apply(batches, mutations.definitions, mutations))
+
+    mutations.close()
+    snapshot.save()
+    client.scheduler.report()
+
+def watch(options, metrics):
+    '''Sync once, then again each time groups/ changes, until interrupted.
+
+    The Groups.io session, the membership snapshot, the directory manifest and
+    the parsed definitions stay in memory between passes. Unchanged subgroups
+    are skipped by their definition hashes and unchanged pages by the
+    manifest, so a pass only costs what actually changed. Changes arriving
+    within ``debounce`` seconds of each other are synced together.
+    '''
+
+    import time
+    import asyncio
+    from .watch import watcher
+
+    group_configs_dir = options['group_configs_dir']
+
+    if not options['manifest_path']:
+        options['manifest_path'] = ':memory:'
+
+    # Start watching before the first pass so edits made during it aren't missed
+
+    changes = watcher(group_configs_dir)
+    state = dict()
+
+    try:
+        while True:
+            started = time.perf_counter()
+
+            try:
+                run(options, metrics, state)
+            except ValidationError as error:
+                error.report()
+            finally:
+                write_metrics(options, metrics)
+
+            print('INFO: Synced in %.1fs. Watching %s for changes.' %
+                    (time.perf_counter() - started, group_configs_dir))
+
+            # Only the first pass ignores the snapshot
+
+            if 'snapshot' in state:
+                state['snapshot'].refresh = False
+
+            changed = changes.wait()
+
+            while True:
+                more = changes.wait(options['debounce'])
+
+                if not more:
+                    break
+
+                changed.update(more)
+
+            print('INFO: %d file(s) changed: %s' % (len(changed), ', '.join(sorted(changed))))
+
+            client = state.get('client')
+
+            if client is not None and not asyncio.run(client.logged_in()):
+                print('INFO: Groups.io session expired, logging in again.')
+                del state['client']
+    except KeyboardInterrupt:
+        print('INFO: Stopped watching.')
+
+def tenants(options, metrics):
+    '''Run each --tenant, several at once, in one process.
+
+    Every tenant is a run of its own (see tenants.tenant_options()), but they
+    share one Groups.io login, connection pool and request scheduler, so the
+    rate limits hold across all of them. A tenant which fails doesn't stop
+    the others. Each tenant's output is printed as one block once it's done.
+    Returns the tenants which failed.
+    '''
+
+    import time
+    import threading
+    import traceback
+    from concurrent.futures import ThreadPoolExecutor
+    from .tenants import capturing, tenant_options
+
+    roots = options['tenants']
+
+    # Profiles are taken per thread, so only make them of one tenant at a time
+
+    workers = 1 if options['profile_dir'] else min(options['tenant_jobs'], len(roots))
+    jobs = max(1, options['jobs'] // workers)
+
+    # Log in for whichever tenant needs it first, then give each tenant a view
+    # of that client which reports its requests separately
+
+    lock = threading.Lock()
+    shared = dict()
+
+    def login(tenant, tenant_metrics):
+        with lock:
+            if 'client' not in shared:
+                shared['client'] = connect(options, metrics)
+
+        client = shared['client']
+
+        return None if client is None else client.share()
+
+    def run_tenant(root):
+        output.capture()
+        started = time.perf_counter()
+        failed = True
+
+        try:
+            run(tenant_options(options, root, jobs), metrics, login=login)
+            failed = False
+        except ValidationError as error:
+            error.report()
+        except Exception:
+            traceback.print_exc(file=sys.stdout)
+
+        return failed, time.perf_counter() - started, output.release()
+
+    failed = list()
+    started = time.perf_counter()
+
+    with capturing() as output, ThreadPoolExecutor(workers) as executor:
+        for root, (tenant_failed, seconds, report) in zip(roots, executor.map(run_tenant, roots)):
+            print('INFO: ### Tenant %s (%s in %.1fs) ###' %
+                    (root, 'failed' if tenant_failed else 'done', seconds))
+            output.write(report)
+
+            if tenant_failed:
+                failed.append(root)
+
+    print('INFO: Ran %d tenant(s) in %.1fs, %d failed%s.' % (len(roots),
+        time.perf_counter() - started, len(failed),
+        ' (%s)' % ', '.join(failed) if failed else ''))
+
+    return failed
+
+def run(options, metrics, state=None, login=connect):
+    '''Build the directory and/or update Groups.io, as ``options`` say.
+
+    ``state`` carries the Groups.io client, the snapshot, the manifest, the
+    store, the profiles and the parsed definitions from one pass of --watch to
+    the next. ``login(options, metrics)`` is called for a client when one is
+    first needed.
+    '''
+
+    if state is None:
+        state = dict()
+
+    create_directory = options['create_directory']
+    update_groupsio = options['update_groupsio']
+    group_configs_dir = options['group_configs_dir']
+    root = options['root']
+
+    try:
+        with metrics.phase('config'):
+            config = load_config(group_configs_dir)
+            index_template = load_index_template(group_configs_dir, config)
+    except ConfigError as error:
+        print('WARN: %s Exiting.' % error)
+        return
+
+    group_name = config.group_name
+    group_domain = config.group_domain
+    main_list = config.main_list
+    unified_list = config.unified_list
+
+    shard = options['shard']
+
+    ### Read every definition before talking to anyone ###
+
+    with metrics.phase('parse'):
+
+        # Load the shared member profiles, if there are any
+
+        people_file = config.people_file
+        people_path = os.path.join(group_configs_dir, 'assets', people_file) if people_file else None
+        profiles = state.get('profiles')
+
+        if profiles is None or not profiles.is_current(people_path):
+            profiles = state['profiles'] = ProfileRegistry(people_path)
+
+        documents = state.get('documents')
+
+        if documents is None:
+            documents = state['documents'] = DocumentCache(options['parse_cache_path'],
+                    options['jobs'], options['watch'], options['stream_above'], root)
+
+        # Leave files that belong to other shards to them
+
+        local_files = [local_file for local_file in group_files(group_configs_dir)
+                if not shard or shard_of(local_file, group_configs_dir, shard[1]) == shard[0]]
+
+        loaded = documents.load_all(local_files)
+        documents.save()
+
+    ### Check every definition before talking to anyone ###
+
+    with metrics.phase('validate'):
+
+        # From here on the subgroups are read from the models validation
+        # builds; outside --watch, each parsed document is freed once it's
+        # been checked
+
+        records = validate_definitions(loaded, (main_list, unified_list), profiles)
+
+    ### Set up directory
+
+    subgroup_index = list()
+
+    ### Groups.io: Get the relevant subgroups ###
+
+    client = state.get('client')
+    snapshot = state.get('snapshot')
+
+    if snapshot is None:
+        snapshot = state['snapshot'] = MembershipSnapshot(options['snapshot_path'],
+                options['snapshot_ttl'], options['snapshot_refresh'])
+
+    # Find all subgroups which match the list suffix, this restricts modification to
+    # a certain namespace of lists (e.g., can't modify membership of sensitive lists)
+
+    groupsio_subgroups = set()
+
+    all_groupsio_subgroups = snapshot.subgroups()
+
+    if all_groupsio_subgroups is None:
+        import asyncio
+
+        # Authenticate and get the cookie
+
+        if client is None:
+            client = state['client'] = login(options, metrics)
+
+        if client is None:
+            print('WARN: Could not log into Groups.io. Exiting.')
+            return
+
+        with metrics.phase('subgroups'):
+            fetched_subgroups = asyncio.run(client.get_subgroups(group_name))
+
+        if fetched_subgroups is None:
+            print('WARN: Could not list the subgroups of %s. Exiting.' % group_name)
+            return
+
+        all_groupsio_subgroups = [{'name': subgroup['name'], 'org_domain': subgroup['org_domain']}
+                for subgroup in fetched_subgroups]
+        snapshot.set_subgroups(all_groupsio_subgroups)
+        snapshot.save()
+
+    for subgroup in all_groupsio_subgroups:
+        if not subgroup['name'].endswith('+%s' % unified_list):
+            groupsio_subgroups.add(subgroup['name'])
+            group_domain = subgroup['org_domain']
+
+    # Keep the directory and membership in SQLite too, if asked
+
+    store = state.get('store')
+
+    if store is None and options['store_path']:
+        from .store import DirectoryStore
+
+        store = state['store'] = DirectoryStore(options['store_path'], root)
+
+    if store is not None:
+        store.set_groupsio_subgroups(groupsio_subgroups)
+
+    # Bail out if there aren't any matching subgroups in the group
+
+    if not groupsio_subgroups:
+        return
+
+    def is_rendered(local_subgroup):
+        '''True if a non-empty definition of ``local_subgroup`` would get a page.'''
+
+        return (local_subgroup not in [main_list,unified_list] and
+                '%s+%s' % (group_name, local_subgroup) in groupsio_subgroups)
+
+    # Optimize the images every page shows up front, so that pages which are
+    # current can be told apart from those whose images changed
+
+    assets = None
+
+    if create_directory and options['assets_dir']:
+        from .assets import AssetPipeline
+
+        with metrics.phase('assets'):
+            assets = AssetPipeline(options['output_dir'], options['assets_dir'])
+
+            for local_file in local_files:
+                for local_subgroup, subgroup in records[local_file]:
+                    if subgroup is not None and is_rendered(local_subgroup):
+                        assets.add_subgroup(subgroup)
+
+            assets.save()
+
+    # Load the hashes from the last directory build. A change to the code, to
+    # the group domain, to the profiles, to the page size or to the images
+    # means every page has to be rebuilt.
+
+    build = source_hash(group_domain, profiles.digest, str(options['page_size']),
+            assets.digest if assets is not None else '')
+    manifest = state.get('manifest')
+
+    if manifest is None or manifest.build != build:
+        manifest = state['manifest'] = DirectoryManifest(
+                options['manifest_path'] if create_directory else None, build, root)
+        profiles.cards.clear()
+
+    ### Compare local subgroup membership against groups.io, resolve deltas ###
+
+    # Open the local .yml files with subgroup definitions
+
+    all_local_subgroups_and_members = dict()
+    no_meta_list = list()
+
+    # Subgroups to reconcile once all local definitions have been read
+
+    pending_subgroups = list()
+
+    partial = PartialResult(shard) if shard else None
+
+    # With --changed-since, only subgroups in files changed since then are
+    # reconciled (None means all of them)
+
+    changed = None
+
+    if update_groupsio and options['changed_since']:
+        from .changes import changed_files
+
+        changed = changed_files(options['changed_since'], group_configs_dir)
+
+    with metrics.phase('bookkeeping'):
+        for local_file in local_files:
+
+            # When only building the directory, files whose pages are all
+            # current (and which the store already holds) need nothing more
+
+            if (not update_groupsio and manifest.file_is_current(local_file, is_rendered) and
+                    (store is None or store.file_is_current(local_file))):
+                for local_subgroup, name, page_path in manifest.keep_file(local_file):
+                    subgroup_index.append({
+                        'name': name,
+                        'path': '%s.md' % local_subgroup
+                        })
+                continue
+
+            all_local_subgroups_and_members[local_file] = records[local_file]
+
+            manifest.set_file(local_file, [local_subgroup for local_subgroup, subgroup in
+                records[local_file]])
+
+            if store is not None:
+                store.set_file(local_file)
+
+        if store is not None:
+            store.prune()
+
+    if not all_local_subgroups_and_members and not subgroup_index and not shard:
+        print('WARN: No lists defined. Exiting.')
+        return
+
+    if create_directory:
+        from .render import (member_page_name, member_page_parts, member_pages, page_part_path,
+                remove_stale_parts, subgroup_page_parts, voting_page_parts, voting_rows)
+
+    # Walk through definitions
+
+    with metrics.phase('render'):
+        for local_file,local_subgroups_and_members in all_local_subgroups_and_members.items():
+
+            # Pages name the file as it is in the repository
+
+            local_name = relative_path(local_file, root)
+
+            for local_subgroup, subgroup in local_subgroups_and_members:
+
+                # Protect main and the unified list
+
+                if local_subgroup in [main_list,unified_list]:
+                    print('INFO: You cannot modify %s. Ignoring.' % local_subgroup)
+                    continue
+
+                # Ignore empty groups
+
+                if subgroup is None:
+                    print('INFO: Empty group definition (%s).' % local_subgroup)
+                    continue
+
+                local_valid_members = dict()
+
+                # Skip building the page if it would come out the same as last time
+
+                page_path = os.path.join(options['output_dir'],
+                        '%s.md' % local_subgroup.replace('/','-'))
+                page_input = manifest.page_input(local_name, local_subgroup, subgroup.digest)
+                render_page = create_directory and not manifest.page_is_current(page_path, page_input)
+
+                # Walk through the members and extract the valid entries.  Note that if no
+                # local member definitions are found, any non-mod/non-admin group members
+                # will be removed.  This is one way to clear a subgroup.
+
+                for member in subgroup.members:
+
+                    # Store the email with the name
+
+                    local_valid_members[member.email] = member.name
+
+                    # Check if user doesn't want to be on meta-list
+
+                    if not member.meta_list:
+                        no_meta_list.append(member.email)
+
+                # Only proceed if there's a matching subgroup at Groups.io
+
+                calculated_subgroup_name = '%s+%s' % (group_name, local_subgroup)
+
+                if store is not None:
+                    store.set_subgroup(local_file, calculated_subgroup_name, subgroup)
+
+                if not calculated_subgroup_name in groupsio_subgroups:
+                    continue
+
+                if update_groupsio and (changed is None or os.path.normpath(local_file) in changed):
+                    pending_subgroups.append((calculated_subgroup_name, local_valid_members))
+
+                if create_directory:
+
+                    # Capture data for the directory
+
+                    subgroup_index.append({
+                        'name': subgroup.name,
+                        'path': '%s.md' % local_subgroup
+                        })
+
+                    if not render_page:
+                        manifest.keep_page(local_file, local_subgroup, page_path)
+                        continue
+
+                    discarded = list()
+                    page_size = options['page_size']
+
+                    if page_size and len(subgroup.members) > page_size:
+
+                        # Too many members for one page: write a summary page which links
+                        # to the member pages, and the voting members on their own
+
+                        summary_page = os.path.basename(page_path)
+                        pages = member_pages(subgroup.members, page_size)
+                        page_paths = [page_part_path(page_path, member_page_name(members))
+                                for members in pages]
+                        linked_pages = [os.path.basename(path) for path in page_paths]
+                        voting_member_info = voting_rows(subgroup)
+                        voting_path = (page_part_path(page_path, 'voting')
+                                if voting_member_info else None)
+
+                        parts = dict()
+
+                        for members, member_page in zip(pages, page_paths):
+                            parts[member_page] = ''.join(member_page_parts(local_name,
+                                subgroup, summary_page, (profiles.render_member_card(member,
+                                    discarded, assets) for member in members)))
+
+                        if voting_path:
+                            parts[voting_path] = ''.join(voting_page_parts(local_name, subgroup,
+                                summary_page, voting_member_info))
+
+                        subgroup_page = ''.join(subgroup_page_parts(local_name, subgroup,
+                            group_domain, (), voting_member_info, linked_pages,
+                            voting_path and os.path.basename(voting_path), assets))
+
+                        manifest.write_page(local_file, local_subgroup, page_path, page_input,
+                                subgroup.name, subgroup_page, parts)
+                        remove_stale_parts(page_path, parts)
+
+                        if partial is not None:
+                            partial.pages[page_path] = subgroup_page
+                            partial.pages.update(parts)
+
+                        continue
+
+                    # Write the page, rendering each member's card as it's written out.
+                    # The voting members table comes first, so it's collected up front.
+
+                    remove_stale_parts(page_path)
+                    page_parts = subgroup_page_parts(local_name, subgroup, group_domain,
+                            (profiles.render_member_card(member, discarded, assets)
+                                for member in subgroup.members),
+                            voting_rows(subgroup), assets=assets)
+
+                    if partial is None:
+                        manifest.write_page_parts(local_file, local_subgroup, page_path,
+                                page_input, subgroup.name, page_parts)
+                        continue
+
+                    subgroup_page = ''.join(page_parts)
+                    manifest.write_page(local_file, local_subgroup, page_path, page_input,
+                            subgroup.name, subgroup_page)
+                    partial.pages[page_path] = subgroup_page
+
+    ### Groups.io: Reconcile the subgroups, then the unified list ###
+
+    if update_groupsio:
+        import asyncio
+        from .sync import GroupsioSync
+
+        if client is None:
+            client = state['client'] = login(options, metrics)
+
+            if client is None:
+                print('WARN: Could not log into Groups.io. Exiting.')
+                return
+
+        # The unified list only needs what the changed files imply
+
+        delta = None
+
+        if changed is not None and unified_list and not shard:
+            from .changes import contributions, load_revision, revision_subgroups, unified_delta
+
+            def contributions_of(entries):
+                return contributions(entries, group_name, groupsio_subgroups)
+
+            current = dict((os.path.normpath(local_file), contributions_of(entries))
+                    for local_file, entries in all_local_subgroups_and_members.items())
+            previous = dict((local_file, contributions_of(revision_subgroups(
+                load_revision(options['changed_since'], local_file), (main_list, unified_list),
+                profiles))) for local_file in changed)
+
+            delta = unified_delta(current, previous)
+
+        if changed is not None:
+            print('INFO: %d definition file(s) changed since %s, reconciling %d subgroup(s).' %
+                    (len(changed), options['changed_since'], len(pending_subgroups)))
+
+        # A shard leaves the unified list to the merge, which sees every member
+
+        sync = GroupsioSync(client, snapshot, group_name, '' if shard else unified_list, store,
+                options['remove_chunk'])
+        asyncio.run(sync.run(pending_subgroups, no_meta_list, delta, journal(options),
+            options['plan_only']))
+        snapshot.save()
+
+        if partial is not None:
+            partial.members = sync.all_local_valid_members
+
+    if client is not None:
+        client.scheduler.report()
+
+    if store is not None:
+        store.save()
+
+    # Export every subgroup with a page, whether or not it was rebuilt. A
+    # shard only has its own, so leave the export to unsharded runs.
+
+    if create_directory and options['export_path'] and not shard:
+        from .export import DirectoryExport
+
+        with metrics.phase('export'):
+            export = DirectoryExport(options['export_path'], group_name, group_domain)
+
+            exported = sorted(((local_subgroup, local_file, subgroup)
+                for local_file in local_files for local_subgroup, subgroup in records[local_file]
+                if subgroup is not None and is_rendered(local_subgroup)),
+                key=lambda entry: entry[:2])
+
+            for local_subgroup, local_file, subgroup in exported:
+                export.add_subgroup(relative_path(local_file, root), subgroup,
+                        '%s.md' % local_subgroup.replace('/','-'))
+
+            export.close()
+
+    if partial is not None:
+        partial.subgroup_index = subgroup_index
+        partial.no_meta_list = no_meta_list
+        partial.directory = create_directory
+        partial.groupsio = update_groupsio
+        partial.save(options['partial_path'])
+
+        manifest.save()
+        print('INFO: Wrote shard %d/%d to %s.' % (shard + (options['partial_path'],)))
+        return
+
+    if create_directory:
+        with metrics.phase('index'):
+
+            ## Write the index file
+
+            write_index(relative_path(group_configs_dir, root), index_template, subgroup_index,
+                    manifest, options['output_dir'])
+
+            manifest.save()
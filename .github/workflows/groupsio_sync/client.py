@@ -0,0 +1,382 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Groups.io API client. Importing this module imports requests, so only the
+# code paths which talk to Groups.io should do so.
+
+import os
+import copy
+import time
+import random
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from .metrics import Metrics
+
+# Where the Groups.io API lives. Override with GROUPSIO_API_URL to point the
+# script at a stand-in server (see benchmarks/fake_groupsio.py).
+
+groupsio_api_url = os.environ.get('GROUPSIO_API_URL', 'https://groups.io/api/v1')
+
+### Request scheduler ###
+
+class RequestScheduler(object):
+    '''Pace, cap and retry every call made to Groups.io.
+
+    Requests are released from a token bucket refilled at ``rate`` per second
+    (holding up to ``burst``), and no more than ``concurrency`` are in flight
+    at once. A 429 pauses every request until its Retry-After has passed.
+
+    Calls which only read (``idempotent``) are retried on 429, 5xx, dropped
+    connections and unreadable responses, after a jittered exponential
+    backoff. Mutations are only retried on 429, which Groups.io sends before
+    doing any work. Each call records how long the scheduler held it back,
+    and each attempt is recorded in ``metrics``.
+    '''
+
+    def __init__(self, executor, concurrency=8, rate=10.0, burst=10, retries=4,
+            backoff=0.5, max_backoff=30.0, metrics=None):
+        self.executor = executor
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        # The token bucket and pause are held in one object, so schedulers
+        # made with share() draw on them too. The lock lets event loops in
+        # several threads do so at once.
+
+        self.bucket = _Bucket(self.burst)
+
+        # (endpoint, attempts, seconds of added delay, final status) per call
+
+        self.log = list()
+
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def share(self):
+        '''Return a scheduler for another caller, e.g. another tenant, which
+        draws on the same token bucket, pause and worker threads but keeps its
+        own log of calls. It may run in another thread's event loop.'''
+
+        shared = copy.copy(self)
+        shared.log = list()
+        shared._semaphores = weakref.WeakKeyDictionary()
+
+        return shared
+
+    def _limit(self):
+
+        # A semaphore belongs to the event loop it was first used in, so make a
+        # new one for each asyncio.run()
+
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+
+        return semaphore
+
+    async def _take(self):
+        '''Wait for a token; return the seconds spent waiting.'''
+
+        bucket = self.bucket
+        waited = 0.0
+
+        while True:
+            with bucket.lock:
+                now = time.monotonic()
+
+                if now < bucket.paused_until:
+                    wait = bucket.paused_until - now
+                elif self.rate <= 0:
+                    return waited
+                else:
+                    bucket.tokens = min(self.burst,
+                            bucket.tokens + (now - bucket.refilled) * self.rate)
+                    bucket.refilled = now
+
+                    if bucket.tokens >= 1:
+                        bucket.tokens -= 1
+                        return waited
+
+                    wait = (1 - bucket.tokens) / self.rate
+
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def _retry_after(self, response):
+        '''Return the Retry-After of ``response`` in seconds, or None.'''
+
+        value = response.headers.get('Retry-After')
+
+        if not value:
+            return None
+
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    async def run(self, endpoint, send, idempotent):
+        '''Call ``send`` in a worker thread and return the decoded JSON.
+
+        Failures that outlast the retries come back as Groups.io style errors
+        ({'object': 'error', 'type': ...}) so callers handle them the same way.
+        '''
+
+        delay = 0.0
+        attempt = 0
+
+        while True:
+            attempt += 1
+            delay += await self._take()
+
+            response = None
+            retry_after = None
+
+            # Time the call from when a worker picks it up, as callers sharing
+            # the workers may keep them all busy for a while
+
+            started = [time.perf_counter()]
+
+            def timed():
+                started[0] = time.perf_counter()
+                return send()
+
+            async with self._limit():
+                try:
+                    response = await asyncio.get_running_loop().run_in_executor(
+                            self.executor, timed)
+                except requests.RequestException as error:
+                    problem = type(error).__name__
+                    self.metrics.request(endpoint, problem, time.perf_counter() - started[0])
+
+            if response is not None:
+                status = response.status_code
+                request = response.request
+
+                self.metrics.request(endpoint, status, time.perf_counter() - started[0],
+                        len(request.url) + len(request.body or ''), len(response.content))
+
+                if status == 429:
+                    problem = 'rate_limited'
+                    retry_after = self._retry_after(response)
+                elif status >= 500:
+                    problem = 'http_%d' % status
+                else:
+                    try:
+                        result = response.json()
+                    except ValueError:
+                        problem = 'invalid_json'
+                    else:
+                        self.log.append((endpoint, attempt, delay, status))
+                        return result
+
+            retryable = idempotent or problem == 'rate_limited'
+
+            if not retryable or attempt > self.retries:
+                self.log.append((endpoint, attempt, delay, problem))
+                return {'object': 'error', 'type': problem}
+
+            # Honour Retry-After for everyone, otherwise back off this call
+            # alone, by a random amount so retries don't arrive together
+
+            if retry_after is not None:
+                wait = min(retry_after, self.max_backoff)
+
+                with self.bucket.lock:
+                    self.bucket.paused_until = max(self.bucket.paused_until,
+                            time.monotonic() + wait)
+            else:
+                wait = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+            print('INFO: Retrying %s (%s) in %.1fs.' % (endpoint, problem, wait))
+
+            await asyncio.sleep(wait)
+            delay += wait
+
+    def report(self):
+        '''Print a summary of the calls made since the last report, and the delay
+        added to them.'''
+
+        if not self.log:
+            return
+
+        retried = [entry for entry in self.log if entry[1] > 1]
+        failed = [entry for entry in self.log if not isinstance(entry[3], int)]
+        slowest = max(self.log, key=lambda entry: entry[2])
+
+        print('INFO: %d Groups.io requests, %d retried, %d failed, %.1fs of added delay '
+                '(longest %.1fs on %s).' % (len(self.log), len(retried), len(failed),
+                    sum(entry[2] for entry in self.log), slowest[2], slowest[0]))
+
+        del self.log[:]
+
+class _Bucket(object):
+    '''The tokens, refill time and Retry-After pause a scheduler shares.'''
+
+    def __init__(self, burst):
+        self.tokens = float(burst)
+        self.refilled = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+### Groups.io client ###
+
+class GroupsioClient(object):
+    '''Make Groups.io API calls from asyncio code.
+
+    requests is blocking, so each call runs in a worker thread. Every call,
+    whichever subgroup it is for, goes through one RequestScheduler and
+    ``session``, which should keep its connections alive (see
+    session.pooled_session()).
+    '''
+
+    # Endpoints which can safely be sent again if an attempt fails
+
+    idempotent = ('login', 'getuser', 'getsubgroups', 'getmembers')
+
+    def __init__(self, session, concurrency=8, rate=10.0, burst=10, retries=4, metrics=None):
+        self.session = session
+        self.csrf = None
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.scheduler = RequestScheduler(self.executor, concurrency, rate, burst, retries,
+                metrics=metrics)
+        self.metrics = self.scheduler.metrics
+
+    def share(self):
+        '''Return a client on the same login, connections, workers and rate
+        limits, whose calls are reported separately (see
+        RequestScheduler.share()).'''
+
+        shared = copy.copy(self)
+        shared.scheduler = self.scheduler.share()
+
+        return shared
+
+    def _post(self, endpoint, query, data):
+        return self.session.post('%s/%s?%s' % (groupsio_api_url, endpoint, query),
+                data=data, cookies=self.session.cookies)
+
+    async def post(self, endpoint, query, data=None):
+        '''POST to ``endpoint`` with a pre-encoded ``query`` and return the JSON.'''
+
+        return await self.scheduler.run(endpoint,
+                lambda: self._post(endpoint, query, data),
+                endpoint in self.idempotent)
+
+    async def login(self, email, password):
+        '''Log in, keeping the session cookie and CSRF token for later calls.'''
+
+        login = await self.post('login', '', {'email':email,'password':password})
+
+        if 'user' in login:
+            self.csrf = login['user']['csrf_token']
+
+        return login
+
+    async def logged_in(self):
+        '''True if the session is still valid, checked with a cheap getuser call.'''
+
+        return self.csrf is not None and (await self.post('getuser', ''))['object'] != 'error'
+
+    async def get_subgroups(self, group_name):
+        '''Return every subgroup of ``group_name``, or None on error.'''
+
+        subgroups = list()
+        next_page_token = 0
+
+        while True:
+            subgroups_page = await self.post('getsubgroups',
+                    'group_name=%s&limit=100&page_token=%s' %
+                    (group_name.replace('+','%2B'), next_page_token))
+
+            if subgroups_page['object'] == 'error':
+                print('Something went wrong: %s | %s' %
+                        (group_name, subgroups_page['type']))
+                return None
+
+            if subgroups_page and 'data' in subgroups_page:
+                subgroups.extend(subgroups_page['data'])
+                next_page_token = subgroups_page['next_page_token']
+
+            if next_page_token == 0:
+                return subgroups
+
+    async def get_members(self, subgroup_name):
+        '''Return (members, mods) for ``subgroup_name``, or None on error.
+
+        Pages of one subgroup are requested one after another, in
+        next_page_token order. Pages of different subgroups run concurrently.
+        '''
+
+        members = set()
+        mods = set()
+        next_page_token = 0
+
+        while True:
+            members_page = await self.post('getmembers',
+                    'group_name=%s&limit=100&page_token=%s' %
+                    (subgroup_name.replace('+','%2B'), next_page_token))
+
+            self.metrics.subgroup(subgroup_name, 'fetches')
+
+            if members_page['object'] == 'error':
+                print('Something went wrong: %s | %s' %
+                        (subgroup_name, members_page['type']))
+                return None
+
+            if members_page and 'data' in members_page:
+                for subgroup_member in members_page['data']:
+                    if 'email' in subgroup_member:
+
+                        if subgroup_member['mod_status'] == 'sub_modstatus_none':
+                            members.add(subgroup_member['email'].lower())
+                        else:
+                            mods.add(subgroup_member['email'].lower())
+
+                next_page_token = members_page['next_page_token']
+
+            if next_page_token == 0:
+                return members, mods
+
+    async def direct_add(self, group_name, subgroup_names, emails):
+        '''Add every entry of ``emails`` to every subgroup in ``subgroup_names``.'''
+
+        for subgroup_name in subgroup_names:
+            self.metrics.subgroup(subgroup_name, 'mutations')
+
+        return await self.post('directadd',
+                'group_name=%s&subgroupnames=%s&emails=%s&csrf=%s' %
+                (group_name,','.join(subgroup_names).replace('+','%2B'),
+                    '\n'.join(emails).replace('+','%2B'),self.csrf))
+
+    async def bulk_remove(self, subgroup_name, emails):
+        '''Remove ``emails`` from ``subgroup_name``.
+
+        The emails go in the form-encoded request body rather than the URL,
+        so the size of a removal isn't limited by URL lengths.
+        '''
+
+        self.metrics.subgroup(subgroup_name, 'mutations')
+
+        return await self.post('bulkremovemembers',
+                'group_name=%s&csrf=%s' % (subgroup_name.replace('+','%2B'),self.csrf),
+                {'emails': '\n'.join(emails)})
@@ -0,0 +1,59 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Loading of groups/assets/config.yml and the index template.
+
+import os
+from string import Template
+
+from .model import GroupConfig
+
+class ConfigError(Exception):
+    '''The group configuration is missing something the sync can't do without.'''
+
+def load_config(group_configs_dir):
+    '''Read ``<group_configs_dir>/assets/config.yml`` and check it.
+
+    Returns a GroupConfig, whose unified_list is '' when no unified list is
+    defined. Raises ConfigError when a required setting is missing.
+    '''
+
+    import yaml
+
+    config_filename = os.path.join(group_configs_dir,'assets','config.yml')
+
+    with open (config_filename,'r') as config_file:
+        config = yaml.full_load(config_file)
+
+    if not config:
+        raise ConfigError('Could not read config: %s.' % config_filename)
+
+    if 'group-name' not in config:
+        raise ConfigError('No group name (\'group-name: ...\') defined in config.')
+
+    if 'group-domain' not in config:
+        print('WARN: Group domain (\'group-domain: ...\') not specified in config.')
+
+    if 'main-list' not in config:
+        raise ConfigError('No main list (\'main-list: ...\') defined in config.')
+
+    if 'unified-list' not in config:
+        print('INFO: No unified list (\'unified-list: ...\') defined in config, will not be created.')
+        config['unified-list'] = ''
+
+    if 'index-template-file' not in config:
+        raise ConfigError('No index template file (\'index-template-file: ...\') defined in config.')
+
+    # Protect the main group.
+
+    if config['unified-list'] == config['main-list']:
+        raise ConfigError('You cannot use %s as your unified list.' % config['main-list'])
+
+    return GroupConfig(config)
+
+def load_index_template(group_configs_dir, config):
+    '''Return the README.md template named by ``config``.'''
+
+    with open(os.path.join(group_configs_dir,'assets',config.index_template_file)) as template_file:
+        return Template(template_file.read())
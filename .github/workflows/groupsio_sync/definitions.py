@@ -0,0 +1,508 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Discovery, loading and validation of the subgroup definitions in groups/.
+
+import io
+import os
+import re
+import json
+import base64
+import datetime
+
+from .manifest import content_hash, relative_path
+
+email_pattern = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
+
+def group_files(group_configs_dir):
+    '''Yield the path of every subgroup definition under ``group_configs_dir``.'''
+
+    for root,dirs,files in os.walk(group_configs_dir):
+        for f in files:
+            if f.endswith('.yml') and root != os.path.join(group_configs_dir,'assets'):
+                yield os.path.join(root,f)
+
+def yaml_loader():
+    '''Return libyaml's CSafeLoader where PyYAML was built with it, or else the
+    pure-Python SafeLoader. Both give the same result.'''
+
+    import yaml
+
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+def parse_yaml(content, name=None):
+    '''Parse the YAML document in ``content`` (str or bytes). Errors point at
+    ``name``, such as the file it came from, if given.'''
+
+    import yaml
+
+    if name is not None:
+        content = io.StringIO(content) if isinstance(content, str) else io.BytesIO(content)
+        content.name = name
+
+    return yaml.load(content, Loader=yaml_loader())
+
+def stream_loader():
+    '''Return a loader class (see yaml_loader()) which can also compose one
+    node at a time from its events, so a document can be read piecemeal.'''
+
+    from yaml.composer import Composer
+
+    class StreamLoader(yaml_loader()):
+
+        # libyaml's parser composes whole documents only, so nodes are composed
+        # from its events by PyYAML's own composer
+
+        compose_node = Composer.compose_node
+        compose_scalar_node = Composer.compose_scalar_node
+        compose_sequence_node = Composer.compose_sequence_node
+        compose_mapping_node = Composer.compose_mapping_node
+
+        def __init__(self, stream):
+            super(StreamLoader, self).__init__(stream)
+            self.anchors = dict()
+
+        def next_value(self):
+            '''Compose and construct the next node.'''
+
+            return self.construct_document(self.compose_node(None, None))
+
+    return StreamLoader
+
+class SyntaxProblem(object):
+    '''Stands in for the contents of a file which isn't valid YAML, for
+    validation to report with the rest. Holds the ``line`` and ``message``
+    of the parser's error.'''
+
+    def __init__(self, error):
+        mark = getattr(error, 'problem_mark', None)
+        problem = getattr(error, 'problem', None)
+        context = getattr(error, 'context', None)
+
+        self.line = mark.line + 1 if mark is not None else 1
+
+        if problem and context:
+            self.message = 'YAML syntax error %s: %s' % (context, problem)
+        else:
+            self.message = 'YAML syntax error: %s' % (problem or error)
+
+def _parse_file(path):
+    '''Return (size, content hash, parsed contents) of the file at ``path``.
+    Contents which can't be parsed are a SyntaxProblem.
+
+    A module-level function so it can run in a worker process.
+    '''
+
+    import yaml
+
+    with open(path, 'rb') as config_yaml:
+        content = config_yaml.read()
+
+    try:
+        document = parse_yaml(content, path)
+    except yaml.YAMLError as error:
+        document = SyntaxProblem(error)
+
+    return len(content), content_hash(content), document
+
+# Below this many files to parse, starting worker processes costs more than
+# it saves
+
+parallel_parse_threshold = 32
+
+# Files bigger than this are streamed (see DefinitionStream) unless told
+# otherwise
+
+default_stream_above = 4 * 1024 * 1024
+
+class DefinitionStream(object):
+    '''A definition file read from its parse events as it's checked, instead
+    of being loaded whole.
+
+    subgroups() yields (subgroup, definition) in file order. Definitions that
+    are mappings come as a SubgroupStream, read as it's consumed, and
+    anything else as its value. Only one entry of the member lists is held
+    at a time, so a file with a very long list takes no more memory than the
+    records made from it. If the file isn't a mapping of subgroups, nothing
+    is yielded and ``document`` holds its contents instead. If it isn't valid
+    YAML, reading stops where it stops making sense, and ``problem`` holds a
+    SyntaxProblem.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.document = None
+        self.problem = None
+
+    def subgroups(self):
+        import yaml
+
+        with open(self.path, 'rb') as config_yaml:
+            loader = stream_loader()(config_yaml)
+
+            try:
+                loader.get_event()
+
+                if loader.check_event(yaml.StreamEndEvent):
+                    return
+
+                loader.get_event()
+
+                # A mapping with an anchor may be referred to later, so it has
+                # to be composed whole for the alias to find it
+
+                if (not loader.check_event(yaml.MappingStartEvent) or
+                        loader.peek_event().anchor is not None):
+                    self.document = loader.next_value()
+                else:
+                    loader.get_event()
+
+                    while not loader.check_event(yaml.MappingEndEvent):
+                        local_subgroup = loader.next_value()
+
+                        if (loader.check_event(yaml.MappingStartEvent) and
+                                loader.peek_event().anchor is None):
+                            definition = SubgroupStream(loader)
+                            yield local_subgroup, definition
+                            definition.drain()
+
+                            if definition.problem is not None:
+                                self.problem = definition.problem
+                                return
+                        else:
+                            yield local_subgroup, loader.next_value()
+
+                    loader.get_event()
+
+                loader.get_event()
+
+                if not loader.check_event(yaml.StreamEndEvent):
+                    raise yaml.composer.ComposerError('expected a single document in the stream',
+                            None, 'but found another document', loader.get_event().start_mark)
+            except yaml.YAMLError as error:
+                self.problem = SyntaxProblem(error)
+            finally:
+                loader.dispose()
+
+class SubgroupStream(object):
+    '''One subgroup's definition, read as its members are asked for.
+
+    members() yields the entries of its 'list-members' one by one. Once they
+    are all read, ``fields`` holds its other fields, and ``present`` says
+    whether it had any at all. A 'list-members' which can't be streamed,
+    because it isn't a plain sequence or is given again, is left in
+    ``fields`` like the rest and takes the place of any streamed one. If
+    the YAML breaks off, the members stop and ``problem`` holds a
+    SyntaxProblem.
+    '''
+
+    merge_tag = 'tag:yaml.org,2002:merge'
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.fields = dict()
+        self.present = False
+        self.problem = None
+        self._members = self._read()
+
+    def members(self):
+        return self._members
+
+    def drain(self):
+        '''Read whatever is left of the definition.'''
+
+        for local_member in self._members:
+            pass
+
+    def _read(self):
+        import yaml
+
+        try:
+            yield from self._read_events()
+        except yaml.YAMLError as error:
+            self.problem = SyntaxProblem(error)
+
+    def _read_events(self):
+        import yaml
+
+        loader = self.loader
+        merged = list()
+        streamed = False
+
+        loader.get_event()
+
+        while not loader.check_event(yaml.MappingEndEvent):
+            self.present = True
+            key = loader.compose_node(None, None)
+
+            if key.tag == self.merge_tag:
+                merged.append(loader.next_value())
+                continue
+
+            key = loader.construct_document(key)
+
+            if (key == 'list-members' and not streamed and
+                    loader.check_event(yaml.SequenceStartEvent) and
+                    loader.peek_event().anchor is None):
+                streamed = True
+                self.fields.pop(key, None)
+                loader.get_event()
+
+                while not loader.check_event(yaml.SequenceEndEvent):
+                    yield loader.next_value()
+
+                loader.get_event()
+            else:
+                self.fields[key] = loader.next_value()
+
+        loader.get_event()
+
+        # Merged keys ('<<: *defaults') never override those given, and the
+        # first mapping merged wins, as when the file is loaded whole
+
+        for value in merged:
+            for mapping in (value if isinstance(value, list) else [value]):
+                if not isinstance(mapping, dict):
+                    continue
+
+                for key, field in mapping.items():
+                    if key not in self.fields and not (key == 'list-members' and streamed):
+                        self.fields[key] = field
+
+### Parse cache encoding ###
+
+# The parse cache is JSON, so reading one back can never run code, whoever
+# wrote it. YAML values JSON has no type for are written as a mapping of one
+# tag to their contents, and mapping keys which start with '!' get another
+# '!' in front, so they can't be taken for a tag.
+
+def _encode_value(value):
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return dict(('!%s' % key if key.startswith('!') else key, _encode_value(field))
+                    for key, field in value.items())
+
+        return {'!map': [[_encode_value(key), _encode_value(field)]
+            for key, field in value.items()]}
+
+    if isinstance(value, list):
+        return [_encode_value(item) for item in value]
+
+    if isinstance(value, tuple):
+        return {'!tuple': [_encode_value(item) for item in value]}
+
+    if isinstance(value, (set, frozenset)):
+        return {'!set': [_encode_value(item) for item in value]}
+
+    if isinstance(value, bytes):
+        return {'!binary': base64.b64encode(value).decode('ascii')}
+
+    if isinstance(value, datetime.datetime):
+        return {'!datetime': value.isoformat()}
+
+    if isinstance(value, datetime.date):
+        return {'!date': value.isoformat()}
+
+    return value
+
+_decoders = {
+    '!map': lambda pairs: dict((key, field) for key, field in pairs),
+    '!tuple': tuple,
+    '!set': set,
+    '!binary': base64.b64decode,
+    '!datetime': datetime.datetime.fromisoformat,
+    '!date': datetime.date.fromisoformat,
+    }
+
+def _decode_mapping(mapping):
+    if len(mapping) == 1:
+        key, value = next(iter(mapping.items()))
+
+        if key in _decoders:
+            return _decoders[key](value)
+
+    return dict((key[1:] if key.startswith('!') else key, value)
+            for key, value in mapping.items())
+
+class DocumentCache(object):
+    '''Parsed definitions, kept in memory and optionally on disk.
+
+    In memory, a file is only parsed again when its size or modification time
+    changes. With a ``path``, parsed documents are also kept there between
+    runs, keyed on each file's path (relative to ``root``, the tenant's
+    root), size and content hash, so they stay valid across fresh checkouts
+    where modification times don't. That file is JSON, so a cache restored from elsewhere can't run code. Files which
+    do need parsing are spread over ``jobs`` worker processes when there are
+    enough of them. Without ``keep``, documents are handed out and forgotten
+    (once saved, with a ``path``), for runs which only read them once.
+
+    Files bigger than ``stream_above`` bytes aren't parsed here: they're
+    handed out as a DefinitionStream, neither kept nor saved, for validation
+    to read piecemeal.
+    '''
+
+    version = 2
+
+    def __init__(self, path=None, jobs=1, keep=True, stream_above=default_stream_above,
+            root=''):
+        self.path = path
+        self.root = root
+        self.jobs = jobs
+        self.keep = keep
+        self.stream_above = stream_above
+        self.documents = dict()
+        self.stored = dict()
+        self.dirty = False
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as cache_file:
+                    data = json.load(cache_file, object_hook=_decode_mapping)
+
+                if isinstance(data, dict) and data.get('version') == self.version:
+                    for stored_path, entry in data['documents'].items():
+                        size, digest, document = entry
+
+                        if not isinstance(size, int) or not isinstance(digest, str):
+                            raise ValueError('bad entry for %s' % stored_path)
+
+                        self.stored[os.path.join(root, stored_path)] = (size, digest, document)
+            except (OSError, ValueError, TypeError, AttributeError):
+                self.stored = dict()
+                print('WARN: Ignoring unreadable parse cache: %s' % path)
+
+    def load_all(self, paths):
+        '''Return {path: parsed contents} for ``paths``, parsing only what changed.'''
+
+        loaded = dict()
+        missing = list()
+
+        for path in paths:
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+
+            if self.stream_above and stat.st_size > self.stream_above:
+                if self.stored.pop(path, None) is not None:
+                    self.dirty = True
+
+                self.documents.pop(path, None)
+                loaded[path] = DefinitionStream(path)
+                continue
+
+            cached = self.documents.get(path)
+
+            if cached is not None and cached[0] == signature:
+                loaded[path] = cached[1]
+                continue
+
+            # Hashing is much cheaper than parsing, but not worth doing when the
+            # size alone says the file changed
+
+            stored = self.stored.get(path)
+
+            if stored is not None and stored[0] == stat.st_size:
+                with open(path, 'rb') as config_yaml:
+                    if content_hash(config_yaml.read()) == stored[1]:
+                        self._remember(path, signature, stored[2])
+                        loaded[path] = stored[2]
+                        continue
+
+            missing.append((path, signature))
+            loaded[path] = None
+
+        for (path, signature), parsed in zip(missing, self._parse([path for path, signature
+                in missing])):
+
+            # Files which don't parse are handed to validation to report, and
+            # parsed again next time
+
+            if isinstance(parsed[2], SyntaxProblem):
+                loaded[path] = parsed[2]
+                continue
+
+            self._remember(path, signature, parsed[2])
+            self.stored[path] = parsed
+            loaded[path] = parsed[2]
+            self.dirty = True
+
+        return loaded
+
+    def _remember(self, path, signature, document):
+        if self.keep:
+            self.documents[path] = (signature, document)
+
+    def _parse(self, paths):
+        if self.jobs > 1 and len(paths) >= parallel_parse_threshold:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(min(self.jobs, len(paths))) as executor:
+                return list(executor.map(_parse_file, paths,
+                    chunksize=max(1, len(paths) // (self.jobs * 4))))
+
+        return [_parse_file(path) for path in paths]
+
+    def save(self):
+        if not self.path or not self.dirty:
+            self.forget()
+            return
+
+        # Forget files which are gone
+
+        self.stored = dict((path, entry) for path, entry in self.stored.items()
+                if os.path.exists(path))
+
+        with open('%s.tmp' % self.path, 'w') as cache_file:
+            json.dump({'version': self.version, 'documents': dict((relative_path(path,
+                self.root), [size, digest, _encode_value(document)]) for path, (size, digest,
+                    document) in self.stored.items())}, cache_file, separators=(',', ':'))
+
+        os.replace('%s.tmp' % self.path, self.path)
+        self.dirty = False
+        self.forget()
+
+    def forget(self):
+        '''Drop the documents read from ``path`` unless they're to be kept.'''
+
+        if not self.keep:
+            self.stored = dict()
+
+def valid_member(local_member, profiles=None):
+    '''Return (email, name, member) for one entry of 'list-members', or None
+    if it isn't usable.
+
+    Entries without an email and a name, or whose email doesn't look like one,
+    aren't. Emails are lowercased and names stripped. With a ProfileRegistry
+    as ``profiles``, entries with an 'id' are returned as a Membership of that
+    profile. Validation has already reported any that aren't usable.
+    '''
+
+    # Entries may refer to a shared profile, which was checked when loaded
+
+    if profiles is not None and 'id' in local_member:
+        membership = profiles.resolve(local_member)
+
+        if membership is None:
+            return None
+
+        if 'email' not in local_member and 'name' not in local_member:
+            return membership.profile.email, membership.profile.name, membership
+
+        local_member = membership
+
+    # Make sure email and name entries exist before proceeding
+
+    if (not 'email' in local_member or
+            not local_member['email'] or
+            not 'name' in local_member or
+            not local_member['name']):
+        return None
+
+    local_member_email = email_pattern.findall(local_member['email'])
+
+    # Make sure an email was defined before proceeding
+
+    if not local_member_email:
+        return None
+
+    return local_member_email[0].lower(), local_member['name'].strip(), local_member
@@ -0,0 +1,205 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Structured export of the directory, as NDJSON records and a JSON index.
+
+import os
+import re
+import json
+
+from .manifest import file_hash, write_if_changed
+
+# (field, attribute) for each record. Fields are named as in the definition
+# files, and those that weren't given are left out.
+
+subgroup_fields = (('name', 'name'), ('description', 'description'), ('logo', 'logo'),
+        ('about-url', 'about_url'), ('development-list', 'development_list'),
+        ('calendar', 'calendar'), ('slack', 'slack'), ('discourse', 'discourse'), ('irc', 'irc'),
+        ('chat', 'chat'), ('twitter-username', 'twitter_username'),
+        ('linkedin-username', 'linkedin_username'), ('youtube', 'youtube'),
+        ('artwork', 'artwork'), ('charter', 'charter'), ('code-of-conduct', 'code_of_conduct'),
+        ('contributing', 'contributing'))
+
+member_fields = (('name', 'name'), ('email', 'email'), ('photo', 'photo'), ('bio', 'bio'),
+        ('sponsor', 'sponsor'), ('sponsor-website', 'sponsor_website'),
+        ('github-username', 'github_username'), ('twitter-username', 'twitter_username'),
+        ('linkedin-username', 'linkedin_username'), ('website', 'website'),
+        ('pronouns', 'pronouns'))
+
+_words = re.compile(r'\w+')
+
+# One encoder for every record, rather than a new one per json.dumps() call
+
+_encode = json.JSONEncoder(check_circular=False, separators=(',', ':')).encode
+
+def _fields(data, fields, record):
+    for field, attribute in fields:
+        value = getattr(data, attribute)
+
+        if value:
+            record[field] = value
+
+    return record
+
+def _role(role):
+    record = {'title': role.title, 'voting': role.voting}
+
+    if role.term_begins is not None:
+        record['term-begins'] = role.term_begins
+
+    if role.term_ends is not None:
+        record['term-ends'] = role.term_ends
+
+    return record
+
+def export_index_path(path):
+    '''Return where the index of the export at ``path`` goes.'''
+
+    return '%s.index.json' % os.path.splitext(path)[0]
+
+class DirectoryExport(object):
+    '''The directory as data, for tools which would otherwise scrape the pages.
+
+    Records are written to ``path`` as subgroups are added, one JSON object
+    per line: a 'subgroup' record with its links, repositories and voting
+    members, then a 'membership' record for each member, with their card's
+    fields and roles. Only what the index needs is kept in memory.
+
+    The index (see export_index_path()) lists every subgroup with its page,
+    and every person, as a list of the ``person_fields``. Its search table
+    maps each lowercased word of their names, roles, sponsors and GitHub
+    handles to the people it occurs for, by number. Both files are only
+    replaced when their contents change.
+    '''
+
+    version = 1
+
+    # roles are [title, subgroup number] and subgroups are subgroup numbers
+
+    person_fields = ('name', 'github-username', 'sponsors', 'roles', 'subgroups')
+
+    def __init__(self, path, group_name, group_domain):
+        self.path = path
+        self.group_name = group_name
+        self.group_domain = group_domain
+        self.subgroups = list()
+
+        # email -> the person's entry in the index (see person_fields)
+
+        self.people = dict()
+
+        self.output = open('%s.tmp' % path, 'w')
+
+    def _write(self, record):
+        self.output.write('%s\n' % _encode(record))
+
+    def add_subgroup(self, local_file, subgroup, page_path):
+        '''Write the records of ``subgroup``, whose page is ``page_path``.'''
+
+        local_subgroup = subgroup.local_name
+        number = len(self.subgroups)
+
+        record = {'type': 'subgroup', 'subgroup': local_subgroup,
+                'list': '%s@%s' % (local_subgroup, self.group_domain), 'page': page_path,
+                'file': local_file}
+        _fields(subgroup, subgroup_fields, record)
+
+        if subgroup.git:
+            record['repositories'] = list(subgroup.git)
+
+        record['voting-members'] = [{'name': member.name, 'role': role.title,
+            'term': role.term_info} for member in subgroup.members for role in member.roles
+            if role.voting]
+        record['members'] = len(subgroup.members)
+
+        self._write(record)
+        self.subgroups.append({'subgroup': local_subgroup, 'name': subgroup.name,
+            'page': page_path, 'members': len(subgroup.members)})
+
+        for member in subgroup.members:
+            membership = _fields(member, member_fields, {'type': 'membership',
+                'subgroup': local_subgroup})
+
+            if member.roles:
+                membership['roles'] = [_role(role) for role in member.roles]
+
+            self._write(membership)
+
+            person = self.people.get(member.email)
+
+            if person is None:
+                person = self.people[member.email] = [member.name, member.github_username,
+                        [], [], []]
+            elif person[1] is None:
+                person[1] = member.github_username
+
+            if member.sponsor and member.sponsor not in person[2]:
+                person[2].append(member.sponsor)
+
+            for role in member.roles:
+                person[3].append([role.title, number])
+
+            person[4].append(number)
+
+    def close(self):
+        '''Finish the records and write the index.'''
+
+        self.output.close()
+
+        temporary = '%s.tmp' % self.path
+
+        if file_hash(temporary) != file_hash(self.path):
+            os.replace(temporary, self.path)
+        else:
+            os.remove(temporary)
+
+        people = [person for email, person in sorted(self.people.items(),
+            key=lambda item: (item[1][0].lower(), item[0]))]
+        self.people = dict()
+
+        # Sponsors and role titles recur, so split each of them only once
+
+        split = dict()
+
+        def words_of(text):
+            words = split.get(text)
+
+            if words is None:
+                words = split[text] = _words.findall(text.lower())
+
+            return words
+
+        search = dict()
+
+        for number, (name, github_username, sponsors, roles, subgroups) in enumerate(people):
+            words = set(_words.findall(name.lower()))
+
+            # Handles are also found whole, hyphens and all
+
+            if github_username:
+                words.add(github_username.lower())
+                words.update(_words.findall(github_username.lower()))
+
+            for text in sponsors:
+                words.update(words_of(text))
+
+            for title, subgroup in roles:
+                words.update(words_of(title))
+
+            for word in words:
+                search.setdefault(word, []).append(number)
+
+        write_if_changed(export_index_path(self.path), _encode({
+            'version': self.version,
+            'group': self.group_name,
+            'group-domain': self.group_domain,
+            'records': os.path.basename(self.path),
+            'subgroups': self.subgroups,
+            'person-fields': self.person_fields,
+            'people': people,
+            'search': dict(sorted(search.items()))
+            }))
+
+        print('INFO: Exported %d subgroup(s) and %d people to %s.' % (len(self.subgroups),
+            len(people), self.path))
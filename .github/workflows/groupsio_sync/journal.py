@@ -0,0 +1,152 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Journal of planned Groups.io mutations, for --plan-only and --resume.
+
+import os
+import json
+
+class MutationJournal(object):
+    '''A plan of Groups.io mutations, and a record of the batches applied so far.
+
+    The journal is a file of JSON lines. The first holds the plan: every batch
+    to send, and the definition hashes to record once they have all gone
+    through. Each batch then gets a line as it completes, written and synced
+    straight away, so after an interruption the journal says exactly what is
+    left. A final line that was only partly written is ignored.
+
+    Batches are {'id', 'endpoint', 'subgroups', 'emails'}; directadd batches
+    also carry the 'entries' that are sent.
+    '''
+
+    version = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.batches = list()
+        self.definitions = dict()
+        self.applied = set()
+        self.journal_file = None
+
+    def start(self, batches, definitions):
+        '''Replace the journal with a new plan.'''
+
+        # A journal left half written by a killed run says nothing this plan
+        # doesn't, as it's made from what Groups.io has now
+
+        try:
+            if self.load() and self.pending():
+                print('WARN: Replacing a journal with %d unapplied batch(es): %s' %
+                        (len(self.pending()), self.path))
+        except ValueError as error:
+            print('WARN: %s Replacing it.' % error)
+
+        self.batches = batches
+        self.definitions = definitions
+        self.applied = set()
+
+        with open('%s.tmp' % self.path, 'w') as journal_file:
+            json.dump({
+                'version': self.version,
+                'batches': batches,
+                'definitions': definitions
+                }, journal_file, sort_keys=True)
+            journal_file.write('\n')
+
+        os.replace('%s.tmp' % self.path, self.path)
+
+    def load(self):
+        '''Read the plan and progress from the journal; False if there is none.'''
+
+        try:
+            with open(self.path, 'r') as journal_file:
+                lines = journal_file.read().splitlines()
+        except FileNotFoundError:
+            return False
+
+        try:
+            plan = json.loads(lines[0])
+        except (IndexError, ValueError):
+            raise ValueError('Not a mutation journal: %s' % self.path)
+
+        if not isinstance(plan, dict):
+            raise ValueError('Not a mutation journal: %s' % self.path)
+
+        if plan.get('version') != self.version:
+            raise ValueError('Unsupported mutation journal: %s' % self.path)
+
+        if (not isinstance(plan.get('batches'), list) or
+                not isinstance(plan.get('definitions'), dict)):
+            raise ValueError('Not a mutation journal: %s' % self.path)
+
+        self.batches = plan['batches']
+        self.definitions = plan['definitions']
+        self.applied = set()
+
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+
+            if 'applied' in entry:
+                self.applied.add(entry['applied'])
+
+        return True
+
+    def pending(self):
+        '''Return the batches which haven't been applied yet.'''
+
+        return [batch for batch in self.batches if batch['id'] not in self.applied]
+
+    def record(self, batch, error=None):
+        '''Note that ``batch`` was applied, or failed with ``error``.'''
+
+        if self.journal_file is None:
+            self.journal_file = open(self.path, 'a')
+
+        if error is None:
+            self.applied.add(batch['id'])
+            entry = {'applied': batch['id']}
+        else:
+            entry = {'failed': batch['id'], 'error': error}
+
+        self.journal_file.write(json.dumps(entry) + '\n')
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+
+    def close(self):
+        '''Close the journal, removing it once every batch has been applied.'''
+
+        if self.journal_file is not None:
+            self.journal_file.close()
+            self.journal_file = None
+
+        if not self.pending() and os.path.exists(self.path):
+            os.remove(self.path)
+
+def print_plan(batches):
+    '''Print the adds and removals in ``batches``, subgroup by subgroup.'''
+
+    adds = dict()
+    removals = dict()
+
+    for batch in batches:
+        for subgroup_name in batch['subgroups']:
+            if batch['endpoint'] == 'directadd':
+                adds.setdefault(subgroup_name, list()).extend(batch['entries'])
+            else:
+                removals.setdefault(subgroup_name, list()).extend(batch['emails'])
+
+    for subgroup_name in sorted(set(adds) | set(removals)):
+        print('PLAN: %s: %d to add, %d to remove' % (subgroup_name,
+            len(adds.get(subgroup_name, ())), len(removals.get(subgroup_name, ()))))
+
+        for entry in sorted(adds.get(subgroup_name, ())):
+            print('PLAN:   + %s' % entry)
+
+        for email in sorted(removals.get(subgroup_name, ())):
+            print('PLAN:   - %s' % email)
+
+    print('PLAN: %d request(s) in total.' % len(batches))
@@ -0,0 +1,289 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Content-hash manifest for incremental directory builds.
+
+import os
+import json
+import hashlib
+
+### Directory manifest ###
+
+def content_hash(content):
+    '''Return the sha256 of ``content`` (str or bytes).'''
+
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+
+    return hashlib.sha256(content).hexdigest()
+
+def relative_path(path, root):
+    '''Return ``path`` relative to ``root``, or as it is if there's no root.
+
+    Files a tenant's run records or shows are named this way, so its output
+    doesn't depend on where the tenant is checked out.
+    '''
+
+    return os.path.relpath(path, root) if root else path
+
+def file_hash(path):
+    '''Return the sha256 of the file at ``path``, or None if it doesn't exist.'''
+
+    try:
+        with open(path, 'rb') as hashed_file:
+            return content_hash(hashed_file.read())
+    except FileNotFoundError:
+        return None
+
+class DirectoryManifest(object):
+    '''Content hashes from the last directory build, for incremental rebuilds.
+
+    For each YAML file it keeps the file's hash and the subgroups it defines.
+    For each page it keeps the hash of its inputs and of the bytes written,
+    and of each of its parts when the subgroup was split into several pages.
+    For the index it keeps the hash of the template and of the subgroup list,
+    plus the date the list last changed. Everything is keyed on ``build``, a
+    hash of the code and the group domain, so changing either one rebuilds
+    every page. With no ``path`` nothing is read or written and no page is
+    ever considered current. With the path ':memory:' the hashes are kept
+    between builds in the same process but never written.
+
+    Files and pages are given as paths to read and write, and recorded
+    relative to ``root``, the tenant's root (see relative_path()).
+    '''
+
+    version = 1
+
+    def __init__(self, path=None, build='', root=''):
+        self.path = path
+        self.build = build
+        self.root = root
+        self.data = None
+
+        if path and path != ':memory:' and os.path.exists(path):
+            try:
+                with open(path, 'r') as manifest_file:
+                    self.data = json.load(manifest_file)
+            except ValueError:
+                print('WARN: Ignoring unreadable manifest: %s' % path)
+
+        if (not self.data or self.data.get('version') != self.version or
+                self.data.get('build') != build):
+            self.data = {'version': self.version, 'build': build, 'files': dict(),
+                    'pages': dict(), 'index': dict()}
+
+        self.seen_files = set()
+        self.seen_pages = set()
+
+    def page_input(self, *inputs):
+        '''Hash everything a page is rendered from.'''
+
+        return content_hash(json.dumps(inputs, sort_keys=True, default=str))
+
+    def page_is_current(self, page_path, page_input=None):
+        '''True if ``page_path`` was built from ``page_input`` and is unchanged on disk.'''
+
+        if not self.path:
+            return False
+
+        page = self.data['pages'].get(relative_path(page_path, self.root))
+
+        return (page is not None and
+                (page_input is None or page['input'] == page_input) and
+                file_hash(page_path) == page['output'] and
+                all(file_hash(self._path(part_path)) == output for part_path, output in
+                    page.get('parts', dict()).items()))
+
+    def file_is_current(self, local_file, is_rendered):
+        '''True if ``local_file`` is unchanged and none of its pages need building.
+
+        ``is_rendered(local_subgroup)`` says whether a subgroup would get a
+        page now. Subgroups that didn't get one last time must still not need
+        one, and those that did must still have a current page.
+        '''
+
+        if not self.path:
+            return False
+
+        entry = self.data['files'].get(relative_path(local_file, self.root))
+
+        if entry is None or entry['input'] != file_hash(local_file):
+            return False
+
+        for local_subgroup, page_path in entry['subgroups'].items():
+            if page_path is None:
+                if is_rendered(local_subgroup):
+                    return False
+            elif not self.page_is_current(self._path(page_path)):
+                return False
+
+        return True
+
+    def keep_file(self, local_file):
+        '''Carry a skipped file over; return its (subgroup, name, page) entries.'''
+
+        local_file = relative_path(local_file, self.root)
+        self.seen_files.add(local_file)
+
+        kept = list()
+
+        for local_subgroup, page_path in self.data['files'][local_file]['subgroups'].items():
+            if page_path is not None:
+                self.seen_pages.add(page_path)
+                kept.append((local_subgroup, self.data['pages'][page_path]['name'],
+                    self._path(page_path)))
+
+        return kept
+
+    def set_file(self, local_file, local_subgroups):
+        input_hash = file_hash(local_file)
+        local_file = relative_path(local_file, self.root)
+
+        self.seen_files.add(local_file)
+        self.data['files'][local_file] = {
+            'input': input_hash,
+            'subgroups': dict((local_subgroup, None) for local_subgroup in local_subgroups)
+            }
+
+    def keep_page(self, local_file, local_subgroup, page_path):
+        '''Record that ``page_path`` is current and was left alone.'''
+
+        page_path = relative_path(page_path, self.root)
+
+        self.seen_pages.add(page_path)
+        self.data['files'][relative_path(local_file, self.root)]['subgroups'][local_subgroup] = \
+                page_path
+
+    def write_page(self, local_file, local_subgroup, page_path, page_input, name, content,
+            parts=None):
+        '''Write ``content`` to ``page_path`` unless the file already holds it.
+
+        ``parts`` maps the paths of the page's other parts, if it has any, to
+        their contents; each is written the same way.
+        '''
+
+        output = content_hash(content)
+
+        if file_hash(page_path) != output:
+            with open(page_path, 'w') as page_file:
+                page_file.write(content)
+
+        entry = self._set_page(local_file, local_subgroup, page_path, page_input, output, name)
+
+        if parts:
+            part_outputs = entry['parts'] = dict()
+
+            for part_path, part in parts.items():
+                part_output = part_outputs[relative_path(part_path, self.root)] = content_hash(part)
+
+                if file_hash(part_path) != part_output:
+                    with open(part_path, 'w') as page_file:
+                        page_file.write(part)
+
+    def write_page_parts(self, local_file, local_subgroup, page_path, page_input, name, parts):
+        '''write_page() for a page given as an iterable of str, which is
+        written out as it comes rather than held whole.'''
+
+        digest = hashlib.sha256()
+
+        with open('%s.tmp' % page_path, 'w') as page_file:
+            for part in parts:
+                digest.update(part.encode('utf-8'))
+                page_file.write(part)
+
+        output = digest.hexdigest()
+
+        if file_hash(page_path) != output:
+            os.replace('%s.tmp' % page_path, page_path)
+        else:
+            os.remove('%s.tmp' % page_path)
+
+        self._set_page(local_file, local_subgroup, page_path, page_input, output, name)
+
+    def _set_page(self, local_file, local_subgroup, page_path, page_input, output, name):
+        '''Record a page just written; return its entry.'''
+
+        local_file = relative_path(local_file, self.root)
+        page_path = relative_path(page_path, self.root)
+
+        self.seen_pages.add(page_path)
+        entry = self.data['pages'][page_path] = {'input': page_input, 'output': output,
+                'name': name}
+
+        if local_file in self.data['files']:
+            self.data['files'][local_file]['subgroups'][local_subgroup] = page_path
+
+        return entry
+
+    def _path(self, recorded):
+        '''Return the path to read a recorded file or page at.'''
+
+        return os.path.join(self.root, recorded) if self.root else recorded
+
+    def index_date(self, template_hash, subgroup_list, generated_date):
+        '''Return the date to stamp on the index.
+
+        The previous date is kept unless the subgroup list itself changed.
+        '''
+
+        index = self.data['index']
+        subgroup_list_hash = content_hash(subgroup_list)
+
+        if index.get('subgroups') != subgroup_list_hash or 'generated_date' not in index:
+            index['generated_date'] = generated_date
+
+        index['template'] = template_hash
+        index['subgroups'] = subgroup_list_hash
+
+        return index['generated_date']
+
+    def save(self):
+        if not self.path:
+            return
+
+        # Forget files and pages which weren't part of this build
+
+        self.data['files'] = dict((local_file, entry) for local_file, entry in
+                self.data['files'].items() if local_file in self.seen_files)
+        self.data['pages'] = dict((page_path, entry) for page_path, entry in
+                self.data['pages'].items() if page_path in self.seen_pages)
+
+        self.seen_files = set()
+        self.seen_pages = set()
+
+        if self.path == ':memory:':
+            return
+
+        with open('%s.tmp' % self.path, 'w') as manifest_file:
+            json.dump(self.data, manifest_file, indent=1, sort_keys=True)
+            manifest_file.write('\n')
+
+        os.replace('%s.tmp' % self.path, self.path)
+
+def write_if_changed(path, content):
+    '''Write ``content`` to ``path`` unless the file already holds exactly that.'''
+
+    if file_hash(path) != content_hash(content):
+        with open(path, 'w') as output_file:
+            output_file.write(content)
+
+def source_hash(*extra):
+    '''Hash the source of this package, followed by the ``extra`` strings.
+
+    Used as the manifest's build key, so a change to how pages are produced
+    rebuilds all of them.
+    '''
+
+    digest = hashlib.sha256()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+
+    for name in sorted(os.listdir(package_dir)):
+        if name.endswith('.py'):
+            with open(os.path.join(package_dir, name), 'rb') as source_file:
+                digest.update(source_file.read())
+
+    for value in extra:
+        digest.update(value.encode('utf-8'))
+
+    return digest.hexdigest()
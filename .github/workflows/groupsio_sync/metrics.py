@@ -0,0 +1,229 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Run instrumentation: phase timings, Groups.io request metrics and profiles.
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+class Metrics(object):
+    '''Timings and counters collected over one run.
+
+    Phases are timed in wall and CPU seconds; entering the same phase again
+    adds to its totals. Every HTTP attempt made to Groups.io is counted per
+    endpoint, with the bytes sent and received and a latency histogram, and
+    member fetches and mutations are counted per subgroup.
+
+    Counts may be added from several threads at once, as tenants run by
+    --tenant do. Their phases then add up to more than the wall time of the
+    run.
+
+    With ``profile_dir`` set, each phase also writes ``<phase>.prof`` (cProfile)
+    and ``<phase>.tracemalloc`` (a tracemalloc snapshot taken as it ends) there.
+    '''
+
+    # Upper bounds of the request latency histogram buckets, in seconds
+
+    latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, profile_dir=None):
+        self.profile_dir = profile_dir
+        self.started = time.time()
+
+        # phase -> {'wall_seconds', 'cpu_seconds', 'runs'[, 'peak_bytes']}
+
+        self.phases = dict()
+
+        # endpoint -> {'requests': {status: count}, 'bytes_sent', 'bytes_received',
+        #              'seconds', 'buckets': [count per latency bucket, then +Inf]}
+
+        self.endpoints = dict()
+
+        # subgroup -> {'fetches', 'mutations'}
+
+        self.subgroups = dict()
+
+        self._lock = threading.Lock()
+
+        if profile_dir:
+            import tracemalloc
+
+            os.makedirs(profile_dir, exist_ok=True)
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name):
+        '''Time the body of the with statement as phase ``name``.'''
+
+        profiler = None
+
+        if self.profile_dir:
+            import cProfile
+            import tracemalloc
+
+            tracemalloc.reset_peak()
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+
+            with self._lock:
+                totals = self.phases.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                    'runs': 0})
+                totals['wall_seconds'] += wall
+                totals['cpu_seconds'] += cpu
+                totals['runs'] += 1
+
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(self.profile_dir, '%s.prof' % name))
+
+                totals['peak_bytes'] = max(totals.get('peak_bytes', 0),
+                        tracemalloc.get_traced_memory()[1])
+                tracemalloc.take_snapshot().dump(
+                        os.path.join(self.profile_dir, '%s.tracemalloc' % name))
+
+    def request(self, endpoint, status, seconds, bytes_sent=0, bytes_received=0):
+        '''Record one HTTP attempt to ``endpoint``.'''
+
+        for index, bound in enumerate(self.latency_buckets):
+            if seconds <= bound:
+                break
+        else:
+            index = len(self.latency_buckets)
+
+        status = str(status)
+
+        with self._lock:
+            totals = self.endpoints.get(endpoint)
+
+            if totals is None:
+                totals = self.endpoints[endpoint] = {'requests': dict(), 'bytes_sent': 0,
+                        'bytes_received': 0, 'seconds': 0.0,
+                        'buckets': [0] * (len(self.latency_buckets) + 1)}
+
+            totals['requests'][status] = totals['requests'].get(status, 0) + 1
+            totals['bytes_sent'] += bytes_sent
+            totals['bytes_received'] += bytes_received
+            totals['seconds'] += seconds
+            totals['buckets'][index] += 1
+
+    def subgroup(self, subgroup_name, kind, count=1):
+        '''Count ``count`` 'fetches' or 'mutations' against ``subgroup_name``.'''
+
+        with self._lock:
+            totals = self.subgroups.get(subgroup_name)
+
+            if totals is None:
+                totals = self.subgroups[subgroup_name] = {'fetches': 0, 'mutations': 0}
+
+            totals[kind] += count
+
+    def as_dict(self):
+        return {
+            'started': self.started,
+            'phases': self.phases,
+            'endpoints': self.endpoints,
+            'latency_buckets': list(self.latency_buckets),
+            'subgroups': self.subgroups
+            }
+
+    def summary(self):
+        '''Return a one-line summary of the phase timings.'''
+
+        return ', '.join('%s %.2fs' % (name, totals['wall_seconds'])
+                for name, totals in self.phases.items())
+
+    def write_json(self, path):
+        _write_atomically(path, json.dumps(self.as_dict(), indent=1, sort_keys=True) + '\n')
+
+    def write_prometheus(self, path):
+        '''Write the metrics in the Prometheus text format, e.g. for node_exporter.'''
+
+        lines = list()
+
+        def metric(name, kind, help_text, samples):
+            lines.append('# HELP groupsio_sync_%s %s' % (name, help_text))
+            lines.append('# TYPE groupsio_sync_%s %s' % (name, kind))
+
+            for suffix, labels, value in samples:
+                lines.append('groupsio_sync_%s%s%s %s' % (name, suffix, _labels(labels),
+                    repr(float(value)) if isinstance(value, float) else value))
+
+        metric('last_run_timestamp_seconds', 'gauge', 'When the run started.',
+                [('', (), self.started)])
+
+        metric('phase_wall_seconds', 'gauge', 'Wall time spent in each phase.',
+                [('', (('phase', name),), totals['wall_seconds'])
+                    for name, totals in self.phases.items()])
+
+        metric('phase_cpu_seconds', 'gauge', 'CPU time spent in each phase.',
+                [('', (('phase', name),), totals['cpu_seconds'])
+                    for name, totals in self.phases.items()])
+
+        metric('requests_total', 'counter', 'Groups.io requests by endpoint and status.',
+                [('', (('endpoint', endpoint), ('status', status)), count)
+                    for endpoint, totals in sorted(self.endpoints.items())
+                    for status, count in sorted(totals['requests'].items())])
+
+        metric('request_bytes_sent_total', 'counter', 'Bytes sent to each endpoint.',
+                [('', (('endpoint', endpoint),), totals['bytes_sent'])
+                    for endpoint, totals in sorted(self.endpoints.items())])
+
+        metric('request_bytes_received_total', 'counter', 'Bytes received from each endpoint.',
+                [('', (('endpoint', endpoint),), totals['bytes_received'])
+                    for endpoint, totals in sorted(self.endpoints.items())])
+
+        samples = list()
+
+        for endpoint, totals in sorted(self.endpoints.items()):
+            cumulative = 0
+
+            for bound, count in zip(self.latency_buckets + ('+Inf',), totals['buckets']):
+                cumulative += count
+                samples.append(('_bucket', (('endpoint', endpoint), ('le', str(bound))),
+                    cumulative))
+
+            samples.append(('_sum', (('endpoint', endpoint),), totals['seconds']))
+            samples.append(('_count', (('endpoint', endpoint),), cumulative))
+
+        metric('request_duration_seconds', 'histogram', 'Groups.io request latency.', samples)
+
+        metric('subgroup_fetches_total', 'counter', 'getmembers pages fetched per subgroup.',
+                [('', (('subgroup', name),), totals['fetches'])
+                    for name, totals in sorted(self.subgroups.items())])
+
+        metric('subgroup_mutations_total', 'counter', 'Add and remove calls per subgroup.',
+                [('', (('subgroup', name),), totals['mutations'])
+                    for name, totals in sorted(self.subgroups.items())])
+
+        _write_atomically(path, '\n'.join(lines) + '\n')
+
+def _labels(labels):
+    if not labels:
+        return ''
+
+    return '{%s}' % ','.join('%s="%s"' % (key, value.replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')) for key, value in labels)
+
+def _write_atomically(path, content):
+
+    # Collectors may read the file at any moment, so never leave it half written
+
+    with open('%s.tmp' % path, 'w') as output_file:
+        output_file.write(content)
+
+    os.replace('%s.tmp' % path, path)
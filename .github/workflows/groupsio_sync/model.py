@@ -0,0 +1,215 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Compact records of the group configuration, subgroups, members and roles.
+
+import sys
+import json
+import hashlib
+
+from .definitions import valid_member
+from .profiles import Membership
+
+# Each class is built once from parsed YAML, with every optional field
+# resolved to a str or None, so later stages read plain attributes rather than
+# looking keys up in dicts. Strings which recur across the directory (emails,
+# names, sponsors, photos) are interned, so each is held once however many
+# subgroups a person is on.
+
+def _text(value, intern=True):
+    '''Return ``value`` as a str (interned unless told otherwise), or None if
+    it's missing or empty.'''
+
+    if not value:
+        return None
+
+    if not isinstance(value, str):
+        value = str(value)
+
+    return sys.intern(value) if intern else value
+
+def _present(data, key):
+    '''Return ``data[key]`` as a str if the key exists at all, or else None.'''
+
+    if key not in data:
+        return None
+
+    return str(data[key])
+
+class GroupConfig(object):
+    '''The settings from groups/assets/config.yml which the sync uses.'''
+
+    __slots__ = ('group_name', 'group_domain', 'main_list', 'unified_list',
+            'index_template_file', 'people_file')
+
+    def __init__(self, config):
+        self.group_name = config['group-name']
+        self.group_domain = config.get('group-domain')
+        self.main_list = config['main-list']
+        self.unified_list = config.get('unified-list') or ''
+        self.index_template_file = config['index-template-file']
+        self.people_file = config.get('people-file')
+
+class Role(object):
+    '''A titled role on a subgroup. ``term_info`` is the term as the
+    directory shows it, e.g. '2020-01-01 to 2021-12-31'.'''
+
+    __slots__ = ('title', 'voting', 'term_begins', 'term_ends', 'term_info')
+
+    def __init__(self, role):
+        term_begins = role.get('term-begins')
+        term_ends = role.get('term-ends')
+
+        self.title = _text(role['title'])
+        self.voting = bool(role.get('is-voting'))
+        self.term_begins = None if term_begins is None else str(term_begins)
+        self.term_ends = None if term_ends is None else str(term_ends)
+
+        # Format the term sensibly based upon what's provided
+
+        if term_begins and term_ends:
+            self.term_info = '%s to %s' % (term_begins, term_ends)
+        elif term_begins:
+            self.term_info = 'since %s' % term_begins
+        elif term_ends:
+            self.term_info = 'until %s' % term_ends
+        else:
+            self.term_info = ''
+
+class Member(object):
+    '''One list-members entry, as a usable (email, name) pair and the fields
+    of its directory card.
+
+    The email is lowercased and the name stripped, for the sync to use;
+    ``card_email`` and ``card_name`` are them as written, which the card
+    shows. ``card_key`` identifies entries which refer to a shared profile,
+    whose cards can be reused.
+    '''
+
+    __slots__ = ('email', 'name', 'card_email', 'card_name', 'meta_list', 'roles', 'photo', 'bio', 'sponsor',
+            'sponsor_website', 'github_username', 'twitter_username', 'linkedin_username',
+            'website', 'pronouns', 'card_key')
+
+    def __init__(self, email, name, entry, card_key=None):
+        get = entry.get
+
+        self.email = sys.intern(email)
+        self.name = sys.intern(name)
+        self.card_email = sys.intern(str(get('email')))
+        self.card_name = sys.intern(str(get('name')))
+        self.meta_list = not ('include-on-meta-list' in entry and
+                not entry['include-on-meta-list'])
+        self.roles = tuple(Role(role) for role in get('roles') or ()
+                if isinstance(role, dict) and role.get('title'))
+        self.photo = _text(get('photo'))
+        self.bio = _text(get('bio'), False)
+        self.sponsor = _text(get('sponsor'))
+        self.sponsor_website = _text(get('sponsor-website'))
+        self.github_username = _text(get('github-username'))
+        self.twitter_username = _text(get('twitter-username'))
+        self.linkedin_username = _text(get('linkedin-username'))
+        self.website = _text(get('website'))
+        self.pronouns = _text(get('pronouns'))
+        self.card_key = card_key
+
+class Subgroup(object):
+    '''A subgroup definition: the fields its page shows and its members.
+
+    ``digest`` is a hash of the whole definition as written (see
+    DefinitionDigest), so a page can be skipped when nothing it's rendered
+    from changed.
+    '''
+
+    __slots__ = ('local_name', 'name', 'description', 'logo', 'about_url', 'development_list',
+            'calendar', 'slack', 'discourse', 'irc', 'chat', 'twitter_username',
+            'linkedin_username', 'youtube', 'artwork', 'charter', 'code_of_conduct',
+            'contributing', 'git', 'members', 'digest')
+
+    def __init__(self, local_subgroup, groupdata, members, digest):
+        get = groupdata.get
+
+        self.local_name = local_subgroup
+        self.name = str(get('name') or '')
+        self.description = str(get('description') or '')
+        self.logo = _text(get('logo'))
+        self.about_url = _text(get('about-url'))
+        self.development_list = _text(get('development-list'))
+        self.calendar = _text(get('calendar'))
+        self.slack = _text(get('slack'))
+        self.discourse = _text(get('discourse'))
+        self.irc = _text(get('irc'))
+        self.chat = _text(get('chat'))
+        self.twitter_username = _text(get('twitter-username'))
+        self.linkedin_username = _text(get('linkedin-username'))
+        self.youtube = _text(get('youtube'))
+        self.artwork = _text(get('artwork'))
+        self.charter = _text(get('charter'))
+        self.code_of_conduct = _present(groupdata, 'code-of-conduct')
+        self.contributing = _present(groupdata, 'contributing')
+        self.git = tuple(str(repo['repo']) for repo in get('git') or ()
+                if isinstance(repo, dict) and repo.get('repo'))
+        self.members = tuple(members)
+        self.digest = digest
+
+class DefinitionDigest(object):
+    '''A hash of a subgroup definition, taken a member at a time, so the same
+    digest comes out whether the definition was loaded whole or streamed.'''
+
+    def __init__(self):
+        self.hash = hashlib.sha256()
+
+    def add_member(self, local_member):
+        self.hash.update(json.dumps(local_member, sort_keys=True, default=str).encode('utf-8'))
+        self.hash.update(b'\n')
+
+    def finish(self, groupdata):
+        '''Add the fields of ``groupdata`` other than its member list; return the digest.'''
+
+        if isinstance(groupdata.get('list-members'), list):
+            groupdata = dict((key, value) for key, value in groupdata.items()
+                    if key != 'list-members')
+
+        self.hash.update(json.dumps(groupdata, sort_keys=True, default=str).encode('utf-8'))
+
+        return self.hash.hexdigest()
+
+def build_member(local_member, profiles=None):
+    '''Return the Member for one list-members entry, or None if valid_member()
+    doesn't accept it. Entries referring to the same profile in the same way
+    share one Member, kept by ``profiles``.'''
+
+    valid = valid_member(local_member, profiles)
+
+    if valid is None:
+        return None
+
+    email, name, entry = valid
+
+    if not isinstance(entry, Membership):
+        return Member(email, name, entry)
+
+    card_key = (entry.profile.id, json.dumps(entry.entry, sort_keys=True, default=str))
+    member = profiles.members.get(card_key)
+
+    if member is None:
+        member = profiles.members[card_key] = Member(email, name, entry, card_key)
+
+    return member
+
+def build_subgroup(local_subgroup, groupdata, profiles=None):
+    '''Return the Subgroup for ``groupdata``, with the members build_member()
+    accepts.'''
+
+    members = list()
+    digest = DefinitionDigest()
+    local_members = groupdata.get('list-members')
+
+    for local_member in local_members if isinstance(local_members, list) else ():
+        digest.add_member(local_member)
+        member = build_member(local_member, profiles)
+
+        if member is not None:
+            members.append(member)
+
+    return Subgroup(local_subgroup, groupdata, members, digest.finish(groupdata))
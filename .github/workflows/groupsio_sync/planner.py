@@ -0,0 +1,116 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Coalescing of Groups.io directadd calls, and chunking of bulkremovemembers.
+
+from urllib.parse import quote
+
+# Upper bound on the encoded subgroupnames and emails of one directadd call,
+# comfortably below the URL lengths servers and proxies will accept
+
+directadd_max_bytes = 4000
+
+# Most emails removed by one bulkremovemembers call. They travel in the
+# request body, so this only bounds how much one failed call can hold up
+
+bulkremove_max_emails = 1000
+
+### Mutation planner ###
+
+class MutationPlanner(object):
+    '''Collect pending directadd calls and coalesce them into as few as possible.
+
+    Adds are recorded per (subgroup, email). When planned, emails that are
+    joining exactly the same set of subgroups share calls, each of which stays
+    under ``max_bytes`` of encoded subgroup names and emails. Removals are
+    recorded per subgroup and split into calls of at most ``max_removals``
+    emails.
+    '''
+
+    def __init__(self, max_bytes=directadd_max_bytes, max_removals=bulkremove_max_emails):
+        self.max_bytes = max_bytes
+        self.max_removals = max_removals
+        self.pending = dict()
+        self.removals = list()
+
+    def add(self, subgroup_name, email, name=''):
+        '''Queue ``email`` (with an optional display ``name``) for ``subgroup_name``.'''
+
+        if email not in self.pending:
+            self.pending[email] = [name, set()]
+        elif name and not self.pending[email][0]:
+            self.pending[email][0] = name
+
+        self.pending[email][1].add(subgroup_name)
+
+    def remove(self, subgroup_name, emails):
+        '''Queue ``emails`` (any iterable) to be removed from ``subgroup_name``.'''
+
+        self.removals.append((subgroup_name, emails))
+
+    def plan_removals(self):
+        '''Yield (subgroup_name, emails, chunk, chunks), one per bulkremovemembers call.
+
+        Each subgroup's removals are sorted and cut into ``chunks`` runs of at
+        most ``max_removals``, numbered from 1 by ``chunk``. Subgroups with
+        nothing to remove get no calls.
+        '''
+
+        for subgroup_name, emails in self.removals:
+            emails = sorted(emails)
+            chunks = -(-len(emails) // self.max_removals)
+
+            for chunk in range(chunks):
+                yield (subgroup_name, emails[chunk * self.max_removals:
+                    (chunk + 1) * self.max_removals], chunk + 1, chunks)
+
+    def __len__(self):
+        return sum(len(subgroups) for name, subgroups in self.pending.values())
+
+    def plan(self):
+        '''Return a list of (subgroup_names, emails, entries), one per directadd call.
+
+        ``entries`` are what is sent (``Name <email>`` where a name is known)
+        and ``emails`` are the bare addresses they correspond to.
+        '''
+
+        by_subgroups = dict()
+
+        for email, (name, subgroups) in self.pending.items():
+
+            # Add a name if one was provided
+
+            if name:
+                entry = '%s <%s>' % (name, email)
+            else:
+                entry = email
+
+            by_subgroups.setdefault(frozenset(subgroups), list()).append((entry, email))
+
+        calls = list()
+
+        for subgroups, entries in by_subgroups.items():
+            subgroup_names = sorted(subgroups)
+            used = len(quote(','.join(subgroup_names), safe=''))
+            batch = list()
+            batch_bytes = used
+
+            for entry, email in sorted(entries):
+
+                # Each entry costs its encoded length plus an encoded newline
+
+                entry_bytes = len(quote(entry, safe='')) + 3
+
+                if batch and batch_bytes + entry_bytes > self.max_bytes:
+                    calls.append((subgroup_names, [e for _, e in batch], [e for e, _ in batch]))
+                    batch = list()
+                    batch_bytes = used
+
+                batch.append((entry, email))
+                batch_bytes += entry_bytes
+
+            if batch:
+                calls.append((subgroup_names, [e for _, e in batch], [e for e, _ in batch]))
+
+        return calls
@@ -0,0 +1,213 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Shared member profiles, which list-members entries refer to by id.
+
+import sys
+
+from .definitions import SyntaxProblem, email_pattern, parse_yaml
+from .manifest import content_hash
+
+_missing = object()
+
+class Profile(object):
+    '''One person from the profile registry, parsed and checked once.
+
+    Reads like a list-members entry: get(), ``[]`` and ``in`` take the same
+    keys. The email is already lowercased and the name stripped, and strings
+    are interned, so a person on many subgroups costs one small object.
+    '''
+
+    keys = ('email', 'name', 'photo', 'bio', 'sponsor', 'sponsor-website', 'github-username',
+            'twitter-username', 'linkedin-username', 'website', 'pronouns')
+
+    __slots__ = ('id',) + tuple(key.replace('-','_') for key in keys)
+
+    def __init__(self, profile_id, fields):
+        self.id = sys.intern(str(profile_id))
+
+        for key in self.keys:
+            value = fields.get(key)
+
+            if isinstance(value, str):
+                value = sys.intern(value)
+
+            setattr(self, key.replace('-','_'), value)
+
+    def get(self, key, default=None):
+        if key not in self.keys:
+            return default
+
+        value = getattr(self, key.replace('-','_'))
+
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _missing)
+
+        if value is _missing:
+            raise KeyError(key)
+
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+class Membership(object):
+    '''A list-members entry which refers to a Profile by id.
+
+    Keys given in the entry itself, such as roles or include-on-meta-list,
+    come first; everything else comes from the profile.
+    '''
+
+    __slots__ = ('profile', 'entry')
+
+    def __init__(self, profile, entry):
+        self.profile = profile
+        self.entry = entry
+
+    def get(self, key, default=None):
+        if key in self.entry:
+            return self.entry[key]
+
+        return self.profile.get(key, default)
+
+    def __getitem__(self, key):
+        if key in self.entry:
+            return self.entry[key]
+
+        return self.profile[key]
+
+    def __contains__(self, key):
+        return key in self.entry or key in self.profile
+
+class ProfileRegistry(object):
+    '''The profiles in the file named by 'people-file' in config.yml, by id.
+
+    The file maps each id to the fields of a list-members entry (email, name,
+    photo, bio and so on). What's wrong with it is kept in ``problems``, as
+    (keys from the root, message), or in ``problem`` as a SyntaxProblem if
+    it isn't valid YAML, for validate_definitions to report with the
+    definitions; the ids of profiles with problems are in ``invalid``. The
+    Members built from entries, and their rendered cards, are
+    kept keyed on the profile and the rest of the entry, so a person is only
+    held and rendered once for every subgroup they have the same roles on.
+    With no ``path`` the registry is empty.
+    '''
+
+    def __init__(self, path=None):
+        self.path = path
+        self.profiles = dict()
+        self.members = dict()
+        self.cards = dict()
+        self.digest = ''
+        self.problems = list()
+        self.problem = None
+        self.invalid = set()
+
+        if path:
+            self._load(path)
+
+    def _load(self, path):
+        import yaml
+
+        with open(path, 'rb') as people_file:
+            content = people_file.read()
+
+        self.digest = content_hash(content)
+
+        try:
+            people = parse_yaml(content, path) or dict()
+        except yaml.YAMLError as error:
+            self.problem = SyntaxProblem(error)
+            return
+
+        if not isinstance(people, dict):
+            self.problems.append(((), 'profiles should be a mapping of ids to profiles'))
+            return
+
+        emails = dict()
+
+        for profile_id, fields in people.items():
+            problems = self._check(profile_id, fields)
+
+            if problems:
+                self.problems.extend(problems)
+                self.invalid.add(str(profile_id))
+                continue
+
+            profile = Profile(profile_id, dict(fields,
+                email=email_pattern.findall(fields['email'])[0].lower(),
+                name=fields['name'].strip()))
+
+            if profile.email in emails:
+                self.problems.append(((profile_id, 'email'), 'profiles %s and %s have the same '
+                    'email' % (emails[profile.email], profile_id)))
+
+            emails[profile.email] = profile_id
+            self.profiles[profile.id] = profile
+
+    def _check(self, profile_id, fields):
+        '''Return what's wrong with one profile, as (keys, message) pairs.'''
+
+        if not isinstance(fields, dict):
+            return [((profile_id,), 'profile %s should be a mapping with an email and a name' %
+                profile_id)]
+
+        problems = list()
+
+        for field in ('email', 'name'):
+            if not fields.get(field):
+                problems.append(((profile_id,), 'profile %s has no %s' % (profile_id, field)))
+            elif not isinstance(fields[field], str) or not fields[field].strip():
+                problems.append(((profile_id, field), 'profile %s %s should be text' %
+                    (profile_id, field)))
+
+        email = fields.get('email')
+
+        if isinstance(email, str) and email.strip() and not email_pattern.search(email):
+            problems.append(((profile_id, 'email'), '%s is not an email address' % email))
+
+        return problems
+
+    def is_current(self, path):
+        '''True if this registry was loaded from ``path`` as it is now.'''
+
+        if path != self.path:
+            return False
+
+        if not path:
+            return True
+
+        with open(path, 'rb') as people_file:
+            return content_hash(people_file.read()) == self.digest
+
+    def resolve(self, entry):
+        '''Return the Membership for an entry with an 'id', or None if unknown.'''
+
+        profile = self.profiles.get(str(entry['id']))
+
+        if profile is None:
+            return None
+
+        return Membership(profile, entry)
+
+    def render_member_card(self, member, voting_member_info, assets=None):
+        '''Render a Member's card, reusing the last one for the same entry.'''
+
+        from .render import render_member_card
+
+        if member.card_key is None:
+            return render_member_card(member, voting_member_info, assets)
+
+        cached = self.cards.get(member.card_key)
+
+        if cached is None:
+            voting_rows = list()
+            cached = self.cards[member.card_key] = (render_member_card(member, voting_rows,
+                assets), voting_rows)
+
+        voting_member_info.extend(cached[1])
+
+        return cached[0]
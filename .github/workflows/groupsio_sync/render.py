@@ -0,0 +1,451 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Rendering of directory pages from data-driven layouts.
+
+import os
+import glob
+import zlib
+import hashlib
+import itertools
+
+### Directory rendering ###
+
+# Page and member card layouts are data. Each item is one of:
+#
+#   ('text', format, keys...)      always written
+#   ('optional', format, keys...)  written when every key has a truthy value
+#   ('present', format, key)       written when the key was given, whatever its value
+#   ('first', items...)            the first of the items which applies
+#   ('join', format, separator, items...)
+#                                  the items which apply, joined with separator
+#                                  and written through format (even if empty)
+#   ('call', function, key)        function(value, data, *args) when the key
+#                                  has a truthy value
+#   ('asset', format, box, keys...)
+#                                  like 'optional', where the first key is an
+#                                  image shown in box, a (width, height), and
+#                                  is written as assets.url() gives it (see
+#                                  assets.AssetPipeline) if there's $assets
+#
+# Keys are the definition file's field names; each is read from the attribute
+# of the same name (with underscores for hyphens) of a Member or Subgroup,
+# where fields that weren't given are None. A member card shows the email and
+# name as written, as 'card-email' and 'card-name'. Keys starting with '$'
+# name an extra argument of the compiled function rather than a field of the
+# data. Adding a field to the directory means adding a line to a layout (and a
+# slot to the model), not another if block.
+
+# The size images are shown at, which assets scales them down to
+
+photo_box = (None, 100)
+logo_box = (200, None)
+
+member_card_layout = (
+    ('text', '\n### **%s**\n\n', 'card-name'),
+    ('asset', '<img src="%s" height=100 alt="Profile photo of %s">\n\n', photo_box,
+        'photo', 'card-email'),
+    ('call', 'render_roles', 'roles'),
+    ('optional', '\n%s\n', 'bio'),
+    ('first',
+        ('optional', '\nParticipating on behalf of **[%s](%s)**\n', 'sponsor', 'sponsor-website'),
+        ('optional', '\nParticipating on behalf of **%s**\n', 'sponsor')),
+    ('join', '\n%s\n\n', ' | ',
+        ('optional', '[GitHub](https://github.com/%s)', 'github-username'),
+        ('optional', '[Twitter](https://twitter.com/%s)', 'twitter-username'),
+        ('optional', '[LinkedIn](https://linkedin/in/%s)', 'linkedin-username'),
+        ('optional', '[Website](%s)', 'website'),
+        ('optional', 'Pronouns: %s', 'pronouns')),
+    )
+
+subgroup_header_layout = (
+    ('text', '# %s\n\n', 'name'),
+    ('asset', '<img align="right" src="%s" width=200 alt="%s logo">\n\n', logo_box,
+        'logo', 'name'),
+    ('text', '%s\n', 'description'),
+    )
+
+subgroup_contact_layout = (('join', '%s', ' | ',
+    ('optional', '[About](%s)', 'about-url'),
+    ('text', '[Mailing list](mailto:%s@%s)', '$local_subgroup', '$group_domain'),
+    ('optional', '[Dev list](%s)', 'development-list'),
+    ('optional', '[Calendar](%s)', 'calendar'),
+    ('optional', '[Slack](%s)', 'slack'),
+    ('optional', '[Discourse](%s)', 'discourse'),
+    ('optional', '[IRC](%s)', 'irc'),
+    ('optional', '[Chat](%s)', 'chat'),
+    ('optional', '[Twitter](https://twitter.com/%s)', 'twitter-username'),
+    ('optional', '[LinkedIn](https://linkedin/company/%s)', 'linkedin-username'),
+    ('optional', '[YouTube](%s)', 'youtube'),
+    ('optional', '[Artwork](%s)', 'artwork')),
+    )
+
+subgroup_governance_layout = (('join', '%s', ' | ',
+    ('optional', '[Charter](%s)', 'charter'),
+    ('present', '[Code of Conduct](%s)', 'code-of-conduct'),
+    ('present', '[CONTRIBUTING.md](%s)', 'contributing')),
+    )
+
+def render_roles(roles, member, voting_member_info, assets=None):
+    '''Render a Member's roles; collect voting ones as table rows.'''
+
+    rendered = ''
+
+    for role in roles:
+
+        # If the role conveys voting rights, add to voting list
+
+        if role.voting:
+            voting = ', voting member'
+            voting_member_info.append((member.card_name, role.title, role.term_info))
+        else:
+            voting = ''
+
+        if role.term_info:
+            rendered += '* **%s**%s (%s)\n' % (role.title, voting, role.term_info)
+        else:
+            rendered += '* **%s**%s\n' % (role.title, voting)
+
+    return rendered
+
+def render_repos(repos, subgroup):
+    return ''.join(['* [%s](%s)\n' % (repo, repo) for repo in repos])
+
+def compile_layout(name, layout, args=()):
+    '''Compile ``layout`` into a function ``name(data, *args)`` returning a str.
+
+    The function is generated as straight-line Python: one attribute read per
+    field, one f-string per item, and one concatenation for the result.
+    '''
+
+    lines = ['def %s(data%s):' % (name, ''.join(', %s' % arg for arg in args))]
+    fetched = set()
+    count = itertools.count()
+
+    def value(key):
+        '''Return the local name holding ``key``, fetching it on first use.'''
+
+        if key.startswith('$'):
+            return key[1:]
+
+        attribute = key.replace('-','_')
+        local = 'v_%s' % attribute
+
+        if local not in fetched:
+            fetched.add(local)
+            lines.append('    %s = data.%s' % (local, attribute))
+
+        return local
+
+    def truthy(keys):
+        '''Return the condition that every data key in ``keys`` is truthy.'''
+
+        return ' and '.join(value(key) for key in keys if not key.startswith('$'))
+
+    def fstring(template, values):
+
+        # Layout formats only use %s, which is exactly str() of the value
+
+        pieces = template.replace('{', '{{').replace('}', '}}').split('%s')
+
+        if len(pieces) != len(values) + 1:
+            raise ValueError('Layout format %r needs %d values' % (template, len(pieces) - 1))
+
+        return 'f%r' % ''.join(['%s{%s!s}' % (piece, local) for piece, local in
+                zip(pieces, values)] + [pieces[-1]])
+
+    def expression(item):
+        '''Return source for the string ``item`` renders to ('' if it doesn't apply).'''
+
+        kind = item[0]
+
+        if kind == 'text':
+            return fstring(item[1], [value(key) for key in item[2:]])
+
+        if kind == 'optional':
+            values = [value(key) for key in item[2:]]
+            return "(%s if %s else '')" % (fstring(item[1], values), truthy(item[2:]))
+
+        if kind == 'present':
+            local = value(item[2])
+            return "(%s if %s is not None else '')" % (fstring(item[1], [local]), local)
+
+        if kind == 'first':
+            return '(%s)' % ' or '.join(expression(choice) for choice in item[1:])
+
+        if kind == 'join':
+            parts = 'parts_%d' % next(count)
+            lines.append('    %s = []' % parts)
+
+            # Appending only the parts which apply is cheaper than filtering
+
+            for choice in item[3:]:
+                if choice[0] == 'text':
+                    lines.append('    %s.append(%s)' % (parts, expression(choice)))
+
+                elif choice[0] == 'optional':
+                    values = [value(key) for key in choice[2:]]
+                    lines.append('    if %s:' % truthy(choice[2:]))
+                    lines.append('        %s.append(%s)' % (parts, fstring(choice[1], values)))
+
+                elif choice[0] == 'present':
+                    values = [value(choice[2])]
+                    lines.append('    if %s is not None:' % values[0])
+                    lines.append('        %s.append(%s)' % (parts, fstring(choice[1], values)))
+
+                else:
+                    lines.append('    part = %s' % expression(choice))
+                    lines.append('    if part:')
+                    lines.append('        %s.append(part)' % parts)
+
+            lines.append('    %s = %r.join(%s)' % (parts, item[2], parts))
+            return fstring(item[1], [parts])
+
+        if kind == 'asset':
+            values = [value(key) for key in item[3:]]
+            local = 'a_%s' % values[0][2:]
+            lines.append('    %s = assets.url(%s, %r) if assets is not None and %s else %s' %
+                    (local, values[0], item[2], values[0], values[0]))
+            return "(%s if %s else '')" % (fstring(item[1], [local] + values[1:]),
+                    truthy(item[3:]))
+
+        if kind == 'call':
+            return "(%s(%s, data%s) if %s else '')" % (item[1], value(item[2]),
+                    ''.join(', %s' % arg for arg in args), value(item[2]))
+
+        raise ValueError('Unknown layout item: %r' % (item,))
+
+    rendered = list()
+
+    for item in layout:
+        rendered.append('r_%d' % len(rendered))
+        lines.append('    %s = %s' % (rendered[-1], expression(item)))
+
+    lines.append('    return %s' % fstring('%s' * len(rendered), rendered))
+
+    namespace = {'render_roles': render_roles, 'render_repos': render_repos}
+    exec(compile('\n'.join(lines) + '\n', '<layout %s>' % name, 'exec'), namespace)
+
+    return namespace[name]
+
+render_member_card = compile_layout('render_member_card', member_card_layout,
+        ('voting_member_info', 'assets'))
+render_subgroup_header = compile_layout('render_subgroup_header', subgroup_header_layout,
+        ('assets',))
+render_subgroup_contact = compile_layout('render_subgroup_contact', subgroup_contact_layout,
+        ('local_subgroup', 'group_domain'))
+render_subgroup_governance = compile_layout('render_subgroup_governance',
+        subgroup_governance_layout)
+render_subgroup_repos = compile_layout('render_subgroup_repos', (
+    ('call', 'render_repos', 'git'),
+    ))
+
+def voting_rows(subgroup):
+    '''Return the rows of a Subgroup's voting members table, as the member
+    cards would collect them.'''
+
+    return [(member.card_name, role.title, role.term_info) for member in subgroup.members
+            for role in member.roles if role.voting]
+
+def render_subgroup_page(local_file, subgroup, group_domain, member_cards, voting_member_info,
+        assets=None):
+    '''Assemble a Subgroup's page around its already rendered member cards.'''
+
+    return ''.join(subgroup_page_parts(local_file, subgroup, group_domain, member_cards,
+        voting_member_info, assets=assets))
+
+def page_footer(local_file):
+    return ('------\n\nThis directory is automatically generated. '
+        'To make changes, please submit a pull request against [%s](/%s)' %
+        (local_file, local_file))
+
+def subgroup_page_parts(local_file, subgroup, group_domain, member_cards, voting_member_info,
+        member_pages=None, voting_page=None, assets=None):
+    '''Yield a Subgroup's page piece by piece. ``member_cards`` may be an
+    iterator which renders each card as it's asked for, so a page can be
+    written without holding all of it; the voting members table, which comes
+    before the cards, must be complete already (see voting_rows()).
+
+    For a subgroup split into pages (see member_pages()), this is the summary
+    page: ``member_pages`` are the paths of its member pages, which it links
+    to in place of the cards, and ``voting_page`` is where its voting members
+    table went, if it has one. The logo is linked through ``assets``, if
+    given (see assets.AssetPipeline).
+    '''
+
+    header_info = render_subgroup_header(subgroup, assets)
+    contact_info = render_subgroup_contact(subgroup, subgroup.local_name, group_domain)
+    governance_info = render_subgroup_governance(subgroup)
+    developer_info = render_subgroup_repos(subgroup)
+
+    yield '<!-- AUTOGENERATED PAGE, DO NOT EDIT IT DIRECTLY -->\n'
+
+    if header_info:
+        yield '%s\n' % header_info
+
+    if contact_info:
+        yield contact_info
+
+    if governance_info or voting_member_info:
+        yield '\n## Governance:\n\n'
+        yield '\n%s' % governance_info
+
+        if voting_page:
+            yield '\n[Voting members](%s)\n' % voting_page
+
+        elif voting_member_info:
+            yield ('\n| Voting members | Role | Term |\n'
+                    '|---|---|---|\n')
+
+            for member in voting_member_info:
+                yield '| %s | %s | %s |\n' % member
+
+    if developer_info:
+        yield '\n## Repositories:\n\n'
+        yield developer_info
+
+    if member_pages is not None:
+        yield '\n## Members:\n\n'
+
+        for number, member_page in enumerate(member_pages, 1):
+            yield '* [Page %d](%s)\n' % (number, member_page)
+
+        yield '\n'
+
+    else:
+        cards = iter(member_cards)
+        card = next(cards, None)
+
+        if card is not None:
+            yield '\n## Members:\n'
+            yield card
+
+            for card in cards:
+                yield card
+
+    yield page_footer(local_file)
+
+### Paged subgroups ###
+
+# A subgroup with more members than the page size gets a summary page, which
+# keeps the subgroup's usual path, plus member pages named by who is on them
+# (see member_page_name()) and a voting members page next to it: tsc.md,
+# tsc.members-1f0c9a2e.md, tsc.voting.md and so on. Only the summary page
+# links to the member pages, so that none of them names another.
+# They stay in the same directory so that relative photo and logo paths work
+# on every page.
+
+def page_part_path(page_path, part):
+    '''Return the path of the ``part`` ('voting', 'members-1f0c9a2e'...) of
+    the page at ``page_path``.'''
+
+    return '%s.%s.md' % (os.path.splitext(page_path)[0], part)
+
+def remove_stale_parts(page_path, kept=()):
+    '''Remove the parts of the page at ``page_path`` that aren't in ``kept``,
+    left over from when it was split differently.'''
+
+    base = glob.escape(os.path.splitext(page_path)[0])
+
+    for part_path in glob.glob('%s.members-*.md' % base) + glob.glob('%s.voting.md' % base):
+        if part_path not in kept:
+            os.remove(part_path)
+
+# How many times a run of members too long for one page is split again, each
+# time at the members another hash picks, before it's simply cut up
+
+page_split_levels = 4
+
+def member_pages(members, page_size, level=0):
+    '''Split ``members`` into pages of about ``page_size``, in order.
+
+    A page ends after each member whose email hashes to 0 modulo
+    ``page_size``, so where pages end depends only on who is on them, not
+    on how many came before. Adding or removing a member only changes the
+    page they're on, unless they end a page themselves (about one time in
+    ``page_size``), when the page after theirs changes too.
+
+    A page that comes out longer than four times ``page_size`` is split
+    again the same way with a different hash (``level`` says which), so its
+    pages don't depend on position either: adding someone to it changes at
+    most two of them. After ``page_split_levels`` hashes, what's still too
+    long is cut every four times ``page_size`` members, which for any real
+    list of emails doesn't happen.
+    '''
+
+    pages = [[]]
+
+    for member in members:
+        pages[-1].append(member)
+
+        if _ends_page(member.email, page_size, level):
+            pages.append([])
+
+    if not pages[-1]:
+        pages.pop()
+
+    longest = 4 * page_size
+    split = list()
+
+    for page in pages:
+        if len(page) <= longest:
+            split.append(page)
+        elif level < page_split_levels:
+            split.extend(member_pages(page, page_size, level + 1))
+        else:
+            split.extend(page[start:start + longest] for start in range(0, len(page), longest))
+
+    return split
+
+def _ends_page(email, page_size, level):
+    '''True if the member with ``email`` ends a page at split ``level``.'''
+
+    email = email.encode('utf-8')
+
+    if level == 0:
+        digest = zlib.crc32(email)
+    else:
+        digest = int.from_bytes(hashlib.blake2b(email, digest_size=8,
+            person=b'page-level-%d' % level).digest(), 'big')
+
+    return digest % page_size == 0
+
+def member_page_name(members):
+    '''Return the part name ('members-<hash>') of the page of ``members``.
+
+    The name is a hash of the first member's email, so a page keeps its
+    name while others are added or removed around it.
+    '''
+
+    return 'members-%s' % hashlib.blake2b(members[0].email.encode('utf-8'),
+            digest_size=4, person=b'page-name').hexdigest()
+
+def member_page_parts(local_file, subgroup, summary_page, member_cards):
+    '''Yield a page of a Subgroup's member cards. It links back to the
+    summary page only, which lists all the member pages.'''
+
+    yield '<!-- AUTOGENERATED PAGE, DO NOT EDIT IT DIRECTLY -->\n'
+    yield '# %s members\n\n' % subgroup.name
+    yield '[Back to %s](%s)\n' % (subgroup.name, summary_page)
+    yield '\n## Members:\n'
+
+    for card in member_cards:
+        yield card
+
+    yield page_footer(local_file)
+
+def voting_page_parts(local_file, subgroup, summary_page, voting_member_info):
+    '''Yield the page with a Subgroup's voting members table.'''
+
+    yield '<!-- AUTOGENERATED PAGE, DO NOT EDIT IT DIRECTLY -->\n'
+    yield '# %s voting members\n\n' % subgroup.name
+    yield '[Back to %s](%s)\n' % (subgroup.name, summary_page)
+    yield ('\n| Voting members | Role | Term |\n'
+            '|---|---|---|\n')
+
+    for member in voting_member_info:
+        yield '| %s | %s | %s |\n' % member
+
+    yield '\n'
+    yield page_footer(local_file)
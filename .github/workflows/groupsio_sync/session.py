@@ -0,0 +1,127 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Pooled HTTP sessions, and Groups.io logins kept encrypted between runs.
+
+import os
+import json
+import time
+import base64
+import hashlib
+
+def pooled_session(concurrency):
+    '''Return a requests Session which keeps up to ``concurrency`` connections
+    alive and reuses them for every call, instead of reconnecting.'''
+
+    import requests
+
+    session = requests.Session()
+
+    # Every call goes to the one API host, so one pool sized for the calls in
+    # flight at once is all that's needed. Retries are left to the scheduler.
+
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency,
+            max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return session
+
+class SessionCache(object):
+    '''A Groups.io login (its cookies and CSRF token) saved between runs.
+
+    The file is encrypted with Fernet, from the cryptography package, under a
+    key derived from the account's password and a random salt kept with it,
+    so only a run with the same credentials can read it. A session is only
+    reused for the API URL and user it was created for. Without the
+    cryptography package, nothing is cached.
+    '''
+
+    version = 1
+
+    # PBKDF2 rounds for the key, which take a few tens of milliseconds, once
+    # per run
+
+    iterations = 100000
+
+    def __init__(self, path, user, password):
+        self.path = path
+        self.user = user
+        self.password = password
+
+        try:
+            from cryptography import fernet
+        except ImportError:
+            print('WARN: Caching the Groups.io session needs the cryptography package. '
+                    'Logging in as usual.')
+            fernet = None
+
+        self.fernet = fernet
+
+    def _cipher(self, salt):
+        key = hashlib.pbkdf2_hmac('sha256', self.password.encode('utf-8'), salt, self.iterations)
+
+        return self.fernet.Fernet(base64.urlsafe_b64encode(key))
+
+    def restore(self, session, api_url):
+        '''Put the cached cookies into ``session``; return the CSRF token, or
+        None if there is no usable cached session.'''
+
+        if self.fernet is None or not os.path.exists(self.path):
+            return None
+
+        try:
+            with open(self.path, 'r') as cache_file:
+                stored = json.load(cache_file)
+
+            salt = base64.b64decode(stored['salt'])
+            cached = json.loads(self._cipher(salt).decrypt(stored['token'].encode('ascii')))
+        except (OSError, ValueError, KeyError, TypeError, self.fernet.InvalidToken):
+            print('WARN: Ignoring unreadable Groups.io session cache: %s' % self.path)
+            return None
+
+        if (stored.get('version') != self.version or cached.get('api_url') != api_url or
+                cached.get('user') != self.user):
+            return None
+
+        for cookie in cached['cookies']:
+            session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'],
+                    path=cookie['path'], secure=cookie['secure'], expires=cookie['expires'])
+
+        return cached['csrf']
+
+    def save(self, session, api_url, csrf):
+        '''Encrypt and write ``session``'s cookies and ``csrf``, readable only
+        by the owner.'''
+
+        if self.fernet is None:
+            return
+
+        salt = os.urandom(16)
+        token = self._cipher(salt).encrypt(json.dumps({
+            'api_url': api_url,
+            'user': self.user,
+            'csrf': csrf,
+            'saved': time.time(),
+            'cookies': [{'name': cookie.name, 'value': cookie.value, 'domain': cookie.domain,
+                'path': cookie.path, 'secure': cookie.secure, 'expires': cookie.expires}
+                for cookie in session.cookies]
+            }).encode('utf-8'))
+
+        descriptor = os.open('%s.tmp' % self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+
+        with os.fdopen(descriptor, 'w') as cache_file:
+            json.dump({
+                'version': self.version,
+                'salt': base64.b64encode(salt).decode('ascii'),
+                'token': token.decode('ascii')
+                }, cache_file)
+
+        os.replace('%s.tmp' % self.path, self.path)
+
+    def clear(self):
+        '''Forget the cached session, e.g. once Groups.io has rejected it.'''
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,121 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Splitting a run across shards, and merging their partial results.
+
+import os
+import json
+import hashlib
+
+def parse_shard(value):
+    '''Parse ``i/N`` into (i, N), with shards numbered from 1.'''
+
+    try:
+        index, count = (int(number) for number in value.split('/'))
+    except ValueError:
+        raise ValueError('expected i/N, e.g. 2/4, not %s' % value)
+
+    if not 1 <= index <= count:
+        raise ValueError('%s is out of range' % value)
+
+    return index, count
+
+def shard_of(local_file, group_configs_dir, count):
+    '''Return the shard (1 to ``count``) whose subgroups ``local_file`` defines.
+
+    The hash is of the file's path within ``group_configs_dir``, so the
+    assignment is the same on every machine and doesn't move when other
+    files are added or removed.
+    '''
+
+    relative = os.path.relpath(local_file, group_configs_dir).replace(os.sep, '/')
+
+    return int(hashlib.sha1(relative.encode('utf-8')).hexdigest(), 16) % count + 1
+
+class PartialResult(object):
+    '''What one shard contributes to the README and the unified list.
+
+    ``subgroup_index`` holds the shard's {'name', 'path'} index entries,
+    ``pages`` maps each page it rendered to its contents, ``members`` maps
+    the email of every member of its reconciled subgroups to a name, and
+    ``no_meta_list`` holds its opt-outs from the unified list.
+    ``directory`` and ``groupsio`` say whether the shard ran with -d and -g.
+    '''
+
+    version = 1
+
+    def __init__(self, shard=None):
+        self.shard = shard
+        self.subgroup_index = list()
+        self.pages = dict()
+        self.members = dict()
+        self.no_meta_list = list()
+        self.directory = False
+        self.groupsio = False
+
+    def save(self, path):
+        with open('%s.tmp' % path, 'w') as partial_file:
+            json.dump({
+                'version': self.version,
+                'shard': list(self.shard),
+                'subgroup_index': self.subgroup_index,
+                'pages': self.pages,
+                'members': self.members,
+                'no_meta_list': self.no_meta_list,
+                'directory': self.directory,
+                'groupsio': self.groupsio
+                }, partial_file, sort_keys=True)
+
+        os.replace('%s.tmp' % path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as partial_file:
+            data = json.load(partial_file)
+
+        if data.get('version') != cls.version:
+            raise ValueError('Unsupported partial result: %s' % path)
+
+        partial = cls(tuple(data['shard']))
+        partial.subgroup_index = data['subgroup_index']
+        partial.pages = data['pages']
+        partial.members = data['members']
+        partial.no_meta_list = data['no_meta_list']
+        partial.directory = data['directory']
+        partial.groupsio = data['groupsio']
+
+        return partial
+
+def merge_partials(paths):
+    '''Load and combine the partial results in ``paths``.
+
+    Partials are combined in shard order, whatever order they are given in,
+    so the result is the same every time. Every shard of the split must be
+    present exactly once.
+    '''
+
+    partials = sorted((PartialResult.load(path) for path in paths),
+            key=lambda partial: partial.shard)
+
+    if not partials:
+        raise ValueError('No partial results to merge')
+
+    count = partials[0].shard[1]
+    shards = [partial.shard for partial in partials]
+
+    if shards != [(index, count) for index in range(1, count + 1)]:
+        raise ValueError('Expected shards 1/%d to %d/%d once each, got %s' % (count, count, count,
+            ', '.join('%d/%d' % shard for shard in shards)))
+
+    merged = PartialResult((1, 1))
+    merged.directory = all(partial.directory for partial in partials)
+    merged.groupsio = all(partial.groupsio for partial in partials)
+
+    for partial in partials:
+        merged.subgroup_index.extend(partial.subgroup_index)
+        merged.pages.update(partial.pages)
+        merged.members.update(partial.members)
+        merged.no_meta_list.extend(partial.no_meta_list)
+
+    return merged
@@ -0,0 +1,136 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# On-disk snapshot of Groups.io membership between runs.
+
+import os
+import json
+import time
+import hashlib
+
+### Membership snapshot ###
+
+class MembershipSnapshot(object):
+    '''On-disk copy of what Groups.io looked like after the last sync.
+
+    Holds the getsubgroups result and, for each subgroup, its member and
+    moderator sets plus a hash of the local definition it was last reconciled
+    against. Entries older than ``ttl`` seconds (or all of them, when
+    ``refresh`` is set) are treated as missing, which bounds how long changes
+    made directly in Groups.io can go unnoticed. With no ``path`` nothing is
+    read or written and every lookup misses.
+    '''
+
+    version = 1
+
+    def __init__(self, path=None, ttl=3600, refresh=False):
+        self.path = path
+        self.ttl = ttl
+        self.refresh = refresh
+        self.dirty = False
+        self.data = {'version': self.version, 'subgroups': None, 'members': dict()}
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as snapshot_file:
+                    data = json.load(snapshot_file)
+            except ValueError:
+                print('WARN: Ignoring unreadable snapshot: %s' % path)
+            else:
+                if data.get('version') == self.version:
+                    self.data = data
+
+    def _fresh(self, entry):
+        return (entry is not None and not self.refresh and
+                time.time() - entry['fetched'] < self.ttl)
+
+    def subgroups(self):
+        '''Return the cached getsubgroups data, or None if it must be fetched.'''
+
+        if self._fresh(self.data['subgroups']):
+            return self.data['subgroups']['data']
+
+    def set_subgroups(self, subgroups):
+        self.data['subgroups'] = {'fetched': time.time(), 'data': subgroups}
+        self.dirty = True
+
+    def members(self, subgroup_name):
+        '''Return cached (members, mods) for ``subgroup_name``, or None.'''
+
+        entry = self.data['members'].get(subgroup_name)
+
+        if self._fresh(entry):
+            return set(entry['members']), set(entry['mods'])
+
+    def set_members(self, subgroup_name, members, mods):
+        self.data['members'][subgroup_name] = {
+            'fetched': time.time(),
+            'definition': None,
+            'members': sorted(members),
+            'mods': sorted(mods)
+            }
+        self.dirty = True
+
+    def definition(self, subgroup_name):
+        '''Return the definition hash ``subgroup_name`` was last synced to.'''
+
+        entry = self.data['members'].get(subgroup_name)
+
+        if self._fresh(entry):
+            return entry['definition']
+
+    def set_definition(self, subgroup_name, definition):
+        if subgroup_name in self.data['members']:
+            self.data['members'][subgroup_name]['definition'] = definition
+            self.dirty = True
+
+    def added(self, subgroup_name, emails):
+        '''Record that ``emails`` were added, instead of fetching again.'''
+
+        entry = self.data['members'].get(subgroup_name)
+
+        if entry is not None:
+            entry['members'] = sorted(set(entry['members']).union(emails))
+            self.dirty = True
+
+    def removed(self, subgroup_name, emails):
+        '''Record that ``emails`` were removed, instead of fetching again.'''
+
+        entry = self.data['members'].get(subgroup_name)
+
+        if entry is not None:
+            entry['members'] = sorted(set(entry['members']).difference(emails))
+            self.dirty = True
+
+    def invalidate(self, subgroup_name):
+        '''Forget ``subgroup_name`` so the next run fetches it again.'''
+
+        if self.data['members'].pop(subgroup_name, None) is not None:
+            self.dirty = True
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+
+        # Write to a temporary file first so an interrupted run can't leave a
+        # truncated snapshot behind
+
+        with open('%s.tmp' % self.path, 'w') as snapshot_file:
+            json.dump(self.data, snapshot_file)
+
+        os.replace('%s.tmp' % self.path, self.path)
+        self.dirty = False
+
+def definition_hash(valid_members, excluded=()):
+    '''Hash the email -> name mapping (and opt-outs) a list is reconciled to.'''
+
+    digest = hashlib.sha256()
+
+    for email in sorted(valid_members):
+        digest.update(('%s\t%s\n' % (email, valid_members[email])).encode('utf-8'))
+
+    for email in sorted(set(excluded)):
+        digest.update(('-%s\n' % email).encode('utf-8'))
+
+    return digest.hexdigest()
@@ -0,0 +1,269 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# SQLite store of the directory and Groups.io membership, and queries on it.
+
+import os
+import sys
+import getopt
+import sqlite3
+from urllib.parse import quote
+
+from .manifest import file_hash, relative_path
+
+schema = '''
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    input TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS subgroups (
+    name TEXT PRIMARY KEY,
+    local_name TEXT NOT NULL,
+    title TEXT,
+    file TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS subgroups_file ON subgroups (file);
+
+CREATE TABLE IF NOT EXISTS members (
+    subgroup TEXT NOT NULL,
+    email TEXT NOT NULL,
+    name TEXT NOT NULL,
+    meta_list INTEGER NOT NULL,
+    UNIQUE (subgroup, email)
+);
+
+CREATE INDEX IF NOT EXISTS members_email ON members (email);
+
+CREATE TABLE IF NOT EXISTS roles (
+    subgroup TEXT NOT NULL,
+    email TEXT NOT NULL,
+    title TEXT NOT NULL,
+    voting INTEGER NOT NULL,
+    term_begins TEXT,
+    term_ends TEXT
+);
+
+CREATE INDEX IF NOT EXISTS roles_subgroup ON roles (subgroup);
+CREATE INDEX IF NOT EXISTS roles_email ON roles (email);
+CREATE INDEX IF NOT EXISTS roles_voting ON roles (voting, title);
+
+CREATE TABLE IF NOT EXISTS groupsio_subgroups (
+    name TEXT PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS groupsio (
+    subgroup TEXT NOT NULL,
+    email TEXT NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (subgroup, email)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS groupsio_email ON groupsio (email);
+'''
+
+class DirectoryStore(object):
+    '''Local definitions and Groups.io membership in an SQLite database.
+
+    ``subgroups``, ``members`` and ``roles`` hold what the definition files
+    say, replaced file by file as they are read; ``files`` holds the hash of
+    each file they came from. ``groupsio_subgroups`` lists the subgroups this
+    run may manage, and ``groupsio`` holds the members ('member') and
+    moderators ('mod') last seen at Groups.io, kept in step with the changes
+    the sync makes. Subgroups are stored under their Groups.io names, e.g.
+    ``graphql+tsc``. Changes are committed by save(). Definition files are
+    given as paths to read, and stored relative to ``root``, the tenant's
+    root (see manifest.relative_path()).
+    '''
+
+    version = 1
+
+    def __init__(self, path, root=''):
+        self.path = path
+        self.root = root
+        self.db = sqlite3.connect(path)
+
+        if self.db.execute('PRAGMA user_version').fetchone()[0] != self.version:
+            for table in ('files', 'subgroups', 'members', 'roles', 'groupsio_subgroups',
+                    'groupsio'):
+                self.db.execute('DROP TABLE IF EXISTS %s' % table)
+
+            self.db.execute('PRAGMA user_version = %d' % self.version)
+
+        self.db.executescript(schema)
+
+    ### Local definitions ###
+
+    def file_is_current(self, local_file):
+        '''True if the rows from ``local_file`` match the file as it is now.'''
+
+        row = self.db.execute('SELECT input FROM files WHERE path = ?',
+                (relative_path(local_file, self.root),)).fetchone()
+
+        return row is not None and row[0] == file_hash(local_file)
+
+    def set_file(self, local_file):
+        '''Forget what ``local_file`` defined, ready for set_subgroup().'''
+
+        input_hash = file_hash(local_file)
+        local_file = relative_path(local_file, self.root)
+
+        self._delete_subgroups('file = ?', (local_file,))
+        self.db.execute('INSERT OR REPLACE INTO files VALUES (?, ?)', (local_file, input_hash))
+
+    def set_subgroup(self, local_file, subgroup_name, subgroup):
+        '''Store a Subgroup and its members under ``subgroup_name``.'''
+
+        self.db.execute('INSERT OR REPLACE INTO subgroups VALUES (?, ?, ?, ?)',
+                (subgroup_name, subgroup.local_name, subgroup.name,
+                    relative_path(local_file, self.root)))
+
+        self.db.executemany('INSERT OR REPLACE INTO members VALUES (?, ?, ?, ?)',
+                [(subgroup_name, member.email, member.name, 1 if member.meta_list else 0)
+                    for member in subgroup.members])
+
+        self.db.executemany('INSERT INTO roles VALUES (?, ?, ?, ?, ?, ?)',
+                [(subgroup_name, member.email, role.title, 1 if role.voting else 0,
+                    role.term_begins, role.term_ends)
+                    for member in subgroup.members for role in member.roles])
+
+    def prune(self):
+        '''Forget definition files which no longer exist.'''
+
+        for (local_file,) in self.db.execute('SELECT path FROM files').fetchall():
+            if not os.path.exists(os.path.join(self.root, local_file)):
+                self._delete_subgroups('file = ?', (local_file,))
+                self.db.execute('DELETE FROM files WHERE path = ?', (local_file,))
+
+    def _delete_subgroups(self, where, parameters):
+        for table in ('members', 'roles'):
+            self.db.execute('DELETE FROM %s WHERE subgroup IN (SELECT name FROM subgroups WHERE %s)'
+                    % (table, where), parameters)
+
+        self.db.execute('DELETE FROM subgroups WHERE %s' % where, parameters)
+
+    ### Groups.io ###
+
+    def set_groupsio_subgroups(self, subgroup_names):
+        self.db.execute('DELETE FROM groupsio_subgroups')
+        self.db.executemany('INSERT INTO groupsio_subgroups VALUES (?)',
+                [(subgroup_name,) for subgroup_name in subgroup_names])
+
+    def set_groupsio_members(self, subgroup_name, members, mods):
+        self.forget_groupsio(subgroup_name)
+        self.db.executemany('INSERT OR REPLACE INTO groupsio VALUES (?, ?, ?)',
+                [(subgroup_name, email, 'member') for email in members] +
+                [(subgroup_name, email, 'mod') for email in mods])
+
+    def groupsio_added(self, subgroup_name, emails):
+        self.db.executemany('INSERT OR IGNORE INTO groupsio VALUES (?, ?, ?)',
+                [(subgroup_name, email, 'member') for email in emails])
+
+    def groupsio_removed(self, subgroup_name, emails):
+        self.db.executemany('DELETE FROM groupsio WHERE subgroup = ? AND email = ? AND '
+                "status = 'member'", [(subgroup_name, email) for email in emails])
+
+    def forget_groupsio(self, subgroup_name):
+        self.db.execute('DELETE FROM groupsio WHERE subgroup = ?', (subgroup_name,))
+
+    def unified_changes(self, unified_name):
+        '''Return (to_add {email: name}, to_remove) for the unified list.
+
+        Everyone on a managed subgroup belongs on it, under the name they were
+        last given, unless any definition opts them out. Opt-outs are always
+        removed; moderators are never added or removed.
+        '''
+
+        managed = ('SELECT members.email FROM members JOIN groupsio_subgroups '
+                'ON groupsio_subgroups.name = members.subgroup')
+        opted_out = 'SELECT email FROM members WHERE NOT meta_list'
+
+        to_add = dict(self.db.execute('SELECT email, name FROM members WHERE rowid IN '
+                '(SELECT MAX(members.rowid) FROM members JOIN groupsio_subgroups '
+                'ON groupsio_subgroups.name = members.subgroup GROUP BY members.email) '
+                'AND email NOT IN (SELECT email FROM groupsio WHERE subgroup = ?) '
+                'AND email NOT IN (%s)' % opted_out, (unified_name,)))
+
+        to_remove = set(email for (email,) in self.db.execute('SELECT email FROM groupsio '
+                "WHERE subgroup = ? AND status = 'member' AND email NOT IN (%s) "
+                'UNION %s' % (managed, opted_out), (unified_name,)))
+
+        return to_add, to_remove
+
+    def save(self):
+        self.db.commit()
+
+### Queries ###
+
+queries = {
+    'lists': ('EMAIL', 'The lists EMAIL is defined on or is a member of at Groups.io.',
+        '''SELECT subgroup, 'defined' FROM members WHERE email = :arg
+           UNION ALL SELECT subgroup, status FROM groupsio WHERE email = :arg
+           ORDER BY 1, 2'''),
+    'members': ('SUBGROUP', 'The members SUBGROUP defines, with any roles.',
+        '''SELECT members.email, members.name, group_concat(roles.title, '; ')
+           FROM members JOIN subgroups ON subgroups.name = members.subgroup
+           LEFT JOIN roles ON roles.subgroup = members.subgroup AND roles.email = members.email
+           WHERE :arg IN (subgroups.name, subgroups.local_name)
+           GROUP BY members.email ORDER BY members.email'''),
+    'busy': ('N', 'People defined on more than N subgroups.',
+        '''SELECT email, count(*), group_concat(subgroup, ', ') FROM members
+           GROUP BY email HAVING count(*) > CAST(:arg AS INTEGER) ORDER BY 2 DESC, 1'''),
+    'voting': ('[SUBGROUP]', 'Voting roles, optionally only those on SUBGROUP.',
+        '''SELECT roles.subgroup, roles.email, roles.title, roles.term_begins, roles.term_ends
+           FROM roles JOIN subgroups ON subgroups.name = roles.subgroup
+           WHERE roles.voting AND (:arg IS NULL OR :arg IN (subgroups.name, subgroups.local_name))
+           ORDER BY 1, 2'''),
+    'role': ('TITLE', 'Everyone holding a role titled TITLE.',
+        '''SELECT roles.subgroup, roles.email, roles.voting, roles.term_begins, roles.term_ends
+           FROM roles WHERE title = :arg ORDER BY 1, 2'''),
+    'unsynced': ('', 'Managed subgroups whose Groups.io members differ from their definitions.',
+        '''SELECT members.subgroup, members.email, 'to add' FROM members
+           JOIN groupsio_subgroups ON groupsio_subgroups.name = members.subgroup
+           WHERE members.subgroup IN (SELECT subgroup FROM groupsio)
+           AND NOT EXISTS (SELECT 1 FROM groupsio WHERE groupsio.subgroup = members.subgroup
+               AND groupsio.email = members.email)
+           UNION ALL SELECT groupsio.subgroup, groupsio.email, 'to remove' FROM groupsio
+           JOIN subgroups ON subgroups.name = groupsio.subgroup
+           WHERE groupsio.status = 'member' AND NOT EXISTS (SELECT 1 FROM members
+               WHERE members.subgroup = groupsio.subgroup AND members.email = groupsio.email)
+           ORDER BY 1, 3, 2''')
+    }
+
+def usage():
+    print('Usage: query-directory.py [--store=PATH] QUERY [ARGUMENT]\n')
+
+    for name, (argument, description, sql) in queries.items():
+        print('  %-20s %s' % (('%s %s' % (name, argument)).strip(), description))
+
+    print('  %-20s %s' % ('sql STATEMENT', 'Any read-only SQL statement.'))
+
+def main(argv=None):
+    '''Print the answer to one query against the store, tab separated.'''
+
+    opts,args = getopt.getopt(sys.argv[1:] if argv is None else argv, '', ['store='])
+    path = 'directory.sqlite'
+
+    for opt in opts:
+        if opt[0] == '--store':
+            path = opt[1]
+
+    if not args or (args[0] not in queries and args[0] != 'sql'):
+        usage()
+        sys.exit(2)
+
+    if not os.path.exists(path):
+        print('ERROR: No store at %s. Run the sync with --store=%s first.' % (path, path))
+        sys.exit(1)
+
+    db = sqlite3.connect('file:%s?mode=ro' % quote(path), uri=True)
+
+    if args[0] == 'sql':
+        rows = db.execute(' '.join(args[1:]))
+    else:
+        rows = db.execute(queries[args[0]][2], {'arg': args[1] if len(args) > 1 else None})
+
+    for row in rows:
+        print('\t'.join('' if value is None else str(value) for value in row))
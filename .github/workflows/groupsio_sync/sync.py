@@ -0,0 +1,310 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Reconciliation of Groups.io subgroups with their local definitions.
+
+import asyncio
+
+from .planner import MutationPlanner, bulkremove_max_emails
+from .snapshot import definition_hash
+
+class GroupsioSync(object):
+    '''Bring Groups.io subgroups, and the unified list, in line with local files.
+
+    ``client`` is a GroupsioClient which has already logged in, and
+    ``snapshot`` a MembershipSnapshot (which may be disabled). With a
+    DirectoryStore as ``store``, Groups.io membership is recorded there too,
+    and the unified list is compared with the definitions it holds. Removals
+    are sent at most ``max_removals`` emails per call.
+    '''
+
+    def __init__(self, client, snapshot, group_name, unified_list='', store=None,
+            max_removals=bulkremove_max_emails):
+        self.client = client
+        self.snapshot = snapshot
+        self.store = store
+        self.group_name = group_name
+        self.unified_list = unified_list
+        self.planner = MutationPlanner(max_removals=max_removals)
+        self.metrics = client.metrics
+
+        # The definition hashes to record once everything planned has been
+        # applied
+
+        self.definitions = dict()
+
+        # Every member of every reconciled subgroup, for the unified list
+
+        self.all_local_valid_members = dict()
+
+    async def get_members(self, calculated_name):
+        '''Return (members, mods) from a fresh snapshot, or fetch and remember them.'''
+
+        groupsio_members_and_mods = self.snapshot.members(calculated_name)
+
+        if groupsio_members_and_mods is None:
+            groupsio_members_and_mods = await self.client.get_members(calculated_name)
+
+            if groupsio_members_and_mods is not None:
+                self.snapshot.set_members(calculated_name, *groupsio_members_and_mods)
+
+        if self.store is not None and groupsio_members_and_mods is not None:
+            self.store.set_groupsio_members(calculated_name, *groupsio_members_and_mods)
+
+        return groupsio_members_and_mods
+
+    async def reconcile_subgroup(self, calculated_subgroup_name, local_valid_members):
+        '''Fetch one subgroup's members and plan the changes that match them to the local file.'''
+
+        snapshot = self.snapshot
+
+        # Nothing to do if this definition was already synced and the snapshot of
+        # the result is still fresh
+
+        definition = definition_hash(local_valid_members)
+
+        if snapshot.definition(calculated_subgroup_name) == definition:
+            self.all_local_valid_members.update(local_valid_members)
+            return
+
+        # Add users who aren't moderators to the comparison list. Users who are mods
+        # are added to a protected list.
+
+        groupsio_members_and_mods = await self.get_members(calculated_subgroup_name)
+
+        if groupsio_members_and_mods is None:
+            return
+
+        groupsio_members, groupsio_mods = groupsio_members_and_mods
+
+        # Calculate the differences between the local file and Groups.io
+
+        local_members_to_add = set(local_valid_members.keys()) - groupsio_members - groupsio_mods
+        groupsio_members_to_remove = groupsio_members - set(local_valid_members.keys())
+
+        # Queue missing members to be added to groups.io
+
+        for new_member in local_members_to_add:
+            self.planner.add(calculated_subgroup_name, new_member, local_valid_members[new_member])
+
+        # Queue members which are not in the local file to be pruned
+
+        self.planner.remove(calculated_subgroup_name, groupsio_members_to_remove)
+
+        self.definitions[calculated_subgroup_name] = definition
+
+        # Add local members to meta list
+
+        self.all_local_valid_members.update(local_valid_members)
+
+    async def reconcile_unified(self, calculated_unified_name, groupsio_unified_members_and_mods,
+            no_meta_list):
+        '''Plan the changes that match the unified list to every subgroup reconciled above.'''
+
+        snapshot = self.snapshot
+        all_local_valid_members = self.all_local_valid_members
+
+        definition = definition_hash(all_local_valid_members, no_meta_list)
+
+        if snapshot.definition(calculated_unified_name) == definition:
+            return
+
+        if groupsio_unified_members_and_mods is None:
+            return
+
+        groupsio_unified_members, groupsio_unified_mods = groupsio_unified_members_and_mods
+
+        # Calculate the differences between the local file and Groups.io
+
+        if self.store is not None:
+            local_members_to_add, groupsio_members_to_remove = self.store.unified_changes(
+                    calculated_unified_name)
+        else:
+            local_members_to_add = dict((email, all_local_valid_members[email]) for email in
+                    set(all_local_valid_members.keys()) - groupsio_unified_members - groupsio_unified_mods - set(no_meta_list))
+            groupsio_members_to_remove = (groupsio_unified_members - set(all_local_valid_members.keys())).union(set(no_meta_list))
+
+        # Queue missing members to be added to groups.io
+
+        for new_member, name in local_members_to_add.items():
+            self.planner.add(calculated_unified_name, new_member, name)
+
+        # Queue members which are not in the local file to be pruned
+
+        self.planner.remove(calculated_unified_name, groupsio_members_to_remove)
+
+        self.definitions[calculated_unified_name] = definition
+
+    async def apply_unified_delta(self, calculated_unified_name, to_add, to_remove):
+        '''Plan a known change to the unified list without fetching its members.
+
+        If the snapshot holds fresh members for the list, it is used to skip
+        adds of people already there and removals of moderators.
+        '''
+
+        snapshot = self.snapshot
+        known = snapshot.members(calculated_unified_name)
+
+        if known is not None:
+            groupsio_unified_members, groupsio_unified_mods = known
+            to_add = dict((email, name) for email, name in to_add.items()
+                    if email not in groupsio_unified_members and email not in groupsio_unified_mods)
+            to_remove = set(to_remove) & groupsio_unified_members
+
+        for new_member, name in to_add.items():
+            self.planner.add(calculated_unified_name, new_member, name)
+
+        self.planner.remove(calculated_unified_name, to_remove)
+
+    def plan_batches(self):
+        '''Return the planned mutations as journal batches: removals, then adds.
+
+        Removal batches also carry their [chunk, chunks] of the subgroup's
+        removals.
+        '''
+
+        batches = [{'endpoint': 'bulkremovemembers', 'subgroups': [subgroup_name],
+            'emails': emails, 'chunk': [chunk, chunks]}
+            for subgroup_name, emails, chunk, chunks in self.planner.plan_removals()]
+
+        batches.extend({'endpoint': 'directadd', 'subgroups': subgroup_names, 'emails': emails,
+            'entries': entries} for subgroup_names, emails, entries in self.planner.plan())
+
+        for batch_id, batch in enumerate(batches):
+            batch['id'] = batch_id
+
+        return batches
+
+    async def apply(self, batches, definitions, journal=None):
+        '''Send ``batches`` concurrently, then record ``definitions`` as synced.
+
+        Each batch is recorded in the ``journal`` (if any) as it completes.
+        '''
+
+        snapshot = self.snapshot
+
+        async def apply_batch(batch):
+            subgroup_names = batch['subgroups']
+
+            # Removals of more than one chunk say which chunk each result is for
+
+            described = ', '.join(subgroup_names)
+
+            if batch.get('chunk', [1, 1])[1] > 1:
+                described += ' (removal %d of %d)' % tuple(batch['chunk'])
+
+            if batch['endpoint'] == 'directadd':
+                result = await self.client.direct_add(self.group_name, subgroup_names,
+                        batch['entries'])
+            else:
+                result = await self.client.bulk_remove(subgroup_names[0], batch['emails'])
+
+            # Keep the snapshot in step with what was applied. If anything went
+            # wrong, forget those subgroups so the next run fetches them again.
+
+            if result['object'] == 'error':
+                print('Something went wrong: %s | %s' % (described, result['type']))
+
+            if result['object'] == 'error' or result.get('errors'):
+                for subgroup_name in subgroup_names:
+                    snapshot.invalidate(subgroup_name)
+
+                    if self.store is not None:
+                        self.store.forget_groupsio(subgroup_name)
+
+                if journal is not None:
+                    journal.record(batch, result.get('type', 'errors'))
+
+                return
+
+            if batch['endpoint'] != 'directadd':
+                print('INFO: Removed %d member(s) from %s.' % (len(batch['emails']), described))
+
+            for subgroup_name in subgroup_names:
+                if batch['endpoint'] == 'directadd':
+                    snapshot.added(subgroup_name, batch['emails'])
+
+                    if self.store is not None:
+                        self.store.groupsio_added(subgroup_name, batch['emails'])
+                else:
+                    snapshot.removed(subgroup_name, batch['emails'])
+
+                    if self.store is not None:
+                        self.store.groupsio_removed(subgroup_name, batch['emails'])
+
+            if journal is not None:
+                journal.record(batch)
+
+        adds = [batch for batch in batches if batch['endpoint'] == 'directadd']
+        removals = [batch for batch in batches if batch['endpoint'] != 'directadd']
+
+        if removals:
+            print('INFO: Removing %d memberships in %d requests.' %
+                    (sum(len(batch['emails']) for batch in removals), len(removals)))
+
+        if adds:
+            print('INFO: Adding %d memberships in %d requests.' %
+                    (sum(len(batch['emails']) * len(batch['subgroups']) for batch in adds),
+                        len(adds)))
+
+        await asyncio.gather(*[apply_batch(batch) for batch in batches])
+
+        # Subgroups which failed were dropped from the snapshot above, so this
+        # only marks those that are now fully in sync
+
+        for subgroup_name, definition in definitions.items():
+            snapshot.set_definition(subgroup_name, definition)
+
+    async def run(self, pending_subgroups, no_meta_list=(), unified_delta=None, journal=None,
+            plan_only=False):
+        '''Plan the changes to every pending subgroup and the unified list, then apply them.
+
+        ``pending_subgroups`` holds (calculated subgroup name, {email: name})
+        pairs. Each subgroup is reconciled as soon as its own member list is
+        complete. The unified list's members are fetched alongside the
+        subgroups, but it is only reconciled once every subgroup has
+        contributed its members. Nothing is changed while planning: removals
+        and adds are queued, and then sent together, so one person joining
+        several lists costs a single call.
+
+        With ``unified_delta``, a (to_add, to_remove) pair, that change is
+        planned for the unified list instead, without fetching it.
+
+        The plan is written to ``journal`` (a MutationJournal) before anything
+        is applied. With ``plan_only``, it is printed instead of applied.
+        '''
+
+        with self.metrics.phase('reconcile'):
+            if self.unified_list and unified_delta is None:
+                calculated_unified_name = '%s+%s' % (self.group_name,self.unified_list)
+                unified_members = asyncio.ensure_future(self.get_members(calculated_unified_name))
+
+            await asyncio.gather(*[self.reconcile_subgroup(calculated_subgroup_name, local_valid_members)
+                    for calculated_subgroup_name, local_valid_members in pending_subgroups])
+
+            ### Manage the unified list, if defined ###
+
+            if self.unified_list and unified_delta is not None:
+                await self.apply_unified_delta('%s+%s' % (self.group_name,self.unified_list),
+                        *unified_delta)
+            elif self.unified_list:
+                await self.reconcile_unified(calculated_unified_name, await unified_members,
+                        no_meta_list)
+
+            batches = self.plan_batches()
+
+        if journal is not None:
+            journal.start(batches, self.definitions)
+
+        if plan_only:
+            from .journal import print_plan
+
+            print_plan(batches)
+            return
+
+        with self.metrics.phase('apply'):
+            await self.apply(batches, self.definitions, journal)
+
+        if journal is not None:
+            journal.close()
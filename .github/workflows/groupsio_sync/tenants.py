@@ -0,0 +1,90 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Several groups, each with its own groups/ tree, synced in one process.
+
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+# Options naming files a run keeps between runs. Each tenant gets its own,
+# under its root.
+
+tenant_paths = ('snapshot_path', 'manifest_path', 'store_path', 'journal_path',
+        'parse_cache_path', 'export_path')
+
+def tenant_options(options, root, jobs=1):
+    '''Return the options for the tenant rooted at ``root``.
+
+    Its definitions are read from ``<root>/groups``, its pages and README.md
+    are written to ``root``, and the files named by ``tenant_paths`` are
+    taken relative to it. What it renders and records names files relative
+    to ``root``, as a run from there would. ``jobs`` is the tenant's share of
+    --jobs.
+    '''
+
+    tenant = dict(options)
+    tenant['root'] = root
+    tenant['group_configs_dir'] = os.path.join(root, options['group_configs_dir'])
+    tenant['output_dir'] = root
+    tenant['jobs'] = jobs
+
+    for name in tenant_paths:
+        if tenant[name]:
+            tenant[name] = os.path.join(root, tenant[name])
+
+    return tenant
+
+class TenantOutput(object):
+    '''Stands in for sys.stdout while tenants run, so each tenant's output
+    can be printed as one block when it's done.
+
+    What a thread writes goes to the buffer it has started with capture(),
+    or else straight through to the real stdout.
+    '''
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def capture(self):
+        self.local.buffer = list()
+
+    def release(self):
+        '''Stop capturing this thread's output; return what it wrote.'''
+
+        buffer = self.local.buffer
+        del self.local.buffer
+
+        return ''.join(buffer)
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+
+        if buffer is None:
+            return self.stream.write(text)
+
+        buffer.append(text)
+
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+@contextmanager
+def capturing():
+    '''Put a TenantOutput in place of sys.stdout for the body of the with
+    statement.'''
+
+    output = TenantOutput(sys.stdout)
+    sys.stdout = output
+
+    try:
+        yield output
+    finally:
+        sys.stdout = output.stream
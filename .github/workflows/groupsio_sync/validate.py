@@ -0,0 +1,330 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Checking every subgroup definition up front, before any network I/O.
+
+import datetime
+
+from .definitions import (DefinitionStream, SubgroupStream, SyntaxProblem, email_pattern,
+        yaml_loader)
+from .model import DefinitionDigest, Subgroup, build_member, build_subgroup
+
+class ValidationError(Exception):
+    '''Definitions the sync can't use. ``problems`` holds (file, line, message).'''
+
+    def __init__(self, problems):
+        Exception.__init__(self, '%d problem(s) in the subgroup definitions' % len(problems))
+        self.problems = problems
+
+    def report(self):
+        for local_file, line, message in self.problems:
+            print('ERROR: %s:%s: %s' % (local_file, line, message))
+
+        print('ERROR: %s. Nothing was changed.' % self)
+
+def validate_definitions(documents, reserved=(), profiles=None):
+    '''Check the parsed definition files in ``documents`` ({file: contents}).
+
+    Every field the sync reads is checked, and every problem found in every
+    file is reported at once, with its line number, by raising
+    ValidationError. Subgroups named in ``reserved`` (the main and unified
+    lists) are left alone, as the sync ignores them. Problems with the
+    ``profiles`` (a ProfileRegistry) are reported first, with its file.
+
+    Returns {file: [(subgroup, Subgroup), ...]} in the order the files define
+    them, for the later stages to use instead of the documents. Empty and
+    reserved subgroups are listed with None. Each document is taken out of
+    ``documents`` once it's checked, so it can be freed as the next is read.
+    Documents may also be a DefinitionStream, which is read as it's checked,
+    or a SyntaxProblem for a file which isn't valid YAML.
+    '''
+
+    records = dict()
+    problems = check_profiles(profiles)
+    defined_in = dict()
+
+    for local_file in list(documents):
+        file_problems = list()
+        document = documents.pop(local_file)
+
+        if isinstance(document, DefinitionStream):
+            records[local_file] = check_stream(document, reserved, profiles, file_problems)
+            document = document.problem or document
+        else:
+            records[local_file] = check_document(document, reserved, profiles, file_problems)
+
+        # Anything else wrong with a file that doesn't parse can wait until
+        # it does
+
+        if isinstance(document, SyntaxProblem):
+            problems.append((local_file, document.line, document.message))
+            continue
+
+        for local_subgroup, subgroup in records[local_file]:
+            if subgroup is None:
+                continue
+
+            if local_subgroup in defined_in:
+                file_problems.append(((local_subgroup,), '%s is also defined in %s' %
+                    (local_subgroup, defined_in[local_subgroup])))
+            else:
+                defined_in[local_subgroup] = local_file
+
+        if file_problems:
+            lines = locate(local_file, [path for path, message in file_problems])
+            problems.extend((local_file, line, message) for line, (path, message) in
+                    zip(lines, file_problems))
+
+    if problems:
+        raise ValidationError(problems)
+
+    return records
+
+def check_profiles(profiles):
+    '''Return the problems in a ProfileRegistry's file as (file, line, message).'''
+
+    if profiles is None:
+        return list()
+
+    if profiles.problem is not None:
+        return [(profiles.path, profiles.problem.line, profiles.problem.message)]
+
+    if not profiles.problems:
+        return list()
+
+    lines = locate(profiles.path, [path for path, message in profiles.problems])
+
+    return [(profiles.path, line, message) for line, (path, message) in
+            zip(lines, profiles.problems)]
+
+def check_document(document, reserved, profiles, problems):
+    '''Check one file's contents, appending (path, message) to ``problems``.
+
+    Returns its (subgroup, Subgroup) entries, with None for those which are
+    empty or reserved. Subgroups with problems are left out.
+    '''
+
+    records = list()
+
+    if document is None or isinstance(document, SyntaxProblem):
+        return records
+
+    if not isinstance(document, dict):
+        problems.append(((), 'expected subgroups, each a mapping of name to definition'))
+        return records
+
+    for local_subgroup, groupdata in document.items():
+        entry = check_subgroup(local_subgroup, groupdata, reserved, profiles, problems)
+
+        if entry is not None:
+            records.append(entry)
+
+    return records
+
+def check_stream(stream, reserved, profiles, problems):
+    '''check_document() for a DefinitionStream, reading it as it goes.'''
+
+    records = list()
+
+    for local_subgroup, definition in stream.subgroups():
+        if isinstance(definition, SubgroupStream):
+            entry = check_subgroup_stream(local_subgroup, definition, reserved, profiles,
+                    problems)
+        else:
+            entry = check_subgroup(local_subgroup, definition, reserved, profiles, problems)
+
+        if entry is not None:
+            records.append(entry)
+
+    if stream.document is not None:
+        return check_document(stream.document, reserved, profiles, problems)
+
+    return records
+
+def check_subgroup(local_subgroup, groupdata, reserved, profiles, problems):
+    '''Check one subgroup's definition; return its (subgroup, Subgroup) entry,
+    or None if it has problems with its members.'''
+
+    # Empty definitions are skipped, and the main and unified lists can't be
+    # managed, so neither is used
+
+    if not groupdata or local_subgroup in reserved:
+        return local_subgroup, None
+
+    path = (local_subgroup,)
+
+    if not isinstance(groupdata, dict):
+        problems.append((path, '%s should be a mapping of fields' % local_subgroup))
+        return None
+
+    check_fields(local_subgroup, groupdata, path, problems)
+
+    count = len(problems)
+
+    for index, local_member in enumerate(_sequence(groupdata, 'list-members', path,
+            problems)):
+        check_member(local_member, path + ('list-members', index), profiles, problems)
+
+    if len(problems) == count:
+        return local_subgroup, build_subgroup(local_subgroup, groupdata, profiles)
+
+    return None
+
+def check_subgroup_stream(local_subgroup, stream, reserved, profiles, problems):
+    '''check_subgroup() for a SubgroupStream. Each member is checked and turned
+    into a record as it's read, then let go.'''
+
+    if local_subgroup in reserved:
+        stream.drain()
+        return local_subgroup, None
+
+    path = (local_subgroup,)
+    member_problems = list()
+    members = list()
+    digest = DefinitionDigest()
+
+    for index, local_member in enumerate(stream.members()):
+        check_member(local_member, path + ('list-members', index), profiles, member_problems)
+
+        # Once anything's wrong no Subgroup is made, so stop making records
+
+        if not member_problems:
+            digest.add_member(local_member)
+            member = build_member(local_member, profiles)
+
+            if member is not None:
+                members.append(member)
+
+    groupdata = stream.fields
+
+    # A member list which couldn't be streamed is checked as usual
+
+    if 'list-members' in groupdata:
+        return check_subgroup(local_subgroup, groupdata, reserved, profiles, problems)
+
+    if not stream.present:
+        return local_subgroup, None
+
+    check_fields(local_subgroup, groupdata, path, problems)
+
+    if member_problems:
+        problems.extend(member_problems)
+        return None
+
+    return local_subgroup, Subgroup(local_subgroup, groupdata, members, digest.finish(groupdata))
+
+def check_fields(local_subgroup, groupdata, path, problems):
+    '''Check the fields of a subgroup other than its members.'''
+
+    for field in ('name', 'description'):
+        if not groupdata.get(field):
+            problems.append((path, '%s has no %s' % (local_subgroup, field)))
+
+    for index, repo in enumerate(_sequence(groupdata, 'git', path, problems)):
+        if not isinstance(repo, dict) or not repo.get('repo'):
+            problems.append((path + ('git', index), 'git entries need a repo'))
+
+def check_member(local_member, path, profiles, problems):
+    if not isinstance(local_member, dict):
+        problems.append((path, 'members should be mappings with an email and a name'))
+        return
+
+    if 'id' in local_member:
+
+        # A profile that's wrong has been reported already
+
+        if profiles is not None and (profiles.problem is not None or
+                str(local_member['id']) in profiles.invalid):
+            return
+
+        if profiles is None or profiles.resolve(local_member) is None:
+            problems.append((path + ('id',), 'unknown member id %s' % local_member['id']))
+            return
+
+        local_member = profiles.resolve(local_member)
+
+    for field in ('email', 'name'):
+        if not local_member.get(field):
+            problems.append((path, 'member has no %s' % field))
+        elif not isinstance(local_member[field], str):
+            problems.append((path + (field,), 'member %s should be text' % field))
+
+    email = local_member.get('email')
+
+    if isinstance(email, str) and email and not email_pattern.search(email):
+        problems.append((path + ('email',), '%s is not an email address' % email))
+
+    if ('include-on-meta-list' in local_member and
+            not isinstance(local_member['include-on-meta-list'], bool)):
+        problems.append((path + ('include-on-meta-list',),
+            'include-on-meta-list should be True or False'))
+
+    for index, role in enumerate(_sequence(local_member, 'roles', path, problems)):
+        role_path = path + ('roles', index)
+
+        if not isinstance(role, dict):
+            problems.append((role_path, 'roles should be mappings with a title'))
+            continue
+
+        if 'is-voting' in role and not isinstance(role['is-voting'], bool):
+            problems.append((role_path + ('is-voting',), 'is-voting should be True or False'))
+
+        for field in ('term-begins', 'term-ends'):
+            if role.get(field) is not None and not isinstance(role[field],
+                    (str, datetime.date)):
+                problems.append((role_path + (field,), '%s should be a date' % field))
+
+def _sequence(data, key, path, problems):
+    '''Return ``data[key]`` if it's a list, or () (noting a problem) if not.'''
+
+    value = data.get(key)
+
+    if value is None:
+        return ()
+
+    if not isinstance(value, list):
+        problems.append((path + (key,), '%s should be a list' % key))
+        return ()
+
+    return value
+
+def locate(local_file, paths):
+    '''Return the line number of each of ``paths`` (keys from the root) in
+    ``local_file``, or of the nearest enclosing node that exists.
+
+    The file is composed again to find them, which is only worth doing once
+    something is wrong.
+    '''
+
+    import yaml
+
+    with open(local_file, 'rb') as config_yaml:
+        root = yaml.compose(config_yaml, Loader=yaml_loader())
+
+    lines = list()
+
+    for path in paths:
+        node = root
+        line = 1 if node is None else node.start_mark.line + 1
+
+        for step in path:
+            if isinstance(node, yaml.MappingNode):
+                pair = next(((key, value) for key, value in node.value if key.value == str(step)),
+                        None)
+
+                if pair is None:
+                    break
+
+                line = pair[0].start_mark.line + 1
+                node = pair[1]
+            elif (isinstance(node, yaml.SequenceNode) and isinstance(step, int) and
+                    step < len(node.value)):
+                node = node.value[step]
+                line = node.start_mark.line + 1
+            else:
+                break
+
+        lines.append(line)
+
+    return lines
@@ -0,0 +1,164 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Change notification for groups/, for --watch.
+
+import os
+import time
+
+def watcher(group_configs_dir, interval=1.0):
+    '''Return an InotifyWatcher for ``group_configs_dir``, or a PollingWatcher
+    where inotify isn't available.'''
+
+    try:
+        return InotifyWatcher(group_configs_dir)
+    except OSError as error:
+        print('INFO: inotify is not available (%s), polling every %.1fs instead.' %
+                (error, interval))
+        return PollingWatcher(group_configs_dir, interval)
+
+def is_relevant(path):
+    '''True for files a sync reads: definitions, config and templates.'''
+
+    name = os.path.basename(path)
+
+    return not name.startswith('.') and not name.endswith(('~', '.swp', '.tmp'))
+
+class InotifyWatcher(object):
+    '''Report files created, written, moved or deleted under a directory tree.
+
+    Uses the Linux inotify API through ctypes, so no extra package is needed.
+    Directories created later are watched as they appear.
+    '''
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, root):
+        import ctypes
+        import ctypes.util
+
+        libc_name = ctypes.util.find_library('c')
+
+        if not libc_name:
+            raise OSError('no C library')
+
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError('no inotify_init1')
+
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self.watches = dict()
+
+        for directory, dirs, files in os.walk(root):
+            self._add(directory)
+
+    def _add(self, directory):
+        import ctypes
+
+        descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.mask)
+
+        if descriptor < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed: %s' % directory)
+
+        self.watches[descriptor] = directory
+
+    def wait(self, timeout=None):
+        '''Return the set of paths changed within ``timeout`` seconds (None waits).'''
+
+        import select
+        import struct
+
+        changed = set()
+
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changed
+
+        try:
+            buffer = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+
+        while offset < len(buffer):
+            descriptor, event_mask, cookie, length = struct.unpack_from('iIII', buffer, offset)
+            name = buffer[offset + 16:offset + 16 + length].rstrip(b'\0')
+            offset += 16 + length
+
+            directory = self.watches.get(descriptor)
+
+            if directory is None or not name:
+                continue
+
+            path = os.path.join(directory, os.fsdecode(name))
+
+            if event_mask & self.IN_ISDIR:
+                if event_mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    self._add(path)
+
+                    # Files may have landed before the watch was in place
+
+                    for subdirectory, dirs, files in os.walk(path):
+                        changed.update(os.path.join(subdirectory, f) for f in files)
+                continue
+
+            if is_relevant(path):
+                changed.add(path)
+
+        return changed
+
+class PollingWatcher(object):
+    '''Report changed files by comparing modification times every ``interval``.'''
+
+    def __init__(self, root, interval=1.0):
+        self.root = root
+        self.interval = interval
+        self.seen = self._scan()
+
+    def _scan(self):
+        seen = dict()
+
+        for directory, dirs, files in os.walk(self.root):
+            for f in files:
+                path = os.path.join(directory, f)
+
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+                seen[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return seen
+
+    def wait(self, timeout=None):
+        '''Return the set of paths changed within ``timeout`` seconds (None waits).'''
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            time.sleep(self.interval if deadline is None else
+                    max(0, min(self.interval, deadline - time.monotonic())))
+
+            seen = self._scan()
+            changed = set(path for path in set(seen) | set(self.seen)
+                    if seen.get(path) != self.seen.get(path) and is_relevant(path))
+            self.seen = seen
+
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
@@ -0,0 +1,13 @@
+#!/usr/local/bin/python3
+
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Answer questions about the directory from the store written by
+# sync-yaml-to-groupsio.py --store, e.g. which lists an address is on.
+
+from groupsio_sync.store import main
+
+if __name__ == '__main__':
+    main()
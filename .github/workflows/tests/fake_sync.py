@@ -0,0 +1,77 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Running sync-yaml-to-groupsio.py on a copy of groups/ against the local
+# Groups.io stand-in (benchmarks/fake_groupsio.py), for the tests.
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+workflows_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+repo_root = os.path.dirname(os.path.dirname(workflows_dir))
+script = os.path.join(workflows_dir, 'sync-yaml-to-groupsio.py')
+
+sys.path.insert(0, workflows_dir)
+sys.path.insert(0, os.path.join(workflows_dir, 'benchmarks'))
+
+from fake_groupsio import FakeGroupsio, serve, api_url
+
+unified_list = 'technical-leadership'
+
+class SyncTestCase(unittest.TestCase):
+    '''A copy of the repository's groups/ in ``self.work``, and a Groups.io
+    stand-in in ``self.groupsio`` which is a little out of date with it.'''
+
+    def setUp(self):
+        self.work = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work)
+
+        shutil.copytree(os.path.join(repo_root, 'groups'), os.path.join(self.work, 'groups'))
+
+        self.server = serve(FakeGroupsio())
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.reset_groupsio()
+
+        self.env = dict(os.environ, GROUPSIO_USERNAME='user@example.org',
+                GROUPSIO_PASSWORD='password', GROUPSIO_API_URL=api_url(self.server))
+
+    def reset_groupsio(self):
+        '''Put the stand-in back as it was before the first sync.'''
+
+        self.groupsio = FakeGroupsio(org_domain='lists.foundation.graphql.org', page_size=3)
+        self.groupsio.add_subgroup('tsc-private', members=['lee@leebyron.com',
+            'gone@example.com'], mods=['mod@example.org', 'benjie@jemjie.com'])
+        self.groupsio.add_subgroup('mentorship', members=['lee@leebyron.com'],
+                mods=['mod@example.org'])
+        self.groupsio.add_subgroup('security', mods=['mod@example.org'])
+        self.groupsio.add_subgroup(unified_list, members=['old@example.com',
+            'lee@leebyron.com'], mods=['mod@example.org'])
+
+        self.server.state = self.groupsio
+
+    def path(self, *names):
+        return os.path.join(self.work, *names)
+
+    def sync(self, *argv, cwd=None):
+        '''Run the script with ``argv`` in ``cwd`` (the copy by default) and
+        return its exit status and output.'''
+
+        # Without the pacing meant for the real Groups.io
+
+        argv = [sys.executable, script, '--rate=1000', '--burst=1000'] + list(argv)
+        process = subprocess.run(argv, cwd=cwd or self.work, env=self.env,
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+        return process.returncode, process.stdout
+
+    def memberships(self):
+        '''Return {subgroup: set of non-moderator emails} as Groups.io has them.'''
+
+        return dict((name.split('+', 1)[1], self.groupsio.members(name.split('+', 1)[1]))
+                for name in self.groupsio.subgroups)
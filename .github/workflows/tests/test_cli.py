@@ -0,0 +1,48 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Checks that bad command lines get a usage error rather than a traceback.
+# Run with: python -m pytest .github/workflows/tests
+
+import io
+import os
+import sys
+import unittest
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from groupsio_sync.cli import parse_options
+
+class ParseOptionsTest(unittest.TestCase):
+
+    def usage_error(self, argv):
+        output = io.StringIO()
+
+        with contextlib.redirect_stdout(output), self.assertRaises(SystemExit) as raised:
+            parse_options(argv)
+
+        self.assertEqual(raised.exception.code, 2)
+        self.assertIn('Usage:', output.getvalue())
+
+        return output.getvalue()
+
+    def test_bad_values_are_usage_errors(self):
+        self.assertIn('--shard: 3/2 is out of range', self.usage_error(['--shard=3/2']))
+        self.assertIn('--shard: expected i/N', self.usage_error(['-g', '--shard=x']))
+        self.assertIn('--debounce:', self.usage_error(['--debounce=soon']))
+        self.assertIn('--jobs:', self.usage_error(['--jobs=many']))
+
+    def test_unknown_options_are_usage_errors(self):
+        self.assertIn('--bogus', self.usage_error(['--bogus']))
+
+    def test_good_values_are_parsed(self):
+        options = parse_options(['-g', '--shard=2/4', '--debounce=0.5'])
+
+        self.assertEqual(options['shard'], (2, 4))
+        self.assertEqual(options['debounce'], 0.5)
+        self.assertEqual(options['partial_path'], 'shard-2-of-4.json')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Checks that -d writes pages byte for byte the same as the original script.
+# golden/expected holds what the original script (the first commit's
+# sync-yaml-to-groupsio.py, pointed at the Groups.io stand-in) wrote for
+# golden/groups. Run with: python -m pytest .github/workflows/tests
+
+import os
+import shutil
+import unittest
+
+from fake_sync import SyncTestCase
+
+golden_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+expected_dir = os.path.join(golden_dir, 'expected')
+
+class GoldenTest(SyncTestCase):
+
+    def setUp(self):
+        SyncTestCase.setUp(self)
+
+        shutil.rmtree(self.path('groups'))
+        shutil.copytree(os.path.join(golden_dir, 'groups'), self.path('groups'))
+
+        for subgroup in ('golden-all-options', 'golden-minimal', 'golden-empty'):
+            self.groupsio.add_subgroup(subgroup, mods=['mod@example.org'])
+
+    def read(self, path):
+        '''Return the lines of a page as bytes, less the date.'''
+
+        with open(path, 'rb') as page_file:
+            return [line for line in page_file if b'Last generated' not in line]
+
+    def test_pages_match_the_original_script(self):
+        status, output = self.sync('-d')
+        self.assertEqual(status, 0, output)
+
+        expected = sorted(os.listdir(expected_dir))
+
+        self.assertEqual(sorted(name for name in os.listdir(self.work) if name.endswith('.md')),
+                expected)
+
+        for name in expected:
+            self.assertEqual(self.read(self.path(name)),
+                    self.read(os.path.join(expected_dir, name)), name)
+
+if __name__ == '__main__':
+    unittest.main()
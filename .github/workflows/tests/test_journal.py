@@ -0,0 +1,103 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Checks that a journal survives interruptions: a plan can be resumed, and a
+# journal a killed run left half written doesn't stop the next sync.
+# Run with: python -m pytest .github/workflows/tests
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from fake_sync import SyncTestCase, unified_list
+from groupsio_sync.journal import MutationJournal
+
+batches = [
+    {'id': 1, 'endpoint': 'directadd', 'subgroups': ['graphql+tsc'], 'emails': ['a@example.org'],
+        'entries': ['A <a@example.org>']},
+    {'id': 2, 'endpoint': 'bulkremovemembers', 'subgroups': ['graphql+tsc'],
+        'emails': ['b@example.org']}
+    ]
+
+class MutationJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'journal.jsonl')
+
+    def test_pending_batches_survive_a_reload(self):
+        journal = MutationJournal(self.path)
+        journal.start(batches, {'tsc.yml': 'hash'})
+        journal.record(batches[0])
+
+        # A line cut short by the interruption is ignored
+
+        with open(self.path, 'a') as journal_file:
+            journal_file.write('{"applied": ')
+
+        journal = MutationJournal(self.path)
+
+        self.assertTrue(journal.load())
+        self.assertEqual(journal.pending(), batches[1:])
+        self.assertEqual(journal.definitions, {'tsc.yml': 'hash'})
+
+    def test_start_replaces_a_broken_journal(self):
+        for content in ('', '{"version": 1, "bat', '[]\n', '{"version": 1}\n'):
+            with open(self.path, 'w') as journal_file:
+                journal_file.write(content)
+
+            journal = MutationJournal(self.path)
+
+            with self.assertRaises(ValueError):
+                journal.load()
+
+            journal.start(batches, dict())
+
+            journal = MutationJournal(self.path)
+
+            self.assertTrue(journal.load())
+            self.assertEqual(journal.pending(), batches)
+
+class JournalSyncTest(SyncTestCase):
+
+    def test_plan_only_then_resume(self):
+        before = self.memberships()
+        status, output = self.sync('-g', '--plan-only')
+
+        self.assertEqual(status, 0, output)
+        self.assertIn('PLAN:', output)
+        self.assertEqual(self.memberships(), before)
+
+        status, output = self.sync('-g', '--resume')
+
+        self.assertEqual(status, 0, output)
+        self.assertEqual(len(self.memberships()[unified_list]), 18)
+        self.assertFalse(os.path.exists(self.path('.groupsio-journal.jsonl')))
+
+    def test_sync_replaces_a_half_written_journal(self):
+        with open(self.path('journal.jsonl'), 'w') as journal_file:
+            journal_file.write('{"version": 1, "batches": [{"id"')
+
+        status, output = self.sync('-g', '--journal=journal.jsonl')
+
+        self.assertEqual(status, 0, output)
+        self.assertIn('WARN: Not a mutation journal', output)
+        self.assertNotIn('Traceback', output)
+        self.assertEqual(len(self.memberships()[unified_list]), 18)
+
+    def test_resume_refuses_a_half_written_journal(self):
+        with open(self.path('journal.jsonl'), 'w') as journal_file:
+            journal_file.write(json.dumps([]) + '\n')
+
+        status, output = self.sync('-g', '--resume', '--journal=journal.jsonl')
+
+        self.assertEqual(status, 0, output)
+        self.assertIn('WARN: Not a mutation journal', output)
+        self.assertEqual(self.groupsio.request_count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
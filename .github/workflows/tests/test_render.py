@@ -0,0 +1,124 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Checks that member cards show entries as written, and that member pages
+# are split and named by who is on them, so one change touches few pages.
+# Run with: python -m pytest .github/workflows/tests
+
+import os
+import sys
+import glob
+import zlib
+import unittest
+import collections
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_sync import SyncTestCase
+from groupsio_sync.model import build_member
+from groupsio_sync.render import member_pages, render_member_card
+
+Member = collections.namedtuple('Member', 'email')
+
+page_size = 5
+
+def run_of(count, skip=0):
+    '''Return ``count`` members none of whom would end a page on their own.'''
+
+    members = list()
+    number = skip
+
+    while len(members) < count:
+        email = 'person%d@example.org' % number
+        number += 1
+
+        if zlib.crc32(email.encode('utf-8')) % page_size:
+            members.append(Member(email))
+
+    return members
+
+class MemberCardTest(unittest.TestCase):
+
+    def test_cards_show_the_email_and_name_as_written(self):
+        member = build_member({'email': 'Some.One@Example.ORG', 'name': ' Some One ',
+            'photo': 'https://example.org/one.png', 'roles': [{'title': 'Chair',
+                'is-voting': True}]})
+        voting_member_info = list()
+
+        self.assertEqual((member.email, member.name), ('some.one@example.org', 'Some One'))
+        self.assertEqual(render_member_card(member, voting_member_info, None),
+                '\n### ** Some One **\n\n'
+                '<img src="https://example.org/one.png" height=100 '
+                'alt="Profile photo of Some.One@Example.ORG">\n\n'
+                '* **Chair**, voting member\n\n\n\n')
+        self.assertEqual(voting_member_info, [(' Some One ', 'Chair', '')])
+
+class MemberPagesTest(unittest.TestCase):
+
+    def test_long_runs_are_split(self):
+        pages = member_pages(run_of(200), page_size)
+
+        self.assertEqual(sum(pages, []), run_of(200))
+        self.assertLessEqual(max(len(page) for page in pages), 4 * page_size)
+
+    def test_insertion_in_a_long_run_rewrites_at_most_two_pages(self):
+        members = run_of(200)
+        before = set(tuple(page) for page in member_pages(members, page_size))
+
+        for index, member in enumerate(run_of(20, skip=1000)):
+            position = 7 + index * 9
+            after = member_pages(members[:position] + [member] + members[position:], page_size)
+            rewritten = [page for page in after if tuple(page) not in before]
+
+            self.assertLessEqual(len(rewritten), 2)
+            self.assertIn(member, sum(rewritten, []))
+
+class MemberPageFilesTest(SyncTestCase):
+
+    def member_pages(self):
+        '''Return {file name: contents} of tsc-private's member pages.'''
+
+        pages = dict()
+
+        for page_path in glob.glob(self.path('tsc-private.members-*.md')):
+            with open(page_path) as page_file:
+                pages[os.path.basename(page_path)] = page_file.read()
+
+        return pages
+
+    def test_insertion_rewrites_one_member_page(self):
+        status, output = self.sync('-d', '--page-size=2')
+        self.assertEqual(status, 0, output)
+        before = self.member_pages()
+
+        self.assertGreater(len(before), 2)
+
+        for content in before.values():
+            self.assertNotIn('.members-', content)
+
+        # Someone who doesn't end a page, in the middle of the list
+
+        email = next(email for email in ('new%d@example.org' % number for number in range(10))
+                if zlib.crc32(email.encode('utf-8')) % 2)
+        tsc_path = self.path('groups', 'tsc.yml')
+
+        with open(tsc_path) as tsc_file:
+            definitions = tsc_file.read()
+
+        with open(tsc_path, 'w') as tsc_file:
+            tsc_file.write(definitions.replace('    - email: nyteshade@gmail.com\n',
+                '    - email: %s\n      name: New Member\n'
+                '    - email: nyteshade@gmail.com\n' % email, 1))
+
+        status, output = self.sync('-d', '--page-size=2')
+        self.assertEqual(status, 0, output)
+        after = self.member_pages()
+        rewritten = [name for name in after if after[name] != before.get(name)]
+
+        self.assertEqual(len(rewritten), 1)
+        self.assertIn('New Member', after[rewritten[0]])
+        self.assertLessEqual(len(set(before) - set(after)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Checks that --shard runs merged with --merge sync the same as one run.
+# Run with: python -m pytest .github/workflows/tests
+
+import os
+import unittest
+import subprocess
+
+from fake_sync import SyncTestCase, unified_list
+
+class ShardMergeTest(SyncTestCase):
+
+    def shard_and_merge(self, *argv):
+        for shard in ('1/2', '2/2'):
+            status, output = self.sync('-g', '--shard=%s' % shard, *argv)
+            self.assertEqual(status, 0, output)
+
+        return self.sync('-g', '--merge', 'shard-2-of-2.json', 'shard-1-of-2.json')
+
+    def test_merged_shards_sync_like_one_run(self):
+        status, output = self.sync('-g')
+        self.assertEqual(status, 0, output)
+        expected = self.memberships()
+
+        self.reset_groupsio()
+        status, output = self.shard_and_merge()
+        self.assertEqual(status, 0, output)
+
+        self.assertEqual(self.memberships(), expected)
+        self.assertEqual(len(expected[unified_list]), 18)
+
+    def test_shards_refuse_changed_since(self):
+        git = dict(cwd=self.work, stdout=subprocess.DEVNULL, check=True)
+        subprocess.run(['git', 'init', '-q'], **git)
+        subprocess.run(['git', 'add', 'groups'], **git)
+        subprocess.run(['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.org',
+            'commit', '-q', '-m', 'groups'], **git)
+
+        with open(self.path('groups', 'security.yml'), 'a') as definition_file:
+            definition_file.write('\n')
+
+        before = self.memberships()
+
+        for argv in (('--shard=1/2',), ('--shard=2/2',), ('--merge', 'shard-1-of-2.json',
+                'shard-2-of-2.json')):
+            status, output = self.sync('-g', '--changed-since=HEAD', *argv)
+            self.assertEqual(status, 1, output)
+            self.assertIn('--changed-since can\'t be combined with --shard or --merge', output)
+
+        self.assertFalse(os.path.exists(self.path('shard-1-of-2.json')))
+        self.assertEqual(self.memberships(), before)
+        self.assertEqual(self.groupsio.request_count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
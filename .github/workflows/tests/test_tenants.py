@@ -0,0 +1,93 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Checks that --tenant runs render and record the same whatever the tenant's
+# root is. Run with: python -m pytest .github/workflows/tests
+
+import os
+import json
+import shutil
+import sqlite3
+import unittest
+
+from fake_sync import SyncTestCase
+
+roots = ('one', os.path.join('nested', 'deeper', 'two'))
+
+class TenantTest(SyncTestCase):
+
+    def setUp(self):
+        SyncTestCase.setUp(self)
+
+        # The same definitions for two groups, one tenant each
+
+        for root, group_name in zip(roots, ('graphql', 'graphql2')):
+            shutil.copytree(self.path('groups'), self.path(root, 'groups'))
+            config_path = self.path(root, 'groups', 'assets', 'config.yml')
+
+            with open(config_path) as config_file:
+                config = config_file.read().replace("'graphql'", "'%s'" % group_name)
+
+            with open(config_path, 'w') as config_file:
+                config_file.write(config)
+
+            for subgroup in ('tsc-private', 'mentorship', 'security', 'technical-leadership'):
+                self.groupsio.add_subgroup(subgroup, mods=['mod@example.org'],
+                        group_name=group_name)
+
+    def read(self, root, name):
+        '''Return the lines of a tenant's output, less the date and its group name.'''
+
+        with open(self.path(root, name)) as output_file:
+            return [line.replace('"graphql2"', '"graphql"') for line in output_file
+                    if 'Last generated' not in line]
+
+    def test_output_does_not_depend_on_the_root(self):
+        status, output = self.sync('-d', '--manifest=manifest.json', '--export=directory.ndjson',
+                '--store=directory.sqlite', '--parse-cache=parse-cache.json',
+                *['--tenant=%s' % root for root in roots])
+        self.assertEqual(status, 0, output)
+
+        names = sorted(name for name in os.listdir(self.path(roots[0])) if name.endswith(
+            ('.md', '.ndjson', '.json')))
+        self.assertIn('README.md', names)
+        self.assertIn('tsc-private.md', names)
+
+        for name in names:
+            content = self.read(roots[1], name)
+
+            self.assertFalse([line for line in content if 'nested' in line], name)
+
+            if name == 'manifest.json':
+                first, second = (json.loads(''.join(self.read(root, name))) for root in roots)
+                self.assertEqual(first['files'], second['files'])
+                self.assertEqual(first['pages'], second['pages'])
+            else:
+                self.assertEqual(self.read(roots[0], name), content, name)
+
+        self.assertIn('(/groups)', ''.join(self.read(roots[1], 'README.md')))
+
+        for root in roots:
+            db = sqlite3.connect(self.path(root, 'directory.sqlite'))
+            self.assertEqual(sorted(path for (path,) in db.execute('SELECT path FROM files')),
+                    ['groups/mentorship.yml', 'groups/security.yml', 'groups/tsc.yml'])
+            db.close()
+
+    def test_rebuilding_in_place_keeps_every_page(self):
+        argv = ['-d', '--manifest=manifest.json'] + ['--tenant=%s' % root for root in roots]
+
+        for run in range(2):
+            status, output = self.sync(*argv)
+            self.assertEqual(status, 0, output)
+
+        # The second build found every page current and kept it listed
+
+        for root in roots:
+            manifest = json.loads(''.join(self.read(root, 'manifest.json')))
+            self.assertEqual(sorted(manifest['pages']), ['mentorship.md', 'security.md',
+                'tsc-private.md'])
+            self.assertIn('tsc-private.md', ''.join(self.read(root, 'README.md')))
+
+if __name__ == '__main__':
+    unittest.main()
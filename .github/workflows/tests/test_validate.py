@@ -0,0 +1,138 @@
+# Copyright The Linux Foundation
+#
+# SPDX-License-Identifier: MIT
+#
+# Checks that definition problems are all reported together, with their
+# files and lines. Run with: python -m pytest .github/workflows/tests
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from groupsio_sync.definitions import DocumentCache
+from groupsio_sync.profiles import ProfileRegistry
+from groupsio_sync.validate import ValidationError, validate_definitions
+
+malformed = '''broken:
+  name: [
+  description: Not: closed
+'''
+
+invalid = '''wg:
+  name: Working group
+  description: A working group
+  list-members:
+  - email: someone@example.org
+    name: Someone
+  - name: No Email
+'''
+
+people = '''good:
+  email: good@example.org
+  name: Good Person
+nameless:
+  email: nameless@example.org
+numbered:
+  email: numbered@example.org
+  name: 42
+'''
+
+uses_profiles = '''profiled:
+  name: Profiled group
+  description: A group of profiles
+  list-members:
+  - id: good
+  - id: nameless
+  - id: numbered
+  - id: missing
+'''
+
+class ValidateDefinitionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        self.malformed = self.write('broken.yml', malformed)
+        self.invalid = self.write('wg.yml', invalid)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+
+        with open(path, 'w') as definition_file:
+            definition_file.write(content)
+
+        return path
+
+    def problems(self, stream_above):
+        documents = DocumentCache(None, 1, False, stream_above).load_all(
+                [self.malformed, self.invalid])
+
+        with self.assertRaises(ValidationError) as raised:
+            validate_definitions(documents)
+
+        return raised.exception.problems
+
+    def check(self, problems):
+        self.assertEqual(len(problems), 2)
+
+        by_file = dict((local_file, (line, message)) for local_file, line, message in problems)
+
+        line, message = by_file[self.malformed]
+        self.assertEqual(line, 3)
+        self.assertIn('YAML syntax error', message)
+
+        self.assertEqual(by_file[self.invalid], (7, 'member has no email'))
+
+    def test_malformed_and_invalid_files_are_both_reported(self):
+        self.check(self.problems(stream_above=0))
+
+    def test_streamed_files_report_the_same(self):
+        self.check(self.problems(stream_above=1))
+
+class ValidateProfilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+
+        with open(path, 'w') as definition_file:
+            definition_file.write(content)
+
+        return path
+
+    def problems(self, people_content):
+        profiles = ProfileRegistry(self.write('people.yml', people_content))
+        definitions = self.write('profiled.yml', uses_profiles)
+        documents = DocumentCache(None, 1, False, 0).load_all([definitions])
+
+        with self.assertRaises(ValidationError) as raised:
+            validate_definitions(documents, (), profiles)
+
+        return raised.exception.problems
+
+    def test_profile_problems_are_reported_with_their_lines(self):
+        problems = self.problems(people)
+
+        self.assertEqual([(os.path.basename(local_file), line, message) for local_file, line,
+            message in problems], [
+                ('people.yml', 4, 'profile nameless has no name'),
+                ('people.yml', 8, 'profile numbered name should be text'),
+                ('profiled.yml', 8, 'unknown member id missing')])
+
+    def test_malformed_profiles_are_reported(self):
+        problems = self.problems('good:\n  email: [\n')
+
+        self.assertEqual(len(problems), 1)
+        self.assertEqual(problems[0][0], os.path.join(self.directory, 'people.yml'))
+        self.assertIn('YAML syntax error', problems[0][2])
+
+if __name__ == '__main__':
+    unittest.main()